@@ -0,0 +1,121 @@
+# --- START OF FILE autosave.py ---
+
+import functools
+import logging
+
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal
+
+# Import database functions
+import database as db
+
+logger = logging.getLogger(__name__)
+
+# ==================================
+#      Autosave Timing
+# ==================================
+AUTOSAVE_IDLE_MS = 800            # Save once typing pauses for this long
+AUTOSAVE_MAX_INTERVAL_MS = 5000   # ...but at least this often while edits keep coming
+
+class AutosaveQueue(QObject):
+    """Coalesces prompt edits and writes them on the background database writer.
+
+    The editor only calls mark_dirty() as the user types; nothing is serialized
+    or written at that point. On flush (idle timeout, max interval, focus
+    change, prompt switch or close) the queue asks the editor for the current
+    values of the dirty fields once, compares them to the last values written or
+    loaded, and submits an UPDATE of just the columns that changed.
+
+    collect_fields(prompt_id, field_names) must return {field: value} for the
+    requested fields, or an empty dict if that prompt is no longer loaded.
+    """
+    # Emitted on the GUI thread after a write succeeded
+    saved = pyqtSignal(int, dict) # prompt_id, {field: value} written
+    # Emitted on the writer thread when a write completes, delivered queued to
+    # the GUI thread: only that thread touches _saved and _in_flight
+    _write_finished = pyqtSignal(int, object, object) # prompt_id, changes, Future
+
+    def __init__(self, collect_fields, parent=None):
+        super().__init__(parent)
+        self._collect_fields = collect_fields
+        self._dirty = {}      # prompt_id -> set of fields edited since the last flush
+        self._saved = {}      # prompt_id -> {field: value} as last loaded or written
+        self._in_flight = {}  # prompt_id -> Future of the latest submitted write
+
+        self._idle_timer = QTimer(self)
+        self._idle_timer.setSingleShot(True)
+        self._idle_timer.timeout.connect(self.flush)
+        self._interval_timer = QTimer(self)
+        self._interval_timer.setSingleShot(True)
+        self._interval_timer.timeout.connect(self.flush)
+        self._write_finished.connect(self._on_write_finished)
+
+    def remember(self, prompt_id, **fields):
+        """Records field values known to be in the database (e.g. just loaded)."""
+        self._saved.setdefault(prompt_id, {}).update(fields)
+
+    def forget(self, prompt_id):
+        """Drops everything known about a prompt (e.g. after it was deleted)."""
+        self._dirty.pop(prompt_id, None)
+        self._saved.pop(prompt_id, None)
+
+    def mark_dirty(self, prompt_id, field):
+        self._dirty.setdefault(prompt_id, set()).add(field)
+        self._idle_timer.start(AUTOSAVE_IDLE_MS) # Restart: wait for a pause in typing
+        if not self._interval_timer.isActive():
+            self._interval_timer.start(AUTOSAVE_MAX_INTERVAL_MS)
+
+    def has_pending(self):
+        return bool(self._dirty)
+
+    def flush(self, wait=False):
+        """Submits a write for every prompt with unsaved edits.
+
+        With wait=True, blocks until all submitted writes have completed.
+        """
+        self._idle_timer.stop()
+        self._interval_timer.stop()
+        dirty, self._dirty = self._dirty, {}
+
+        for prompt_id, field_names in dirty.items():
+            values = self._collect_fields(prompt_id, field_names)
+            saved = self._saved.setdefault(prompt_id, {})
+            changes = {field: value for field, value in values.items() if saved.get(field) != value}
+            if not changes:
+                continue
+            saved.update(changes)
+            logger.debug("Autosaving %s for prompt %s", ", ".join(sorted(changes)), prompt_id)
+            future = db.submit_write(db.update_prompt_fields, prompt_id, **changes)
+            self._in_flight[prompt_id] = future
+            future.add_done_callback(functools.partial(self._write_finished.emit, prompt_id, changes))
+
+        if wait:
+            for prompt_id in list(self._in_flight):
+                self.wait_for(prompt_id)
+
+    def wait_for(self, prompt_id):
+        """Blocks until the latest write submitted for prompt_id has completed."""
+        future = self._in_flight.get(prompt_id)
+        if future is not None:
+            try:
+                future.result()
+            except Exception:
+                pass # Reported by _on_write_finished
+
+    def _on_write_finished(self, prompt_id, changes, future):
+        # Runs on the GUI thread (queued from the writer thread)
+        if self._in_flight.get(prompt_id) is future:
+            self._in_flight.pop(prompt_id, None)
+        error = future.exception()
+        if error is not None:
+            logger.error("Error autosaving prompt %s: %s", prompt_id, error)
+            saved = self._saved.get(prompt_id)
+            if saved is None:
+                return # Forgotten meanwhile (deleted): nothing to retry
+            # Retry on the next flush, which the timers schedule as for an edit
+            for field in changes:
+                saved.pop(field, None)
+                self.mark_dirty(prompt_id, field)
+            return
+        self.saved.emit(prompt_id, changes)
+
+# --- END OF FILE autosave.py ---
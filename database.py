@@ -1,17 +1,442 @@
 # --- START OF FILE database.py ---
 
 import sqlite3
+import difflib
+import hashlib
+import json
+import logging
+import math
 import os
+import re
+import threading
+import time
+import zlib
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from html.parser import HTMLParser
+from urllib.request import pathname2url
+
+from instrumentation import span, record_span, traced
+
+logger = logging.getLogger(__name__)
 
 DATABASE_NAME = 'prompts.db'
 
-def get_db_connection():
-    """Establishes a connection to the SQLite database."""
-    conn = sqlite3.connect(DATABASE_NAME)
+# --- Connection Manager ---
+# Opening a connection and re-issuing the pragmas on every call dominated the
+# cost of small queries (search popup, editor autosave). Connections are now
+# long-lived and opened lazily on first use.
+#
+# The database runs in WAL mode, where readers never wait for the writer and
+# the writer never waits for readers:
+# - Reads go through get_db_connection(), a read-only connection per thread.
+#   sqlite3 connections must not be used from two threads at once, so they
+#   are never shared; a thread only ever sees its own.
+# - All writes go through transaction(), which uses the one writer connection.
+#   _writer_lock serializes threads that write (GUI thread, background writer).
+# - A background thread checkpoints the WAL into the database file every
+#   CHECKPOINT_INTERVAL_S seconds, so commits rarely pay for a checkpoint.
+CONNECTION_PRAGMAS = (
+    "PRAGMA foreign_keys = ON",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -8000", # Negative value = size in KiB (~8 MB page cache)
+)
+WRITER_PRAGMAS = (
+    "PRAGMA journal_mode = WAL", # Persistent: stored in the database file
+    "PRAGMA synchronous = NORMAL", # In WAL mode still safe against corruption; only fsyncs on checkpoint
+    "PRAGMA wal_autocheckpoint = 10000", # Pages; a backstop, normally the checkpoint thread gets there first
+    "PRAGMA journal_size_limit = 67108864", # Truncate the WAL back to 64 MB after a checkpoint
+)
+CHECKPOINT_INTERVAL_S = 30
+BUSY_TIMEOUT_S = 5.0
+
+_thread_state = threading.local()
+_open_connections = [] # Every connection opened by any thread, for close_all_connections()
+_connections_lock = threading.Lock()
+_connections_generation = 0 # Bumped by close_all_connections() so threads reconnect
+
+_statement_tracer = None # Trace callback for new connections, set by check_query_plans()
+_writer_lock = threading.RLock() # Held for the duration of a transaction
+_writer = None # (connection, path, generation) of the writer connection
+
+def _open_connection(path, read_only=False):
+    """Opens and configures a new connection to the database at path."""
+    # isolation_level=None: statements autocommit unless wrapped in transaction(),
+    # which issues BEGIN/COMMIT explicitly.
+    # check_same_thread=False so the writer can be used by whichever thread
+    # holds _writer_lock, and so close_all_connections() can close any
+    # connection at shutdown.
+    if read_only:
+        uri = f"file:{pathname2url(os.path.abspath(path))}?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, isolation_level=None,
+                               check_same_thread=False, timeout=BUSY_TIMEOUT_S)
+    else:
+        conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False, timeout=BUSY_TIMEOUT_S)
     conn.row_factory = sqlite3.Row # Return rows as dictionary-like objects
-    conn.execute("PRAGMA foreign_keys = ON")
+    for pragma in CONNECTION_PRAGMAS:
+        conn.execute(pragma)
+    if not read_only:
+        for pragma in WRITER_PRAGMAS:
+            conn.execute(pragma)
+    # Used by the full-text index migration (later triggers index content_plain)
+    conn.create_function("html_to_text", 1, html_to_plain_text, deterministic=True)
+    if _statement_tracer is not None:
+        conn.set_trace_callback(_statement_tracer)
+    with _connections_lock:
+        _open_connections.append(conn)
     return conn
 
+def _get_writer_connection():
+    """Returns the writer connection, opening it (and the checkpoint thread) on first use."""
+    global _writer
+    with _writer_lock:
+        if _writer is None or _writer[1] != DATABASE_NAME or _writer[2] != _connections_generation:
+            if _writer is not None:
+                _close_connection(_writer[0])
+            # Opening the writer first creates the database file and switches it to WAL,
+            # which read-only connections cannot do themselves
+            _writer = (_open_connection(DATABASE_NAME), DATABASE_NAME, _connections_generation)
+            _start_checkpointer()
+        return _writer[0]
+
+def get_db_connection():
+    """Returns the calling thread's read-only connection, opening it on first use.
+
+    The connection stays open for the lifetime of the thread; callers must not
+    close it. Use transaction() for anything that writes.
+    """
+    conn = getattr(_thread_state, 'conn', None)
+    # Reopen if DATABASE_NAME changed or connections were closed since this thread connected
+    if (conn is None or _thread_state.path != DATABASE_NAME
+            or _thread_state.generation != _connections_generation):
+        if conn is not None:
+            _close_connection(conn)
+        _get_writer_connection()
+        conn = _open_connection(DATABASE_NAME, read_only=True)
+        _thread_state.conn = conn
+        _thread_state.path = DATABASE_NAME
+        _thread_state.generation = _connections_generation
+    return conn
+
+@contextmanager
+def transaction():
+    """Context manager wrapping a block in a single write transaction.
+
+    Yields a cursor on the writer connection. Commits when the block exits
+    normally and rolls back if it raises. Nested use joins the outer
+    transaction, so helpers can call each other freely. Other threads wait
+    for the transaction to finish before starting their own; readers do not.
+    Reads inside the block must use the yielded cursor to see its changes.
+    """
+    waiting_since = time.perf_counter()
+    with _writer_lock:
+        conn = _get_writer_connection()
+        if getattr(_thread_state, 'depth', 0) > 0:
+            _thread_state.depth += 1
+            try:
+                yield conn.cursor()
+            finally:
+                _thread_state.depth -= 1
+            return
+
+        conn.execute("BEGIN IMMEDIATE") # Take the write lock now rather than on the first write
+        record_span("database.transaction_wait", waiting_since, time.perf_counter())
+        _thread_state.depth = 1
+        _thread_state.pending_changes = []
+        try:
+            yield conn.cursor()
+        except BaseException:
+            conn.rollback()
+            _thread_state.pending_changes = [] # Nothing changed after all
+            raise
+        else:
+            with span("database.commit"):
+                conn.commit()
+        finally:
+            _thread_state.depth = 0
+    # Listeners run after the writer lock is released, so they can read freely
+    changes, _thread_state.pending_changes = _thread_state.pending_changes, []
+    for change in changes:
+        _notify_change(*change)
+
+def _close_connection(conn):
+    with _connections_lock:
+        if conn in _open_connections:
+            _open_connections.remove(conn)
+    try:
+        conn.close()
+    except sqlite3.Error as e:
+        logger.warning("Error closing database connection: %s", e)
+
+# --- WAL Checkpoints ---
+_checkpointer = None # (thread, stop event, database path)
+
+def _start_checkpointer():
+    global _checkpointer
+    if _checkpointer is not None:
+        if _checkpointer[0].is_alive() and _checkpointer[2] == DATABASE_NAME:
+            return
+        _stop_checkpointer()
+    stop_event = threading.Event()
+    thread = threading.Thread(target=_checkpoint_loop, args=(DATABASE_NAME, stop_event),
+                              name="db-checkpoint", daemon=True)
+    _checkpointer = (thread, stop_event, DATABASE_NAME)
+    thread.start()
+
+def _checkpoint_loop(path, stop_event):
+    # Uses its own connection: a PASSIVE checkpoint copies what it can without
+    # waiting for readers or blocking the writer
+    conn = None
+    try:
+        while not stop_event.wait(CHECKPOINT_INTERVAL_S):
+            if conn is None:
+                conn = _open_connection(path)
+            busy, wal_pages, copied_pages = conn.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchone()
+            if wal_pages > 0 and copied_pages < wal_pages:
+                logger.debug("WAL checkpoint: copied %d of %d pages (readers still active).", copied_pages, wal_pages)
+    except sqlite3.Error as e:
+        logger.warning("WAL checkpoint failed: %s", e)
+    finally:
+        if conn is not None:
+            _close_connection(conn)
+
+def _stop_checkpointer():
+    global _checkpointer
+    if _checkpointer is None:
+        return
+    thread, stop_event, _ = _checkpointer
+    _checkpointer = None
+    stop_event.set()
+    if thread is not threading.current_thread():
+        thread.join()
+
+# --- Change Notifications ---
+# Write functions report what they changed so in-memory caches can update
+# themselves instead of re-reading whole tables. Listeners are called as
+# listener(table, operation, item_id) with operation 'insert', 'update' or
+# 'delete', after the change is committed, on the thread that made it.
+# Moving a row to the trash is reported as a 'delete' and restoring it as an
+# 'insert'; its children go and come back with it, only the row itself is
+# reported. Bulk writes that touch too many rows to report one by one report
+# operation 'reload' with item_id None: anything cached from that table
+# should be read again.
+_change_listeners = []
+
+def add_change_listener(listener):
+    _change_listeners.append(listener)
+
+def remove_change_listener(listener):
+    if listener in _change_listeners:
+        _change_listeners.remove(listener)
+
+def _record_change(table, operation, item_id):
+    """Reports a change now, or when the surrounding transaction commits."""
+    if getattr(_thread_state, 'depth', 0) > 0:
+        _thread_state.pending_changes.append((table, operation, item_id))
+    else:
+        _notify_change(table, operation, item_id)
+
+def _notify_change(table, operation, item_id):
+    for listener in list(_change_listeners):
+        try:
+            listener(table, operation, item_id)
+        except Exception as e:
+            logger.exception("Error in database change listener: %s", e)
+
+# --- Background Writer ---
+# Writes the UI should not wait for (editor autosave) run on one dedicated
+# thread, in submission order, using that thread's own connection.
+_write_executor = None
+_write_executor_lock = threading.Lock()
+
+def submit_write(func, *args, **kwargs):
+    """Runs func(*args, **kwargs) on the background writer thread and returns its Future."""
+    global _write_executor
+    with _write_executor_lock:
+        if _write_executor is None:
+            _write_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-writer")
+        return _write_executor.submit(func, *args, **kwargs)
+
+def flush_writes():
+    """Blocks until every write submitted so far has been applied."""
+    submit_write(lambda: None).result()
+
+def _shutdown_writer():
+    global _write_executor
+    with _write_executor_lock:
+        executor, _write_executor = _write_executor, None
+    if executor is not None:
+        executor.shutdown(wait=True) # Let queued writes land
+
+def close_all_connections():
+    """Finishes pending background writes and closes every connection (call on application exit)."""
+    global _connections_generation, _writer
+    _shutdown_writer()
+    _stop_checkpointer()
+    with _writer_lock, _connections_lock: # Not in the middle of a transaction
+        connections = list(_open_connections)
+        _open_connections.clear()
+        _connections_generation += 1
+        if _writer is not None and _writer[0] in connections:
+            # Close the writer last: only a read-write connection can checkpoint
+            # and remove the WAL file when it is the last one to close
+            connections.remove(_writer[0])
+            connections.append(_writer[0])
+        _writer = None
+    for conn in connections:
+        try:
+            conn.close()
+        except sqlite3.Error as e:
+            logger.warning("Error closing database connection: %s", e)
+
+# --- Plain Text Extraction ---
+# Prompt content is stored as the HTML produced by QTextEdit.toHtml(). The
+# database layer must not depend on Qt, so the text is recovered with a small
+# HTML parser that gives the same text as QTextDocument.toPlainText() for
+# that HTML: one line per text block (paragraph, list item, heading, table
+# cell, ...), while the lists and tables around them add no lines of their
+# own. <br /> is a line break within its block, except in the paragraphs Qt
+# writes for empty lines. <hr /> is an empty line. Qt's HTML import also
+# puts an empty block before a table that starts the document and after
+# every table; text right after the table goes into that block, and so does
+# the next block element if the table's last cell was empty.
+_BLOCK_TAGS = {'p', 'div', 'li', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'pre', 'blockquote', 'td', 'th'}
+_CELL_TAGS = {'td', 'th'} # A line even when empty
+_SKIPPED_TAGS = {'head', 'style', 'script', 'title'}
+_EMPTY_PARAGRAPH_STYLE = '-qt-paragraph-type:empty' # Qt's <p> for an empty line; its <br /> is a placeholder
+
+class _PlainTextExtractor(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.lines = []
+        self._current = None # Text parts of the open block; None when no block is open
+        self._keep_empty = False # The open block is a line even without text
+        self._empty_paragraph = False
+        self._skip_depth = 0
+        self._pre_depth = 0
+        self._cell_start = 0 # Index in lines of the latest table cell's first line
+        self._after_table = False # The empty block after a table is pending
+        self._last_cell_empty = False
+
+    def _leave_table(self, next_item):
+        """Adds the empty line after a table, if next_item ('text', 'block', 'table' or 'end') leaves it empty."""
+        if not self._after_table:
+            return
+        self._after_table = False
+        if next_item == 'text' or (next_item == 'block' and self._last_cell_empty):
+            return # Goes into the block after the table
+        self.lines.append('')
+
+    def _open_block(self):
+        # A block opened inside one that has text (a nested list after its
+        # item's text) ends that one; an empty one is taken over (<td><p>)
+        if self._current:
+            self._end_block()
+        if self._current is None:
+            self._current = []
+
+    def _end_block(self):
+        if self._current is not None and (self._current or self._keep_empty):
+            self.lines.append(''.join(self._current))
+        self._current = None
+        self._keep_empty = False
+        self._empty_paragraph = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag in _SKIPPED_TAGS:
+            self._skip_depth += 1
+        elif tag in _BLOCK_TAGS:
+            self._leave_table('block')
+            self._open_block()
+            if tag in _CELL_TAGS:
+                self._keep_empty = True
+                self._cell_start = len(self.lines)
+            if tag == 'pre':
+                self._pre_depth += 1
+            if _EMPTY_PARAGRAPH_STYLE in (dict(attrs).get('style') or ''):
+                self._empty_paragraph = True
+        elif tag == 'table':
+            self._end_block()
+            self._leave_table('table')
+            if not self.lines:
+                self.lines.append('')
+        elif tag == 'hr':
+            self._end_block()
+            self._leave_table('block')
+            self.lines.append('')
+        elif tag == 'br':
+            if self._empty_paragraph:
+                self._keep_empty = True
+            else:
+                self._open_block_for_text()
+                self._current.append('\n')
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in ('br', 'hr'):
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if tag in _SKIPPED_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag in _BLOCK_TAGS:
+            if tag == 'pre':
+                self._pre_depth = max(0, self._pre_depth - 1)
+            self._end_block()
+        elif tag == 'table':
+            self._end_block()
+            self._after_table = True
+            self._last_cell_empty = not any(self.lines[self._cell_start:])
+
+    def _open_block_for_text(self):
+        if self._current is None:
+            self._leave_table('text')
+            self._current = [] # Text outside any block element starts one
+
+    def handle_data(self, data):
+        if self._skip_depth:
+            return
+        if not self._pre_depth:
+            # Qt writes a newline after tags; those are not text
+            data = data.strip('\n').replace('\n', ' ')
+        if not data or (self._current is None and not data.strip()):
+            return
+        self._open_block_for_text()
+        self._current.append(data)
+
+    def get_text(self):
+        self._end_block()
+        self._leave_table('end')
+        return '\n'.join(self.lines).replace('\xa0', ' ')
+
+def html_to_plain_text(html_content):
+    """Returns the plain text of stored prompt content (Qt rich-text HTML or plain text)."""
+    if not html_content:
+        return ''
+    if '<' not in html_content:
+        return html_content # Already plain text
+    extractor = _PlainTextExtractor()
+    try:
+        extractor.feed(html_content)
+        extractor.close()
+    except Exception as e:
+        logger.warning("Could not parse prompt HTML, indexing raw content: %s", e)
+        return html_content
+    return extractor.get_text()
+
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+
+def count_tokens(text):
+    """Approximate token count of plain text: words and punctuation marks."""
+    return sum(1 for _ in _TOKEN_PATTERN.finditer(text))
+
+def _derived_content_columns(content):
+    """Columns stored alongside content so readers never parse the HTML themselves."""
+    plain_text = html_to_plain_text(content)
+    return {'content_plain': plain_text, 'char_count': len(plain_text), 'token_count': count_tokens(plain_text)}
+
+
 def _add_column_if_not_exists(cursor, table_name, column_name, column_type, default_value=None):
     """Helper to add a column if it doesn't exist."""
     try:
@@ -19,7 +444,7 @@ def _add_column_if_not_exists(cursor, table_name, column_name, column_type, defa
         cursor.execute(f"PRAGMA table_info({table_name})")
         columns = [info['name'] for info in cursor.fetchall()]
         if column_name not in columns:
-            print(f"Adding column '{column_name}' to table '{table_name}'...")
+            logger.info("Adding column '%s' to table '%s'...", column_name, table_name)
             alter_sql = f"ALTER TABLE {table_name} ADD COLUMN {column_name} {column_type}"
             if default_value is not None:
                 # Need to quote string defaults
@@ -28,22 +453,27 @@ def _add_column_if_not_exists(cursor, table_name, column_name, column_type, defa
                 else:
                     alter_sql += f" DEFAULT {default_value}"
             cursor.execute(alter_sql)
-            print(f"Column '{column_name}' added successfully.")
+            logger.info("Column '%s' added successfully.", column_name)
         else:
-             print(f"Column '{column_name}' already exists in '{table_name}'.")
+             logger.debug("Column '%s' already exists in '%s'.", column_name, table_name)
 
     except sqlite3.OperationalError as e:
         # This specific error might occur if adding a column with default fails on older SQLite
         # but the PRAGMA check should prevent the ALTER attempt if column exists.
-        print(f"Warning: Could not add or verify column '{column_name}' in '{table_name}': {e}")
+        logger.warning("Could not add or verify column '%s' in '%s': %s", column_name, table_name, e)
 
 
-def initialize_database():
-    """Creates the database tables if they don't exist and adds missing columns."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    print("Initializing database and checking schema...")
+# --- Schema Migrations ---
+# The schema version is kept in PRAGMA user_version. Each migration brings the
+# database from the previous version to its own; pending migrations run in
+# order, each in its own transaction together with the version bump, so an
+# interrupted upgrade resumes where it stopped. A database that is already up
+# to date costs a single PRAGMA read at startup.
+#
+# Append new migrations to SCHEMA_MIGRATIONS; never edit one that has shipped.
 
+def _migration_1_base_schema(cursor):
+    """Tables, plus the columns that older versions of the app added later."""
     # Categories Table
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS categories (
@@ -54,8 +484,6 @@ def initialize_database():
     ''')
     _add_column_if_not_exists(cursor, "categories", "color", "TEXT", default_value='#e0e0e0')
     _add_column_if_not_exists(cursor, "categories", "order_index", "INTEGER", default_value=0)
-    cursor.execute("UPDATE categories SET order_index = id WHERE order_index IS NULL OR order_index = 0")
-
 
     # Sections Table
     cursor.execute('''
@@ -67,12 +495,8 @@ def initialize_database():
             /* color and order_index added via ALTER below if needed */
         )
     ''')
-    # --- ADD THIS LINE for section color ---
     _add_column_if_not_exists(cursor, "sections", "color", "TEXT", default_value='#d0d0d0') # Slightly different default maybe?
-    # --- END ADD ---
     _add_column_if_not_exists(cursor, "sections", "order_index", "INTEGER", default_value=0)
-    cursor.execute("UPDATE sections SET order_index = id WHERE order_index IS NULL OR order_index = 0")
-
 
     # Prompts Table
     cursor.execute('''
@@ -87,14 +511,265 @@ def initialize_database():
         )
     ''')
     _add_column_if_not_exists(cursor, "prompts", "order_index", "INTEGER", default_value=0)
-    cursor.execute("UPDATE prompts SET order_index = id WHERE order_index IS NULL OR order_index = 0")
 
+def _migration_2_gapped_order(cursor):
+    """Spaces existing order_index values ORDER_GAP apart and indexes sibling order."""
+    for table_name, parent_id_column in (("categories", None), ("sections", "category_id"), ("prompts", "section_id")):
+        parent_expression = parent_id_column or "NULL"
+        # Rows from before order_index existed have 0/NULL; like the old start-up
+        # fix-up did, they are ordered by id
+        cursor.execute(f"""
+            SELECT id, {parent_expression} AS parent_id FROM {table_name}
+            ORDER BY parent_id, COALESCE(NULLIF(order_index, 0), id), id
+        """)
+        updates = []
+        previous_parent, position = object(), 0
+        for row in cursor.fetchall():
+            if row['parent_id'] != previous_parent:
+                previous_parent, position = row['parent_id'], 0
+            position += 1
+            updates.append((position * ORDER_GAP, row['id']))
+        cursor.executemany(f"UPDATE {table_name} SET order_index = ? WHERE id = ?", updates)
+
+    # Sibling lookups by position (listing, next index, neighbours of a moved item)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_categories_order ON categories (order_index, id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_sections_order ON sections (category_id, order_index, id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_prompts_order ON prompts (section_id, order_index, id)")
+
+def _migration_3_full_text_search(cursor):
+    _setup_full_text_search(cursor)
 
-    conn.commit()
-    conn.close()
-    print("Database initialized/schema checked successfully.")
+def _migration_4_covering_prompt_index(cursor):
+    """Lets the prompts panel be listed from the index alone (see get_prompts)."""
+    # Replaces idx_prompts_order, which is a prefix of it. Its leading
+    # section_id also serves the search joins and ON DELETE CASCADE lookups,
+    # as idx_sections_order does for sections.category_id.
+    cursor.execute("DROP INDEX IF EXISTS idx_prompts_order")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_prompts_listing ON prompts (section_id, order_index, id, title)")
+
+def _migration_5_plain_text_content(cursor):
+    """Stores the plain text and size of every prompt's content next to the HTML."""
+    _add_column_if_not_exists(cursor, "prompts", "content_plain", "TEXT NOT NULL", default_value='')
+    _add_column_if_not_exists(cursor, "prompts", "char_count", "INTEGER NOT NULL", default_value=0)
+    _add_column_if_not_exists(cursor, "prompts", "token_count", "INTEGER NOT NULL", default_value=0)
+    cursor.execute("SELECT id, content FROM prompts")
+    cursor.executemany(
+        "UPDATE prompts SET content_plain = :content_plain, char_count = :char_count, token_count = :token_count WHERE id = :id",
+        [dict(_derived_content_columns(row['content']), id=row['id']) for row in cursor.fetchall()]
+    )
+    if FTS_AVAILABLE:
+        # Index the stored plain text instead of converting the HTML in SQL
+        _create_fts_triggers(cursor, "new.content_plain", "content_plain")
+
+def _migration_6_prompt_usage(cursor):
+    """Records how often and how recently each prompt was used (see Usage Functions)."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS prompt_usage (
+            prompt_id INTEGER PRIMARY KEY,
+            use_count INTEGER NOT NULL,
+            last_used REAL NOT NULL, /* Unix time */
+            frecency REAL NOT NULL,
+            FOREIGN KEY (prompt_id) REFERENCES prompts (id) ON DELETE CASCADE
+        )
+    ''')
+    # Most used prompts first (get_frequent_prompts)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_prompt_usage_frecency ON prompt_usage (frecency, prompt_id)")
+
+def _migration_7_content_blobs(cursor):
+    """Moves prompt bodies into content_blobs (see Content Storage)."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS content_blobs (
+            id INTEGER PRIMARY KEY,
+            hash BLOB NOT NULL UNIQUE, /* SHA-256 of the UTF-8 content */
+            data BLOB NOT NULL,
+            compressed INTEGER NOT NULL, /* 1 = zlib */
+            size INTEGER NOT NULL, /* Uncompressed bytes */
+            ref_count INTEGER NOT NULL DEFAULT 0 /* Prompts using it, kept by the triggers below */
+        )
+    ''')
+    _add_column_if_not_exists(cursor, "prompts", "content_id", "INTEGER REFERENCES content_blobs (id)")
+    _create_content_blob_triggers(cursor)
+    # prompts.content stays (NOT NULL, older app versions read it) but is emptied
+    last_id = 0
+    while True:
+        rows = cursor.execute("SELECT id, content FROM prompts WHERE id > ? ORDER BY id LIMIT ?",
+                              (last_id, CONTENT_MIGRATION_BATCH)).fetchall()
+        if not rows:
+            break
+        cursor.executemany("UPDATE prompts SET content_id = ?, content = '' WHERE id = ?",
+                           [(_store_content(cursor, row['content']), row['id']) for row in rows])
+        last_id = rows[-1]['id']
+
+def _migration_8_prompt_revisions(cursor):
+    """Stores earlier versions of prompts (see Revision History)."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS prompt_revisions (
+            id INTEGER PRIMARY KEY,
+            prompt_id INTEGER NOT NULL,
+            created_at REAL NOT NULL, /* Unix time of the first save folded into this revision */
+            updated_at REAL NOT NULL, /* ... and of the last one */
+            title TEXT NOT NULL,
+            description TEXT,
+            char_count INTEGER NOT NULL,
+            chain_length INTEGER NOT NULL, /* 0: data is the content; n: a delta, n after a keyframe */
+            data BLOB NOT NULL, /* zlib-compressed */
+            FOREIGN KEY (prompt_id) REFERENCES prompts (id) ON DELETE CASCADE
+        )
+    ''')
+    # A prompt's revisions in order; also serves ON DELETE CASCADE
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_prompt_revisions_prompt ON prompt_revisions (prompt_id, id)")
+
+def _migration_9_trash(cursor):
+    """Lets categories, sections and prompts be moved to the trash (see Trash Functions)."""
+    for table_name in ("categories", "sections", "prompts"):
+        _add_column_if_not_exists(cursor, table_name, "deleted_at", "REAL") # Unix time; NULL = not in the trash
+        # Only trashed rows are in it: lists the trash and finds expired items
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{table_name}_trash ON {table_name} (deleted_at) "
+                       f"WHERE deleted_at IS NOT NULL")
+    # get_prompts() filters out trashed prompts, so the listing index needs the column to stay covering
+    cursor.execute("DROP INDEX IF EXISTS idx_prompts_listing")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_prompts_listing ON prompts (section_id, order_index, id, title, deleted_at)")
+
+def _migration_10_plain_text_blocks(cursor):
+    """Recomputes the stored plain text of prompts with lists or tables (see Plain Text Extraction)."""
+    last_id = 0
+    while True:
+        rows = cursor.execute("""
+            SELECT p.id, p.content_plain, b.data, b.compressed FROM prompts p
+            LEFT JOIN content_blobs b ON b.id = p.content_id
+            WHERE p.id > ? ORDER BY p.id LIMIT ?
+        """, (last_id, CONTENT_MIGRATION_BATCH)).fetchall()
+        if not rows:
+            break
+        changed = []
+        for row in rows:
+            derived = _derived_content_columns(_decode_content(row['data'], row['compressed']))
+            if derived['content_plain'] != row['content_plain']: # Only those re-index their text
+                changed.append(dict(derived, id=row['id']))
+        cursor.executemany(
+            "UPDATE prompts SET content_plain = :content_plain, char_count = :char_count, token_count = :token_count WHERE id = :id",
+            changed)
+        last_id = rows[-1]['id']
+
+SCHEMA_MIGRATIONS = [
+    # (version, description, migration function)
+    (1, "base schema", _migration_1_base_schema),
+    (2, "gapped ordering", _migration_2_gapped_order),
+    (3, "full-text search index", _migration_3_full_text_search),
+    (4, "covering index for prompt lists", _migration_4_covering_prompt_index),
+    (5, "plain-text content columns", _migration_5_plain_text_content),
+    (6, "prompt usage log", _migration_6_prompt_usage),
+    (7, "content-addressed prompt bodies", _migration_7_content_blobs),
+    (8, "prompt revision history", _migration_8_prompt_revisions),
+    (9, "trash", _migration_9_trash),
+    (10, "plain text of lists and tables", _migration_10_plain_text_blocks),
+]
+# Migrations that free a lot of space; the file is compacted (VACUUM) after them
+_VACUUM_AFTER_MIGRATIONS = {7}
+SCHEMA_VERSION = SCHEMA_MIGRATIONS[-1][0]
+
+def get_schema_version():
+    return get_db_connection().execute("PRAGMA user_version").fetchone()[0]
+
+@traced
+def initialize_database():
+    """Brings the database schema up to date by running any pending migrations."""
+    current_version = get_schema_version()
+    if current_version == SCHEMA_VERSION:
+        return
+    if current_version > SCHEMA_VERSION:
+        logger.warning("Database schema version %d is newer than this app supports (%d).",
+                       current_version, SCHEMA_VERSION)
+        return
+
+    logger.info("Upgrading database schema from version %d to %d...", current_version, SCHEMA_VERSION)
+    for version, description, migrate in SCHEMA_MIGRATIONS:
+        if version <= current_version:
+            continue
+        logger.info("Applying migration %d: %s", version, description)
+        with span("database.migration", version=version), transaction() as cursor:
+            migrate(cursor)
+            cursor.execute(f"PRAGMA user_version = {version}") # Committed together with the migration
+    if any(current_version < version for version in _VACUUM_AFTER_MIGRATIONS):
+        logger.info("Compacting the database file...")
+        with span("database.vacuum"), _writer_lock:
+            _get_writer_connection().execute("VACUUM") # Cannot run inside a transaction
+    logger.info("Database schema is up to date.")
+
+# --- Full-Text Search Index ---
+# prompts_fts mirrors the title, description and plain-text content of every
+# prompt (rowid = prompts.id). It is kept in sync by triggers, so no Python
+# write path needs to know about it.
+FTS_TABLE = "prompts_fts"
+
+def _fts5_available():
+    try:
+        probe = sqlite3.connect(":memory:")
+        probe.execute("CREATE VIRTUAL TABLE fts5_probe USING fts5(x)")
+        probe.close()
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+FTS_AVAILABLE = _fts5_available()
+
+def _setup_full_text_search(cursor):
+    """Creates the FTS5 index and its sync triggers, back-filling it on first creation."""
+    if not FTS_AVAILABLE:
+        logger.warning("SQLite was built without FTS5, search falls back to title matching.")
+        return
+
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (FTS_TABLE,))
+    already_exists = cursor.fetchone() is not None
+
+    cursor.execute(f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+            title, description, content,
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '2 3'
+        )
+    """)
+    _create_fts_triggers(cursor, "html_to_text(new.content)", "content")
+
+    if not already_exists:
+        logger.info("Building full-text search index...")
+        cursor.execute(f"""
+            INSERT INTO {FTS_TABLE} (rowid, title, description, content)
+            SELECT id, title, COALESCE(description, ''), html_to_text(content) FROM prompts
+        """)
+
+def _create_fts_triggers(cursor, content_expression, content_column):
+    """(Re)creates the triggers that keep prompts_fts in sync with prompts.
+
+    content_expression gives the indexed text of the new row's content;
+    content_column is the prompts column whose updates must re-index it.
+    """
+    for trigger in ("prompts_fts_insert", "prompts_fts_delete", "prompts_fts_update"):
+        cursor.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    cursor.execute(f"""
+        CREATE TRIGGER prompts_fts_insert AFTER INSERT ON prompts BEGIN
+            INSERT INTO {FTS_TABLE} (rowid, title, description, content)
+            VALUES (new.id, new.title, COALESCE(new.description, ''), {content_expression});
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER prompts_fts_delete AFTER DELETE ON prompts BEGIN
+            DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER prompts_fts_update AFTER UPDATE OF title, description, {content_column} ON prompts BEGIN
+            DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+            INSERT INTO {FTS_TABLE} (rowid, title, description, content)
+            VALUES (new.id, new.title, COALESCE(new.description, ''), {content_expression});
+        END
+    """)
 
 # --- Helper to get next order index ---
+# order_index values are spaced ORDER_GAP apart so that an item can later be
+# moved between two siblings without renumbering them (see Reordering Functions).
+ORDER_GAP = 1024
+
 def _get_next_order_index(cursor, table_name, parent_id_column=None, parent_id=None):
     query = f"SELECT MAX(order_index) FROM {table_name}"
     params = []
@@ -104,268 +779,1516 @@ def _get_next_order_index(cursor, table_name, parent_id_column=None, parent_id=N
 
     cursor.execute(query, params)
     max_index = cursor.fetchone()[0]
-    return (max_index or 0) + 1
+    return (max_index or 0) + ORDER_GAP
 
 # --- Category Functions ---
 
 def add_category(name, color='#e0e0e0'):
-    conn = get_db_connection()
     try:
-        cursor = conn.cursor()
-        next_order_index = _get_next_order_index(cursor, "categories")
-        cursor.execute("INSERT INTO categories (name, color, order_index) VALUES (?, ?, ?)",
-                       (name, color, next_order_index))
-        conn.commit()
-        return cursor.lastrowid
+        with transaction() as cursor:
+            _release_trashed_category_name(cursor, name)
+            next_order_index = _get_next_order_index(cursor, "categories")
+            cursor.execute("INSERT INTO categories (name, color, order_index) VALUES (?, ?, ?)",
+                           (name, color, next_order_index))
+            _record_change("categories", "insert", cursor.lastrowid)
+            return cursor.lastrowid
     except sqlite3.IntegrityError:
-        print(f"Category '{name}' already exists.")
+        logger.warning("Category '%s' already exists.", name)
         return None
-    finally:
-        conn.close()
 
+@traced
 def get_categories():
-    conn = get_db_connection()
-    cursor = conn.cursor()
     # Order by the new column
-    cursor.execute("SELECT * FROM categories ORDER BY order_index")
-    categories = cursor.fetchall()
-    conn.close()
-    return categories
+    return get_db_connection().execute(
+        "SELECT * FROM categories WHERE deleted_at IS NULL ORDER BY order_index, id"
+    ).fetchall()
+
+def get_category(category_id):
+    return get_db_connection().execute("SELECT * FROM categories WHERE id = ?", (category_id,)).fetchone()
 
 def update_category(category_id, name, color=None):
-    conn = get_db_connection()
-    try:
-        cursor = conn.cursor()
+    with transaction() as cursor:
+        _release_trashed_category_name(cursor, name)
         if color:
             cursor.execute("UPDATE categories SET name = ?, color = ? WHERE id = ?", (name, color, category_id))
         else:
             # Don't update color if not provided
-             cursor.execute("UPDATE categories SET name = ? WHERE id = ?", (name, category_id))
-        conn.commit()
-    finally:
-        conn.close()
+            cursor.execute("UPDATE categories SET name = ? WHERE id = ?", (name, category_id))
+        _record_change("categories", "update", category_id)
 
 def update_category_color(category_id, color):
-     conn = get_db_connection()
-     try:
-         cursor = conn.cursor()
-         cursor.execute("UPDATE categories SET color = ? WHERE id = ?", (color, category_id))
-         conn.commit()
-     finally:
-         conn.close()
+    with transaction() as cursor:
+        cursor.execute("UPDATE categories SET color = ? WHERE id = ?", (color, category_id))
+        _record_change("categories", "update", category_id)
 
 def delete_category(category_id):
-    conn = get_db_connection()
-    try:
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM categories WHERE id = ?", (category_id,))
-        conn.commit() # Cascading delete should handle sections and prompts
-    finally:
-        conn.close()
+    """Moves a category, with its sections and prompts, to the trash (see Trash Functions)."""
+    _move_to_trash("categories", category_id)
 
 # --- Section Functions ---
 
 def add_section(name, category_id):
-    conn = get_db_connection()
-    try:
-        cursor = conn.cursor()
+    with transaction() as cursor:
         next_order_index = _get_next_order_index(cursor, "sections", "category_id", category_id)
         cursor.execute("INSERT INTO sections (name, category_id, order_index) VALUES (?, ?, ?)",
                        (name, category_id, next_order_index))
-        conn.commit()
+        _record_change("sections", "insert", cursor.lastrowid)
         return cursor.lastrowid
-    finally:
-        conn.close()
 
+@traced
 def get_sections(category_id):
-    conn = get_db_connection()
-    cursor = conn.cursor()
     # Order by the new column
-    cursor.execute("SELECT * FROM sections WHERE category_id = ? ORDER BY order_index", (category_id,))
-    sections = cursor.fetchall()
-    conn.close()
-    return sections
+    return get_db_connection().execute(
+        "SELECT * FROM sections WHERE category_id = ? AND deleted_at IS NULL ORDER BY order_index, id", (category_id,)
+    ).fetchall()
+
+def get_all_sections():
+    """Every section (outside the trash), grouped by category and in display order."""
+    return get_db_connection().execute("""
+        SELECT s.* FROM sections s
+        JOIN categories c ON c.id = s.category_id
+        WHERE s.deleted_at IS NULL AND c.deleted_at IS NULL
+        ORDER BY s.category_id, s.order_index, s.id
+    """).fetchall()
+
+def get_section(section_id):
+    return get_db_connection().execute("SELECT * FROM sections WHERE id = ?", (section_id,)).fetchone()
 
 def update_section(section_id, name):
-    conn = get_db_connection()
-    try:
-        cursor = conn.cursor()
+    with transaction() as cursor:
         cursor.execute("UPDATE sections SET name = ? WHERE id = ?", (name, section_id))
-        conn.commit()
-    finally:
-        conn.close()
+        _record_change("sections", "update", section_id)
 
 # (After delete_section function)
 
 def update_section_color(section_id, color):
-     """Updates the color for a specific section."""
-     conn = get_db_connection()
-     try:
-         cursor = conn.cursor()
-         cursor.execute("UPDATE sections SET color = ? WHERE id = ?", (color, section_id))
-         conn.commit()
-         print(f"Updated color for section {section_id} to {color}")
-     except Exception as e:
-          print(f"Error updating color for section {section_id}: {e}")
-     finally:
-         conn.close()
+    """Updates the color for a specific section."""
+    try:
+        with transaction() as cursor:
+            cursor.execute("UPDATE sections SET color = ? WHERE id = ?", (color, section_id))
+            _record_change("sections", "update", section_id)
+        logger.debug("Updated color for section %s to %s", section_id, color)
+    except Exception as e:
+        logger.error("Error updating color for section %s: %s", section_id, e)
 
 def delete_section(section_id):
-    conn = get_db_connection()
-    try:
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM sections WHERE id = ?", (section_id,))
-        conn.commit() # Cascading delete should handle prompts
-    finally:
-        conn.close()
+    """Moves a section, with its prompts, to the trash (see Trash Functions)."""
+    _move_to_trash("sections", section_id)
+
+# --- Content Storage ---
+# Prompt bodies (QTextEdit HTML) live in content_blobs, one row per distinct
+# body, keyed by its SHA-256: a copied prompt shares its body with the
+# original instead of storing it again. Bodies of CONTENT_COMPRESS_MIN_BYTES
+# or more are zlib-compressed (Qt's HTML is verbose and compresses well).
+# prompts.content_id points at the blob; triggers keep each blob's
+# ref_count equal to the number of prompts using it and delete it when it
+# drops to zero, including for prompts removed by ON DELETE CASCADE. Write
+# paths only call _store_content() and set content_id, in the transaction
+# that writes the prompt row: a blob no row points at is never deleted.
+# Prompt rows stay small: listing or searching prompts never reads bodies,
+# and get_prompt() only loads the body when 'content' is accessed.
+CONTENT_COMPRESS_MIN_BYTES = 256
+CONTENT_COMPRESSION_LEVEL = 6
+CONTENT_MIGRATION_BATCH = 1000 # Prompts converted per statement by migration 7
+
+def _create_content_blob_triggers(cursor):
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS prompts_blob_insert AFTER INSERT ON prompts
+        WHEN new.content_id IS NOT NULL BEGIN
+            UPDATE content_blobs SET ref_count = ref_count + 1 WHERE id = new.content_id;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS prompts_blob_delete AFTER DELETE ON prompts
+        WHEN old.content_id IS NOT NULL BEGIN
+            UPDATE content_blobs SET ref_count = ref_count - 1 WHERE id = old.content_id;
+            DELETE FROM content_blobs WHERE id = old.content_id AND ref_count <= 0;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS prompts_blob_update AFTER UPDATE OF content_id ON prompts
+        WHEN old.content_id IS NOT new.content_id BEGIN
+            UPDATE content_blobs SET ref_count = ref_count + 1 WHERE id = new.content_id;
+            UPDATE content_blobs SET ref_count = ref_count - 1 WHERE id = old.content_id;
+            DELETE FROM content_blobs WHERE id = old.content_id AND ref_count <= 0;
+        END
+    ''')
+
+def _store_content(cursor, content):
+    """Id of the blob holding content, added if no prompt has this body yet (ref_count 0 until used)."""
+    encoded = (content or '').encode('utf-8')
+    digest = hashlib.sha256(encoded).digest()
+    row = cursor.execute("SELECT id FROM content_blobs WHERE hash = ?", (digest,)).fetchone()
+    if row:
+        return row['id']
+    compressed = len(encoded) >= CONTENT_COMPRESS_MIN_BYTES
+    data = zlib.compress(encoded, CONTENT_COMPRESSION_LEVEL) if compressed else encoded
+    cursor.execute("INSERT INTO content_blobs (hash, data, compressed, size) VALUES (?, ?, ?, ?)",
+                   (digest, data, int(compressed), len(encoded)))
+    return cursor.lastrowid
+
+def _decode_content(data, compressed):
+    if data is None:
+        return ''
+    return (zlib.decompress(data) if compressed else bytes(data)).decode('utf-8')
+
+@traced
+def get_prompt_content(prompt_id):
+    """The stored body (HTML) of a prompt, or None if the prompt does not exist."""
+    row = get_db_connection().execute("""
+        SELECT b.data, b.compressed FROM prompts p
+        LEFT JOIN content_blobs b ON b.id = p.content_id
+        WHERE p.id = ?
+    """, (prompt_id,)).fetchone()
+    return _decode_content(row['data'], row['compressed']) if row else None
+
+class PromptRow(Mapping):
+    """A prompt as returned by get_prompt(): its row, plus 'content' read on first access."""
+
+    def __init__(self, row):
+        self._row = row
+        self._content = None
+
+    def __getitem__(self, key):
+        if key == 'content':
+            if self._content is None:
+                self._content = get_prompt_content(self._row['id']) or ''
+            return self._content
+        return self._row[key]
+
+    def __iter__(self):
+        yield from self._row.keys()
+        yield 'content'
+
+    def __len__(self):
+        return len(self._row.keys()) + 1
+
+    def keys(self):
+        return list(self)
 
 # --- Prompt Functions ---
 
+@traced
 def add_prompt(title, description, content, section_id):
-    conn = get_db_connection()
-    try:
-        cursor = conn.cursor()
+    with transaction() as cursor:
         next_order_index = _get_next_order_index(cursor, "prompts", "section_id", section_id)
-        cursor.execute("INSERT INTO prompts (title, description, content, section_id, order_index) VALUES (?, ?, ?, ?, ?)",
-                       (title, description, content, section_id, next_order_index))
-        conn.commit()
+        derived = _derived_content_columns(content)
+        cursor.execute("""
+            INSERT INTO prompts (title, description, content, content_id, content_plain, char_count, token_count, section_id, order_index)
+            VALUES (?, ?, '', ?, ?, ?, ?, ?, ?)
+        """, (title, description, _store_content(cursor, content), derived['content_plain'], derived['char_count'],
+              derived['token_count'], section_id, next_order_index))
+        _record_change("prompts", "insert", cursor.lastrowid)
         return cursor.lastrowid
-    finally:
-        conn.close()
 
+# Columns needed to list prompts; all of them (and deleted_at) are in
+# idx_prompts_listing, so listing a section never touches the table rows (or
+# the prompt bodies).
+PROMPT_LIST_COLUMNS = "id, title, section_id, order_index"
+
+@traced
 def get_prompts(section_id):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    # Order by the new column
-    cursor.execute("SELECT * FROM prompts WHERE section_id = ? ORDER BY order_index", (section_id,))
-    prompts = cursor.fetchall()
-    conn.close()
-    return prompts
+    """The prompts of a section in display order, without description or content."""
+    return get_db_connection().execute(
+        f"SELECT {PROMPT_LIST_COLUMNS} FROM prompts WHERE section_id = ? AND deleted_at IS NULL "
+        f"ORDER BY order_index, id", (section_id,)
+    ).fetchall()
+
+@traced
+def get_prompt_summary(prompt_id):
+    """One prompt with the same columns as get_prompts() (None if it is in the trash)."""
+    return get_db_connection().execute(
+        f"SELECT {PROMPT_LIST_COLUMNS} FROM prompts WHERE id = ? AND deleted_at IS NULL", (prompt_id,)
+    ).fetchone()
 
+# Columns of get_prompt(); the body is loaded separately, when accessed
+PROMPT_DETAIL_COLUMNS = "id, title, description, section_id, order_index, char_count, token_count"
+
+@traced
 def get_prompt(prompt_id):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM prompts WHERE id = ?", (prompt_id,))
-    prompt = cursor.fetchone()
-    conn.close()
-    return prompt
+    """One prompt as a PromptRow (None if it does not exist); row['content'] loads the body."""
+    row = get_db_connection().execute(
+        f"SELECT {PROMPT_DETAIL_COLUMNS} FROM prompts WHERE id = ?", (prompt_id,)
+    ).fetchone()
+    return PromptRow(row) if row else None
 
 def update_prompt(prompt_id, title, description, content):
-    conn = get_db_connection()
-    try:
-        cursor = conn.cursor()
-        cursor.execute("UPDATE prompts SET title = ?, description = ?, content = ? WHERE id = ?",
-                       (title, description, content, prompt_id))
-        conn.commit()
-    finally:
-        conn.close()
+    update_prompt_fields(prompt_id, title=title, description=description, content=content)
+
+PROMPT_EDITABLE_COLUMNS = ('title', 'description', 'content')
 
+@traced
+def update_prompt_fields(prompt_id, **fields):
+    """Updates only the given columns (title, description and/or content) of a prompt.
+
+    The new version is added to the prompt's revision history, folded into
+    the latest revision if that was saved moments ago (see Revision History).
+    """
+    _update_prompt_fields(prompt_id, fields, coalesce=True)
+
+def _update_prompt_fields(prompt_id, fields, coalesce):
+    unknown = set(fields) - set(PROMPT_EDITABLE_COLUMNS)
+    if unknown:
+        raise ValueError(f"Cannot update prompt column(s): {', '.join(sorted(unknown))}")
+    columns = [column for column in PROMPT_EDITABLE_COLUMNS if column in fields]
+    if not columns:
+        return
+    if 'content' in fields:
+        # Done here, i.e. on the background writer thread for autosaves
+        fields = dict(fields, **_derived_content_columns(fields['content']))
+        columns.remove('content')
+        columns += ['content_id', 'content_plain', 'char_count', 'token_count']
+    assignments = ", ".join(f"{column} = ?" for column in columns)
+    with transaction() as cursor:
+        previous = _prompt_state(cursor, prompt_id)
+        if previous is None:
+            return # No such prompt: storing the body would leave a blob nothing uses
+        if 'content' in fields:
+            fields['content_id'] = _store_content(cursor, fields['content'])
+        cursor.execute(f"UPDATE prompts SET {assignments} WHERE id = ?",
+                       [fields[column] for column in columns] + [prompt_id])
+        _record_change("prompts", "update", prompt_id)
+        _record_revision(cursor, prompt_id, previous, time.time(), coalesce)
+
+@traced
 def delete_prompt(prompt_id):
-    conn = get_db_connection()
-    try:
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM prompts WHERE id = ?", (prompt_id,))
-        conn.commit()
-    finally:
-        conn.close()
+    """Moves a prompt to the trash (see Trash Functions)."""
+    _move_to_trash("prompts", prompt_id)
+
+# --- Revision History ---
+# Every save of a prompt is kept as a revision (title, description, content)
+# so a bad edit can be undone, at a small cost:
+# - Autosaves come every few seconds while typing. A save within
+#   REVISION_COALESCE_S of the latest revision replaces it instead of adding
+#   one, for at most REVISION_COALESCE_MAX_S, so a burst of edits is one
+#   revision.
+# - Content is stored as a line-level delta (difflib) against the previous
+#   revision; every REVISION_KEYFRAME_INTERVAL-th revision (or a delta
+#   larger than the content) stores the full content instead. Rebuilding any
+#   revision reads one keyframe and at most REVISION_KEYFRAME_INTERVAL - 1
+#   deltas, however long the history.
+# - Each prompt keeps its REVISION_LIMIT latest revisions; the oldest kept
+#   one is turned into a keyframe when older ones are dropped.
+# The first edit of a prompt also records what it was before, so the very
+# first version can be restored too.
+REVISION_COALESCE_S = 120
+REVISION_COALESCE_MAX_S = 15 * 60
+REVISION_KEYFRAME_INTERVAL = 20
+REVISION_LIMIT = 100
+
+def _prompt_state(cursor, prompt_id):
+    """(title, description, content, char_count) of a prompt, or None if it does not exist."""
+    row = cursor.execute("""
+        SELECT p.title, p.description, p.char_count, b.data, b.compressed FROM prompts p
+        LEFT JOIN content_blobs b ON b.id = p.content_id
+        WHERE p.id = ?
+    """, (prompt_id,)).fetchone()
+    if row is None:
+        return None
+    return row['title'], row['description'], _decode_content(row['data'], row['compressed']), row['char_count']
+
+def _content_delta(old, new):
+    """Edit script turning old into new, by lines: [start, end] copies old lines, a string is new text."""
+    old_lines = old.splitlines(keepends=True)
+    new_lines = new.splitlines(keepends=True)
+    delta = []
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            delta.append([i1, i2])
+        elif j1 < j2: # replace/insert; a delete copies nothing
+            delta.append(''.join(new_lines[j1:j2]))
+    return delta
+
+def _apply_delta(old, delta):
+    old_lines = old.splitlines(keepends=True)
+    return ''.join(part if isinstance(part, str) else ''.join(old_lines[part[0]:part[1]]) for part in delta)
+
+def _encode_revision(content, base_content, chain_length):
+    """(chain_length, data) storing content as a delta against base_content, or as a keyframe (0, ...)."""
+    keyframe = zlib.compress(content.encode('utf-8'), CONTENT_COMPRESSION_LEVEL)
+    if base_content is None or chain_length >= REVISION_KEYFRAME_INTERVAL:
+        return 0, keyframe
+    delta = json.dumps(_content_delta(base_content, content), separators=(',', ':'))
+    delta = zlib.compress(delta.encode('utf-8'), CONTENT_COMPRESSION_LEVEL)
+    if len(delta) >= len(keyframe):
+        return 0, keyframe
+    return chain_length, delta
+
+def _revision_content(cursor, prompt_id, revision_id):
+    """Rebuilds the content of a revision from the nearest keyframe at or before it."""
+    rows = cursor.execute("""
+        SELECT chain_length, data FROM prompt_revisions
+        WHERE prompt_id = ? AND id <= ? ORDER BY id DESC LIMIT ?
+    """, (prompt_id, revision_id, REVISION_KEYFRAME_INTERVAL)).fetchall()
+    # Deltas of a chain whose start was dropped by _trim_revisions count
+    # from the old keyframe: walk back to the first keyframe found
+    chain = []
+    for row in rows:
+        chain.append(row['data'])
+        if row['chain_length'] == 0:
+            break
+    else:
+        raise ValueError(f"Revision {revision_id} has no keyframe")
+    content = zlib.decompress(chain.pop()).decode('utf-8')
+    while chain:
+        content = _apply_delta(content, json.loads(zlib.decompress(chain.pop())))
+    return content
+
+def _latest_revisions(cursor, prompt_id, count):
+    return cursor.execute("""
+        SELECT id, created_at, updated_at, title, description, chain_length FROM prompt_revisions
+        WHERE prompt_id = ? ORDER BY id DESC LIMIT ?
+    """, (prompt_id, count)).fetchall()
+
+def _add_revision(cursor, prompt_id, state, base, saved_at):
+    """Appends a revision with state = (title, description, content, char_count); base is the latest revision row."""
+    title, description, content, char_count = state
+    base_content = _revision_content(cursor, prompt_id, base['id']) if base else None
+    chain_length, data = _encode_revision(content, base_content, base['chain_length'] + 1 if base else 0)
+    cursor.execute("""
+        INSERT INTO prompt_revisions
+            (prompt_id, created_at, updated_at, title, description, char_count, chain_length, data)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """, (prompt_id, saved_at, saved_at, title, description, char_count, chain_length, data))
+
+def _record_revision(cursor, prompt_id, previous, saved_at, coalesce=True):
+    """Records a prompt's state after a save; previous is its state before it (see _prompt_state)."""
+    current = _prompt_state(cursor, prompt_id)
+    if current is None or current[:3] == previous[:3]:
+        return # Nothing a revision would show changed
+    latest = _latest_revisions(cursor, prompt_id, 2)
+    if not latest:
+        _add_revision(cursor, prompt_id, previous, None, saved_at) # The version before any recorded edit
+        latest = _latest_revisions(cursor, prompt_id, 1)
+        coalesce = False
+
+    # Only a revision with one before it is replaced, so the oldest one
+    # (the prompt before it was first edited) is never overwritten
+    if (coalesce and len(latest) == 2 and saved_at - latest[0]['updated_at'] <= REVISION_COALESCE_S
+            and saved_at - latest[0]['created_at'] <= REVISION_COALESCE_MAX_S):
+        replaced, base = latest
+        base_content = _revision_content(cursor, prompt_id, base['id'])
+        if (base['title'], base['description'], base_content) == current[:3]:
+            # The burst of edits was undone: the revision before it is the current state
+            cursor.execute("DELETE FROM prompt_revisions WHERE id = ?", (replaced['id'],))
+        else:
+            title, description, content, char_count = current
+            chain_length, data = _encode_revision(content, base_content, base['chain_length'] + 1)
+            cursor.execute("""
+                UPDATE prompt_revisions SET updated_at = ?, title = ?, description = ?, char_count = ?,
+                    chain_length = ?, data = ?
+                WHERE id = ?
+            """, (saved_at, title, description, char_count, chain_length, data, replaced['id']))
+    else:
+        _add_revision(cursor, prompt_id, current, latest[0], saved_at)
+        _trim_revisions(cursor, prompt_id)
+    _record_change("prompt_revisions", "update", prompt_id)
 
-def search_prompts_by_title(search_term):
-    """Searches prompts by title and returns detailed info including category and section."""
+def _trim_revisions(cursor, prompt_id, keep=REVISION_LIMIT):
+    """Drops all but the `keep` latest revisions of a prompt."""
+    oldest_kept = cursor.execute("""
+        SELECT id, chain_length FROM prompt_revisions
+        WHERE prompt_id = ? ORDER BY id DESC LIMIT 1 OFFSET ?
+    """, (prompt_id, keep - 1)).fetchone()
+    if oldest_kept is None:
+        return
+    if oldest_kept['chain_length'] > 0:
+        # Its delta chain starts at a revision about to be dropped
+        content = _revision_content(cursor, prompt_id, oldest_kept['id'])
+        cursor.execute("UPDATE prompt_revisions SET chain_length = 0, data = ? WHERE id = ?",
+                       (zlib.compress(content.encode('utf-8'), CONTENT_COMPRESSION_LEVEL), oldest_kept['id']))
+    cursor.execute("DELETE FROM prompt_revisions WHERE prompt_id = ? AND id < ?", (prompt_id, oldest_kept['id']))
+
+@traced
+def get_prompt_revisions(prompt_id):
+    """The revisions of a prompt, newest first, without their content.
+
+    Rows have id, created_at and updated_at (Unix time), title, description
+    and char_count. The newest one is the prompt as currently saved.
+    """
+    return get_db_connection().execute("""
+        SELECT id, created_at, updated_at, title, description, char_count FROM prompt_revisions
+        WHERE prompt_id = ? ORDER BY id DESC
+    """, (prompt_id,)).fetchall()
+
+@traced
+def get_prompt_revision(revision_id):
+    """One revision as a dict with prompt_id, title, description, content, ..., or None."""
     conn = get_db_connection()
-    cursor = conn.cursor()
-    query = """
+    row = conn.execute("""
+        SELECT id, prompt_id, created_at, updated_at, title, description, char_count FROM prompt_revisions
+        WHERE id = ?
+    """, (revision_id,)).fetchone()
+    if row is None:
+        return None
+    return dict(row, content=_revision_content(conn, row['prompt_id'], revision_id))
+
+@traced
+def restore_prompt_revision(revision_id):
+    """Makes a revision the prompt's current version (a new revision, so it can be undone); returns the prompt id."""
+    revision = get_prompt_revision(revision_id)
+    if revision is None:
+        return None
+    # Never folded into the latest revision: that would lose the version being replaced
+    _update_prompt_fields(revision['prompt_id'], {'title': revision['title'], 'description': revision['description'],
+                                                  'content': revision['content']}, coalesce=False)
+    return revision['prompt_id']
+
+# Search results carry row metadata only: the description is cut to a short
+# excerpt and the content is never included. Fetch it with
+# get_prompt_plain_text() when a result is actually copied or previewed.
+SEARCH_DESCRIPTION_CHARS = 200
+
+@traced
+def search_prompts_by_title(search_term, limit=-1, offset=0):
+    """Searches prompts by title and returns detailed info including category and section.
+
+    limit/offset select a page of the results (limit -1 = all).
+    """
+    query = f"""
         SELECT
             p.id AS prompt_id,
             p.title AS prompt_title,
-            p.description AS prompt_description,
-            p.content AS prompt_content,
+            substr(p.description, 1, {SEARCH_DESCRIPTION_CHARS}) AS prompt_description,
             s.name AS section_name,
             c.name AS category_name
         FROM prompts p
         JOIN sections s ON p.section_id = s.id
         JOIN categories c ON s.category_id = c.id
-        WHERE p.title LIKE ?
-        ORDER BY c.name, s.name, p.title -- Search results don't need custom order
+        WHERE p.title LIKE ? AND p.deleted_at IS NULL AND s.deleted_at IS NULL AND c.deleted_at IS NULL
+        ORDER BY c.name, s.name, p.title, p.id -- Search results don't need custom order
+        LIMIT ? OFFSET ?
     """
     like_term = f"%{search_term}%"
-    cursor.execute(query, (like_term,))
-    results = cursor.fetchall()
-    conn.close()
+    return get_db_connection().execute(query, (like_term, limit, offset)).fetchall()
+
+# Rows of the in-memory fuzzy search index (fuzzy_search.py): search result
+# metadata for every prompt outside the trash
+_PROMPT_SEARCH_ENTRY_QUERY = f"""
+    SELECT
+        p.id AS prompt_id,
+        p.title AS prompt_title,
+        substr(p.description, 1, {SEARCH_DESCRIPTION_CHARS}) AS prompt_description,
+        s.name AS section_name,
+        c.name AS category_name,
+        u.frecency
+    FROM prompts p
+    JOIN sections s ON p.section_id = s.id
+    JOIN categories c ON s.category_id = c.id
+    LEFT JOIN prompt_usage u ON u.prompt_id = p.id
+    WHERE p.deleted_at IS NULL AND s.deleted_at IS NULL AND c.deleted_at IS NULL
+"""
+
+@traced
+def get_prompt_search_entries():
+    return get_db_connection().execute(_PROMPT_SEARCH_ENTRY_QUERY).fetchall()
+
+def get_prompt_search_entry(prompt_id):
+    return get_db_connection().execute(_PROMPT_SEARCH_ENTRY_QUERY + " AND p.id = ?", (prompt_id,)).fetchone()
+
+@traced
+def get_prompt_plain_text(prompt_id):
+    """The plain text of a prompt's content (what gets copied), or None if it does not exist."""
+    row = get_db_connection().execute("SELECT content_plain FROM prompts WHERE id = ?", (prompt_id,)).fetchone()
+    return row[0] if row else None
+
+# Marker characters wrapped around matched terms by highlight()/snippet();
+# stripped again in _split_match_markers() which records their offsets.
+_MATCH_START = '\x02'
+_MATCH_END = '\x03'
+SEARCH_RESULT_LIMIT = 50
+
+def _build_fts_query(search_text):
+    """Turns free text into an FTS5 query: every word must match, the last one as a prefix."""
+    words = re.findall(r"\w+", search_text, re.UNICODE)
+    if not words:
+        return None
+    # Quote each word so FTS5 operators (AND, NEAR, -, ...) typed by the user are literal
+    terms = [f'"{word}"' for word in words[:-1]]
+    terms.append(f'"{words[-1]}"*')
+    return " ".join(terms)
+
+def _split_match_markers(marked_text):
+    """Removes the match markers from marked_text, returning (text, [(start, end), ...])."""
+    if not marked_text:
+        return '', []
+    parts = []
+    offsets = []
+    position = 0
+    start = None
+    for char in marked_text:
+        if char == _MATCH_START:
+            start = position
+        elif char == _MATCH_END:
+            if start is not None:
+                offsets.append((start, position))
+            start = None
+        else:
+            parts.append(char)
+            position += 1
+    return ''.join(parts), offsets
+
+@traced
+def search_prompts(search_text, limit=SEARCH_RESULT_LIMIT, offset=0):
+    """Ranked full-text search over prompt titles, descriptions and content.
+
+    Returns the page of results starting at offset (at most limit of them) as
+    a list of dicts with the same keys as search_prompts_by_title() plus
+    'rank' (bm25, lower is better), 'title_offsets' (matched character ranges in
+    the title), 'snippet' (matching excerpt of the content) and 'snippet_offsets'.
+    Falls back to title matching if SQLite lacks FTS5.
+    """
+    fts_query = _build_fts_query(search_text)
+    if not FTS_AVAILABLE or fts_query is None:
+        return [dict(row, rank=0.0, title_offsets=[], snippet='', snippet_offsets=[])
+                for row in search_prompts_by_title(search_text, limit, offset)]
+
+    query = f"""
+        SELECT
+            p.id AS prompt_id,
+            p.title AS prompt_title,
+            substr(p.description, 1, {SEARCH_DESCRIPTION_CHARS}) AS prompt_description,
+            s.name AS section_name,
+            c.name AS category_name,
+            bm25({FTS_TABLE}, 10.0, 3.0, 1.0) AS rank,
+            highlight({FTS_TABLE}, 0, :start, :end) AS marked_title,
+            snippet({FTS_TABLE}, 2, :start, :end, '…', 12) AS marked_snippet
+        FROM {FTS_TABLE}
+        JOIN prompts p ON p.id = {FTS_TABLE}.rowid
+        JOIN sections s ON p.section_id = s.id
+        JOIN categories c ON s.category_id = c.id
+        WHERE {FTS_TABLE} MATCH :query
+            AND p.deleted_at IS NULL AND s.deleted_at IS NULL AND c.deleted_at IS NULL
+        ORDER BY rank, p.id
+        LIMIT :limit OFFSET :offset
+    """
+    params = {'query': fts_query, 'start': _MATCH_START, 'end': _MATCH_END, 'limit': limit, 'offset': offset}
+    rows = get_db_connection().execute(query, params).fetchall()
+
+    results = []
+    for row in rows:
+        result = dict(row)
+        _, result['title_offsets'] = _split_match_markers(result.pop('marked_title'))
+        snippet_text, snippet_offsets = _split_match_markers(result.pop('marked_snippet'))
+        # Only surface a content snippet when the content itself matched
+        result['snippet'] = snippet_text if snippet_offsets else ''
+        result['snippet_offsets'] = snippet_offsets
+        results.append(result)
     return results
 
+# --- Usage Functions ---
+# Copying a prompt from the search popup counts as a use. Each prompt's
+# frecency blends how often and how recently it was used: every use adds 1,
+# and the total halves every FRECENCY_HALF_LIFE_S. It is stored as the key
+# log(total) + FRECENCY_DECAY_RATE * time, which does not change as time
+# passes, so prompts stay ranked by an index without rewriting any row; each
+# use updates its own row only. frecency_score() turns a key back into the
+# current decayed total.
+FRECENCY_HALF_LIFE_S = 14 * 24 * 3600 # Two weeks
+FRECENCY_DECAY_RATE = math.log(2) / FRECENCY_HALF_LIFE_S
+
+def _add_use_to_frecency(frecency, used_at):
+    """The frecency key after one more use at used_at (frecency None = first use)."""
+    use_key = FRECENCY_DECAY_RATE * used_at # log(1) + rate * time
+    if frecency is None:
+        return use_key
+    high, low = max(frecency, use_key), min(frecency, use_key)
+    return high + math.log1p(math.exp(low - high)) # log(e^frecency + e^use_key), without overflow
+
+def frecency_score(frecency, now=None):
+    """The current decayed use count for a stored frecency key (0.0 if never used)."""
+    if frecency is None:
+        return 0.0
+    now = time.time() if now is None else now
+    return math.exp(frecency - FRECENCY_DECAY_RATE * now)
+
+@traced
+def record_prompt_use(prompt_id, used_at=None):
+    """Counts one use of a prompt (used_at: Unix time, default now). Ignored if the prompt is gone."""
+    used_at = time.time() if used_at is None else used_at
+    with transaction() as cursor:
+        cursor.execute("SELECT frecency FROM prompt_usage WHERE prompt_id = ?", (prompt_id,))
+        row = cursor.fetchone()
+        frecency = _add_use_to_frecency(row['frecency'] if row else None, used_at)
+        cursor.execute("""
+            INSERT INTO prompt_usage (prompt_id, use_count, last_used, frecency)
+            SELECT id, 1, ?, ? FROM prompts WHERE id = ?
+            ON CONFLICT (prompt_id) DO UPDATE SET
+                use_count = use_count + 1, last_used = excluded.last_used, frecency = excluded.frecency
+        """, (used_at, frecency, prompt_id))
+        if cursor.rowcount:
+            _record_change("prompt_usage", "update", prompt_id)
+
+@traced
+def get_frequent_prompts(limit=SEARCH_RESULT_LIMIT, offset=0):
+    """The most used prompts, highest frecency first, as rows shaped like get_prompt_search_entries()."""
+    query = f"""
+        SELECT
+            p.id AS prompt_id,
+            p.title AS prompt_title,
+            substr(p.description, 1, {SEARCH_DESCRIPTION_CHARS}) AS prompt_description,
+            s.name AS section_name,
+            c.name AS category_name,
+            u.frecency
+        FROM prompt_usage u
+        JOIN prompts p ON p.id = u.prompt_id
+        JOIN sections s ON p.section_id = s.id
+        JOIN categories c ON s.category_id = c.id
+        WHERE p.deleted_at IS NULL AND s.deleted_at IS NULL AND c.deleted_at IS NULL
+        ORDER BY u.frecency DESC, u.prompt_id DESC
+        LIMIT ? OFFSET ?
+    """
+    return get_db_connection().execute(query, (limit, offset)).fetchall()
+
+# --- Bulk Import/Export Functions ---
+# The whole library as a stream of flat records, parents before children:
+#   {'type': 'category', 'name', 'color'}
+#   {'type': 'section', 'category', 'name', 'color'}
+#   {'type': 'prompt', 'category', 'section', 'title', 'description', 'content'}
+# Sections and prompts name their parents, so a file of prompt records alone
+# is enough (other apps' exports). library_io.py reads and writes the files.
+IMPORT_BATCH_SIZE = 1000 # Prompt rows per executemany()
+
+def export_library_records():
+    """Yields the library as records, in display order, reading one section's prompts at a time.
+
+    The trash is not exported. Reads from a single snapshot, so writes made
+    while the records are consumed are not seen halfway.
+    """
+    # A connection of its own: the snapshot stays open between yields, and
+    # must not leak into this thread's other reads (or be left open if the
+    # generator is abandoned: closing the connection ends it)
+    _get_writer_connection() # Creates the database file first, as in get_db_connection()
+    conn = _open_connection(DATABASE_NAME, read_only=True)
+    try:
+        conn.execute("BEGIN") # Read transaction: one consistent snapshot for the whole export
+        categories = conn.execute(
+            "SELECT id, name, color FROM categories WHERE deleted_at IS NULL ORDER BY order_index, id"
+        )
+        for category in categories:
+            yield {'type': 'category', 'name': category['name'], 'color': category['color']}
+            sections = conn.execute(
+                "SELECT id, name, color FROM sections WHERE category_id = ? AND deleted_at IS NULL "
+                "ORDER BY order_index, id", (category['id'],)
+            )
+            for section in sections:
+                yield {'type': 'section', 'category': category['name'], 'name': section['name'],
+                       'color': section['color']}
+                prompts = conn.execute("""
+                    SELECT p.title, p.description, b.data, b.compressed FROM prompts p
+                    LEFT JOIN content_blobs b ON b.id = p.content_id
+                    WHERE p.section_id = ? AND p.deleted_at IS NULL ORDER BY p.order_index, p.id
+                """, (section['id'],))
+                for prompt in prompts:
+                    yield {'type': 'prompt', 'category': category['name'], 'section': section['name'],
+                           'title': prompt['title'], 'description': prompt['description'],
+                           'content': _decode_content(prompt['data'], prompt['compressed'])}
+    finally:
+        _close_connection(conn)
+
+class _LibraryImport:
+    """State of one import_library_records() call: ids of the parents seen so far, and of the rows added."""
+
+    def __init__(self):
+        self.cursor = None # The current batch's
+        self.record_count = 0
+        self.counts = {'categories': 0, 'sections': 0, 'prompts': 0}
+        self.category_ids = {}      # name -> id
+        self.section_ids = {}       # (category id, name) -> id
+        self.next_prompt_order = {} # section id -> order_index of its next imported prompt
+        self.added = []             # (table, first id, last id) of the rows added by committed batches
+        self.batch_added = []       # ...and by the current batch, until it commits
+
+    def category_id(self, name, color=None):
+        """Id of the category called name, added if there is none."""
+        category_id = self.category_ids.get(name)
+        if category_id is None:
+            self.cursor.execute("SELECT id FROM categories WHERE name = ? AND deleted_at IS NULL", (name,))
+            row = self.cursor.fetchone()
+            if row:
+                category_id = row['id']
+            else:
+                _release_trashed_category_name(self.cursor, name)
+                order_index = _get_next_order_index(self.cursor, "categories")
+                self.cursor.execute("INSERT INTO categories (name, color, order_index) VALUES (?, ?, ?)",
+                                    (name, color or '#e0e0e0', order_index))
+                category_id = self.cursor.lastrowid
+                self.counts['categories'] += 1
+                self.batch_added.append(("categories", category_id, category_id))
+                _record_change("categories", "insert", category_id)
+            self.category_ids[name] = category_id
+        return category_id
+
+    def section_id(self, category_name, name, color=None):
+        """Id of the first section called name in the category, added (with the category) if there is none."""
+        category_id = self.category_id(category_name)
+        section_id = self.section_ids.get((category_id, name))
+        if section_id is None:
+            self.cursor.execute(
+                "SELECT id FROM sections WHERE category_id = ? AND name = ? AND deleted_at IS NULL "
+                "ORDER BY order_index, id LIMIT 1",
+                (category_id, name)
+            )
+            row = self.cursor.fetchone()
+            if row:
+                section_id = row['id']
+            else:
+                order_index = _get_next_order_index(self.cursor, "sections", "category_id", category_id)
+                self.cursor.execute("INSERT INTO sections (name, category_id, order_index) VALUES (?, ?, ?)",
+                                    (name, category_id, order_index))
+                section_id = self.cursor.lastrowid
+                if color:
+                    self.cursor.execute("UPDATE sections SET color = ? WHERE id = ?", (color, section_id))
+                self.counts['sections'] += 1
+                self.batch_added.append(("sections", section_id, section_id))
+                _record_change("sections", "insert", section_id)
+            self.section_ids[(category_id, name)] = section_id
+        return section_id
+
+    def prompt_row(self, record):
+        """The INSERT parameters for a prompt record, placed after the section's last prompt."""
+        section_id = self.section_id(record['category'], record['section'])
+        order_index = self.next_prompt_order.get(section_id)
+        if order_index is None:
+            order_index = _get_next_order_index(self.cursor, "prompts", "section_id", section_id)
+        self.next_prompt_order[section_id] = order_index + ORDER_GAP
+        content = record['content']
+        derived = _derived_content_columns(content)
+        return (record['title'], record.get('description') or '', _store_content(self.cursor, content),
+                derived['content_plain'], derived['char_count'], derived['token_count'], section_id, order_index)
+
+    def add_prompt_rows(self, rows):
+        _insert_prompt_rows(self.cursor, rows)
+        # The ids are consecutive: AUTOINCREMENT, and nobody else writes meanwhile
+        last_id = self.cursor.execute("SELECT max(id) FROM prompts").fetchone()[0]
+        self.batch_added.append(("prompts", last_id - len(rows) + 1, last_id))
+        self.counts['prompts'] += len(rows)
+
+@traced
+def import_library_records(records, batch_size=IMPORT_BATCH_SIZE):
+    """Adds the categories, sections and prompts of an iterable of records (see above).
+
+    Prompts are written batch_size rows per executemany(), each batch (with
+    the categories and sections added for it) in a transaction of its own:
+    memory stays constant however many records there are, and the app's own
+    writes run between batches rather than waiting for the whole import.
+    If the import fails, what its earlier batches added is deleted again, so
+    the library is left as it was. Categories and sections are matched by
+    name (trashed ones are ignored) and only added when missing; prompts are
+    always added, after the existing ones. Raises ValueError for a record
+    without a name/title or content. Returns the number of rows added, as
+    {'categories': n, 'sections': n, 'prompts': n}.
+    """
+    state = _LibraryImport()
+    records = iter(records)
+    try:
+        while _import_library_batch(state, records, batch_size):
+            pass
+    except BaseException:
+        _undo_library_import(state)
+        raise
+    return state.counts
+
+def _import_library_batch(state, records, batch_size):
+    """Imports the records up to the next batch_size prompts in one transaction. Returns False after the last one."""
+    more = False
+    with transaction() as cursor:
+        state.cursor = cursor
+        batch = []
+        for record in records:
+            state.record_count += 1
+            record_type = record.get('type', 'prompt')
+            try:
+                if record_type == 'category':
+                    state.category_id(record['name'], record.get('color'))
+                elif record_type == 'section':
+                    state.section_id(record['category'], record['name'], record.get('color'))
+                elif record_type == 'prompt':
+                    if not record.get('title') or record.get('content') is None:
+                        raise KeyError('title' if not record.get('title') else 'content')
+                    batch.append(state.prompt_row(record))
+                else:
+                    raise ValueError(f"Record {state.record_count}: unknown type '{record_type}'")
+            except KeyError as e:
+                raise ValueError(f"Record {state.record_count} ({record_type}): missing {e}") from None
+            if len(batch) >= batch_size:
+                more = True
+                break
+        if batch:
+            state.add_prompt_rows(batch)
+            _record_change("prompts", "reload", None)
+    state.added += state.batch_added
+    state.batch_added = []
+    return more
+
+def _undo_library_import(state):
+    """Deletes the rows added by the committed batches of a failed import.
+
+    Sections and categories the app has given children of its own meanwhile
+    are kept.
+    """
+    if not state.added:
+        return
+    ranges = {'prompts': [], 'sections': [], 'categories': []}
+    for table, first_id, last_id in state.added:
+        ranges[table].append((first_id, last_id))
+    logger.warning("Import failed: removing the %s prompt(s) already imported.",
+                   sum(last_id - first_id + 1 for first_id, last_id in ranges['prompts']))
+    children = {'sections': ("prompts", "section_id"), 'categories': ("sections", "category_id")}
+    try:
+        with transaction() as cursor:
+            for table_name, table_ranges in ranges.items(): # Children first
+                keep_parents = ""
+                if table_name in children:
+                    child_table, parent_id_column = children[table_name]
+                    keep_parents = (f" AND NOT EXISTS (SELECT 1 FROM {child_table} "
+                                    f"WHERE {parent_id_column} = {table_name}.id)")
+                for first_id, last_id in table_ranges:
+                    cursor.execute(f"DELETE FROM {table_name} WHERE id BETWEEN ? AND ?{keep_parents}",
+                                   (first_id, last_id))
+                    if table_name != 'prompts' and cursor.rowcount:
+                        _record_change(table_name, "delete", first_id)
+            if ranges['prompts']:
+                _record_change("prompts", "reload", None)
+    except sqlite3.Error as e:
+        logger.error("Error removing a failed import: %s", e)
+
+def _insert_prompt_rows(cursor, rows):
+    cursor.executemany("""
+        INSERT INTO prompts (title, description, content, content_id, content_plain, char_count, token_count, section_id, order_index)
+        VALUES (?, ?, '', ?, ?, ?, ?, ?, ?)
+    """, rows)
+
+# --- Clone Functions ---
+# Copy/paste duplicates whole subtrees in one transaction with set-based
+# INSERT ... SELECT statements: one statement for all the sections of a
+# category and one for all their prompts, however many there are. Prompts
+# keep their stored plain text and counts (no HTML parsing) and share the
+# source's body blob; they are not given its usage history. Copies keep
+# colors and the order of their children, and are placed after the last
+# sibling at the destination. Children in the trash are not copied.
+CLONE_NAME_SUFFIX = " (Copy)"
+
+# Columns copied as-is from a source prompt; section_id and order_index are set per clone.
+# Copies share the source's body blob (content_id); the triggers count the new references.
+_CLONED_PROMPT_COLUMNS = "title, description, content, content_id, content_plain, char_count, token_count"
+
+def _unique_category_name(cursor, name):
+    """name + CLONE_NAME_SUFFIX, numbered if a category of that name exists already."""
+    candidate, number = name + CLONE_NAME_SUFFIX, 1
+    while cursor.execute("SELECT 1 FROM categories WHERE name = ?", (candidate,)).fetchone():
+        number += 1
+        candidate = f"{name} (Copy {number})"
+    return candidate
+
+def _clone_section_prompts(cursor, source_section_id, section_id):
+    cursor.execute(f"""
+        INSERT INTO prompts ({_CLONED_PROMPT_COLUMNS}, section_id, order_index)
+        SELECT {_CLONED_PROMPT_COLUMNS}, ?, order_index FROM prompts WHERE section_id = ? AND deleted_at IS NULL
+        ORDER BY order_index, id
+    """, (section_id, source_section_id))
+
+@traced
+def clone_category(category_id, name=None):
+    """Duplicates a category with all its sections and prompts; returns the new category's id.
+
+    name defaults to the source's name + " (Copy)" (numbered if taken).
+    Returns None if the category does not exist or is in the trash.
+    """
+    with transaction() as cursor:
+        source = cursor.execute("SELECT name, color FROM categories WHERE id = ? AND deleted_at IS NULL",
+                                (category_id,)).fetchone()
+        if source is None:
+            return None
+        name = name or _unique_category_name(cursor, source['name'])
+        _release_trashed_category_name(cursor, name)
+        order_index = _get_next_order_index(cursor, "categories")
+        cursor.execute("INSERT INTO categories (name, color, order_index) VALUES (?, ?, ?)",
+                       (name, source['color'], order_index))
+        new_category_id = cursor.lastrowid
+        _record_change("categories", "insert", new_category_id)
+
+        # Sections are inserted in display order, so the n-th new section
+        # (by order_index, id) is the copy of the n-th source section
+        cursor.execute("""
+            INSERT INTO sections (name, category_id, color, order_index)
+            SELECT name, ?, color, order_index FROM sections WHERE category_id = ? AND deleted_at IS NULL
+            ORDER BY order_index, id
+        """, (new_category_id, category_id))
+        if cursor.rowcount:
+            cursor.execute(f"""
+                WITH source AS (
+                    SELECT id, ROW_NUMBER() OVER (ORDER BY order_index, id) AS position
+                    FROM sections WHERE category_id = ? AND deleted_at IS NULL
+                ), copy AS (
+                    SELECT id, ROW_NUMBER() OVER (ORDER BY order_index, id) AS position
+                    FROM sections WHERE category_id = ?
+                )
+                INSERT INTO prompts ({_CLONED_PROMPT_COLUMNS}, section_id, order_index)
+                SELECT {", ".join("p." + column for column in _CLONED_PROMPT_COLUMNS.split(", "))},
+                       copy.id, p.order_index
+                FROM source
+                JOIN copy ON copy.position = source.position
+                JOIN prompts p ON p.section_id = source.id
+                WHERE p.deleted_at IS NULL
+            """, (category_id, new_category_id))
+            # The new prompts are only reported through their new sections:
+            # caches re-read a section's prompts when they first load it
+            for row in cursor.execute("SELECT id FROM sections WHERE category_id = ?", (new_category_id,)).fetchall():
+                _record_change("sections", "insert", row['id'])
+        return new_category_id
+
+@traced
+def clone_section(section_id, category_id=None, name=None):
+    """Duplicates a section with all its prompts into category_id (default: its own); returns the new id.
+
+    name defaults to the source's name + " (Copy)". Returns None if the
+    section does not exist or is in the trash (by itself or with its category).
+    """
+    with transaction() as cursor:
+        source = cursor.execute("""
+            SELECT s.name, s.color, s.category_id FROM sections s
+            JOIN categories c ON c.id = s.category_id
+            WHERE s.id = ? AND s.deleted_at IS NULL AND c.deleted_at IS NULL
+        """, (section_id,)).fetchone()
+        if source is None:
+            return None
+        category_id = category_id if category_id is not None else source['category_id']
+        order_index = _get_next_order_index(cursor, "sections", "category_id", category_id)
+        cursor.execute("INSERT INTO sections (name, category_id, color, order_index) VALUES (?, ?, ?, ?)",
+                       (name or source['name'] + CLONE_NAME_SUFFIX, category_id, source['color'], order_index))
+        new_section_id = cursor.lastrowid
+        _record_change("sections", "insert", new_section_id) # Covers its prompts, as in clone_category()
+        _clone_section_prompts(cursor, section_id, new_section_id)
+        return new_section_id
+
+@traced
+def clone_prompt(prompt_id, section_id=None, title=None):
+    """Duplicates a prompt at the end of section_id (default: its own); returns the new id.
+
+    title defaults to the source's title + " (Copy)". Returns None if the
+    prompt does not exist or is in the trash (by itself or with its section
+    or category).
+    """
+    with transaction() as cursor:
+        source = cursor.execute("""
+            SELECT p.title, p.section_id FROM prompts p
+            JOIN sections s ON s.id = p.section_id
+            JOIN categories c ON c.id = s.category_id
+            WHERE p.id = ? AND p.deleted_at IS NULL AND s.deleted_at IS NULL AND c.deleted_at IS NULL
+        """, (prompt_id,)).fetchone()
+        if source is None:
+            return None
+        section_id = section_id if section_id is not None else source['section_id']
+        order_index = _get_next_order_index(cursor, "prompts", "section_id", section_id)
+        cursor.execute(f"""
+            INSERT INTO prompts ({_CLONED_PROMPT_COLUMNS}, section_id, order_index)
+            SELECT ?, {_CLONED_PROMPT_COLUMNS.split(", ", 1)[1]}, ?, ? FROM prompts WHERE id = ?
+        """, (title or source['title'] + CLONE_NAME_SUFFIX, section_id, order_index, prompt_id))
+        _record_change("prompts", "insert", cursor.lastrowid)
+        return cursor.lastrowid
+
+# --- Trash Functions ---
+# Deleting a category, section or prompt moves it to the trash: its
+# deleted_at is set, one UPDATE of one row however big its subtree, and
+# every query leaves it out. Its children keep deleted_at NULL and are hidden
+# through their parent, so restore_item() is a single UPDATE too. Rows are
+# really deleted later, in the background (schedule_trash_purge()): items in
+# the trash for TRASH_RETENTION_S are removed PURGE_BATCH_SIZE prompts per
+# short transaction, so other writes (autosaves) get the writer between
+# batches and no delete ever waits for a whole subtree. Deleting from the
+# trash ("permanently") sets deleted_at to TRASH_PURGE_NOW: the item leaves
+# the trash list at once and is purged on the next run.
+# Category names are UNIQUE, trashed categories included: a trashed category
+# gives up its name (it is renamed) when a new one needs it.
+TRASH_RETENTION_S = 30 * 24 * 3600 # Thirty days
+PURGE_BATCH_SIZE = 500 # Prompts (with their revisions and usage) deleted per transaction
+TRASH_PURGE_NOW = 0 # deleted_at of items to purge on the next run, whatever their age
+
+# Parent table and parent id column of each trashable table
+_TRASH_PARENTS = {'prompts': ('sections', 'section_id'), 'sections': ('categories', 'category_id'), 'categories': None}
+# At most ? prompts under a trashed section or category (its id first)
+_PURGE_PROMPT_QUERIES = {
+    'sections': "SELECT id FROM prompts WHERE section_id = ? LIMIT ?",
+    'categories': "SELECT p.id FROM sections s JOIN prompts p ON p.section_id = s.id WHERE s.category_id = ? LIMIT ?",
+}
+_trash_purge_running = False # A purge is queued or running on the background writer
+
+def _move_to_trash(table_name, item_id):
+    with transaction() as cursor:
+        cursor.execute(f"UPDATE {table_name} SET deleted_at = ? WHERE id = ? AND deleted_at IS NULL",
+                       (time.time(), item_id))
+        if cursor.rowcount:
+            _record_change(table_name, "delete", item_id) # Gone, as far as caches are concerned
+
+def _release_trashed_category_name(cursor, name):
+    """Renames the trashed category called name (if any), so that a new or renamed category can use it."""
+    row = cursor.execute("SELECT id FROM categories WHERE name = ? AND deleted_at IS NOT NULL", (name,)).fetchone()
+    if row:
+        cursor.execute("UPDATE categories SET name = ? WHERE id = ?", (f"{name} (deleted {row['id']})", row['id']))
+
+@traced
+def get_trash():
+    """The items in the trash, most recently deleted first.
+
+    Each is a dict with 'type' ('category', 'section' or 'prompt'), 'id',
+    'name' (a prompt's title), 'path' (where it was: "Category > Section",
+    '' for a category) and 'deleted_at' (Unix time).
+    """
+    conn = get_db_connection()
+    items = [dict(row, type='category', path='') for row in conn.execute(
+        "SELECT id, name, deleted_at FROM categories WHERE deleted_at > ?", (TRASH_PURGE_NOW,)
+    )]
+    items += [dict(row, type='section') for row in conn.execute("""
+        SELECT s.id, s.name, s.deleted_at, c.name AS path FROM sections s
+        JOIN categories c ON c.id = s.category_id
+        WHERE s.deleted_at > ?
+    """, (TRASH_PURGE_NOW,))]
+    items += [dict(row, type='prompt') for row in conn.execute("""
+        SELECT p.id, p.title AS name, p.deleted_at, c.name || ' > ' || s.name AS path FROM prompts p
+        JOIN sections s ON s.id = p.section_id
+        JOIN categories c ON c.id = s.category_id
+        WHERE p.deleted_at > ?
+    """, (TRASH_PURGE_NOW,))]
+    items.sort(key=lambda item: item['deleted_at'], reverse=True)
+    return items
+
+@traced
+def restore_item(table_name, item_id):
+    """Takes an item out of the trash, with its parents if they are in the trash too.
+
+    Returns False if the item is not in the trash, or if it or a parent is
+    being purged (deleted permanently).
+    """
+    with transaction() as cursor:
+        chain = [] # (table, id, deleted_at) of the item and its parents, the item first
+        table, row_id = table_name, item_id
+        while table is not None:
+            parent = _TRASH_PARENTS[table]
+            columns = "deleted_at" + (f", {parent[1]} AS parent_id" if parent else "")
+            row = cursor.execute(f"SELECT {columns} FROM {table} WHERE id = ?", (row_id,)).fetchone()
+            if row is None:
+                return False
+            chain.append((table, row_id, row['deleted_at']))
+            table, row_id = (parent[0], row['parent_id']) if parent else (None, None)
+        if chain[0][2] is None or any(deleted_at == TRASH_PURGE_NOW for _, _, deleted_at in chain):
+            return False
+        for table, row_id, deleted_at in reversed(chain): # Parents first, for the caches
+            if deleted_at is None:
+                continue
+            cursor.execute(f"UPDATE {table} SET deleted_at = NULL WHERE id = ?", (row_id,))
+            _record_change(table, "insert", row_id)
+            if table == 'categories':
+                # Caches dropped its sections with it; its prompts are read with them
+                sections = cursor.execute("SELECT id FROM sections WHERE category_id = ? AND deleted_at IS NULL",
+                                          (row_id,)).fetchall()
+                for section in sections:
+                    _record_change("sections", "insert", section['id'])
+    logger.debug("Restored %s %s from the trash.", table_name, item_id)
+    return True
+
+def delete_permanently(table_name, item_id):
+    """Purges an item of the trash (in the background); returns False if it is not in the trash."""
+    with transaction() as cursor:
+        cursor.execute(f"UPDATE {table_name} SET deleted_at = ? WHERE id = ? AND deleted_at > ?",
+                       (TRASH_PURGE_NOW, item_id, TRASH_PURGE_NOW))
+        marked = cursor.rowcount > 0
+    if marked:
+        schedule_trash_purge()
+    return marked
+
+def empty_trash():
+    """Purges everything in the trash (in the background)."""
+    with transaction() as cursor:
+        for table_name in _TRASH_PARENTS:
+            cursor.execute(f"UPDATE {table_name} SET deleted_at = ? WHERE deleted_at > ?",
+                           (TRASH_PURGE_NOW, TRASH_PURGE_NOW))
+    schedule_trash_purge()
+
+@traced
+def purge_trash_batch(cutoff, batch_size=PURGE_BATCH_SIZE):
+    """Deletes at most batch_size prompts of the items trashed at or before cutoff, in one transaction.
+
+    cutoff is a Unix time. A trashed section or category is deleted once its
+    last prompt is. Returns the number of rows deleted: 0 when nothing
+    expired is left. Nothing is reported to the change listeners: the trash
+    was already out of every list.
+    """
+    with transaction() as cursor:
+        cursor.execute("DELETE FROM prompts WHERE id IN (SELECT id FROM prompts WHERE deleted_at <= ? LIMIT ?)",
+                       (cutoff, batch_size))
+        purged = cursor.rowcount
+        for table_name, prompt_query in _PURGE_PROMPT_QUERIES.items():
+            while purged < batch_size:
+                row = cursor.execute(f"SELECT id FROM {table_name} WHERE deleted_at <= ? LIMIT 1", (cutoff,)).fetchone()
+                if row is None:
+                    break
+                budget = batch_size - purged
+                cursor.execute(f"DELETE FROM prompts WHERE id IN ({prompt_query})", (row['id'], budget))
+                purged += cursor.rowcount
+                if cursor.rowcount == budget:
+                    break # It may have more prompts: next batch
+                # Empty now; a category's (empty) sections go with it (ON DELETE CASCADE)
+                cursor.execute(f"DELETE FROM {table_name} WHERE id = ?", (row['id'],))
+                purged += 1
+    return purged
+
+def schedule_trash_purge(retention_s=TRASH_RETENTION_S):
+    """Purges the items trashed more than retention_s ago, on the background writer thread.
+
+    Each batch is its own queued job: writes submitted meanwhile run between
+    batches. Does nothing if a purge is already under way (it also takes
+    items deleted permanently since it started).
+    """
+    global _trash_purge_running
+    cutoff = time.time() - retention_s
+
+    def purge_next_batch():
+        global _trash_purge_running
+        try:
+            more = purge_trash_batch(cutoff) > 0
+        except sqlite3.Error as e:
+            logger.error("Error purging the trash: %s", e)
+            more = False
+        with _write_executor_lock:
+            if more and _write_executor is not None: # None when closing: the rest waits for the next run
+                _write_executor.submit(purge_next_batch)
+            else:
+                _trash_purge_running = False
+                logger.debug("Trash purge finished.")
+
+    with _write_executor_lock:
+        if _trash_purge_running:
+            return
+        _trash_purge_running = True
+    submit_write(purge_next_batch)
+
 # --- Reordering Functions ---
+# Siblings are sorted by (order_index, id). Moving an item gives it an
+# order_index between those of its new neighbours: one indexed lookup of the
+# neighbours and one UPDATE of one row, however many siblings there are. Only
+# when the neighbours have no free value left between them are the siblings
+# renumbered ORDER_GAP apart again (_rebalance_order), which is rare.
 
-def _get_item_and_siblings(cursor, table_name, item_id, parent_id_column=None, parent_id=None):
-    """Gets the item's order_index and the IDs/order_indices of its siblings."""
-    where_clause = "1=1"
-    params = []
+def _sibling_filter(parent_id_column=None, parent_id=None):
+    """WHERE clause and parameters selecting the siblings under one parent (trashed ones excepted)."""
     if parent_id_column and parent_id is not None:
-        where_clause = f"{parent_id_column} = ?"
-        params.append(parent_id)
+        return f"{parent_id_column} = ? AND deleted_at IS NULL", [parent_id]
+    return "deleted_at IS NULL", []
 
-    cursor.execute(f"SELECT id, order_index FROM {table_name} WHERE {where_clause} ORDER BY order_index", params)
-    siblings = cursor.fetchall()
+def _order_between(before, after):
+    """An order_index between two siblings' values (None = no sibling on that side).
 
-    current_item_index = -1
-    current_order_index = -1
-    for i, sibling in enumerate(siblings):
-        if sibling['id'] == item_id:
-            current_item_index = i
-            current_order_index = sibling['order_index']
-            break
+    Returns None when there is no free integer between them.
+    """
+    if before is None and after is None:
+        return ORDER_GAP
+    if before is None:
+        return after - ORDER_GAP
+    if after is None:
+        return before + ORDER_GAP
+    if after - before < 2:
+        return None
+    return (before + after) // 2
+
+def _rebalance_order(cursor, table_name, where_clause, params):
+    """Renumbers the siblings ORDER_GAP apart, keeping their order."""
+    cursor.execute(f"SELECT id FROM {table_name} WHERE {where_clause} ORDER BY order_index, id", params)
+    sibling_ids = [row['id'] for row in cursor.fetchall()]
+    cursor.executemany(f"UPDATE {table_name} SET order_index = ? WHERE id = ?",
+                       [((i + 1) * ORDER_GAP, sibling_id) for i, sibling_id in enumerate(sibling_ids)])
+    for sibling_id in sibling_ids:
+        _record_change(table_name, "update", sibling_id)
+    logger.debug("Rebalanced order of %d items in %s.", len(sibling_ids), table_name)
 
-    return siblings, current_item_index, current_order_index
+def _set_order_between(cursor, table_name, item_id, where_clause, params, find_neighbours):
+    """Gives the item an order_index between the neighbours find_neighbours() returns."""
+    before, after = find_neighbours()
+    new_order_index = _order_between(before, after)
+    if new_order_index is None:
+        _rebalance_order(cursor, table_name, where_clause, params)
+        before, after = find_neighbours()
+        new_order_index = _order_between(before, after)
+    cursor.execute(f"UPDATE {table_name} SET order_index = ? WHERE id = ?", (new_order_index, item_id))
+    _record_change(table_name, "update", item_id)
 
+@traced
 def move_item(table_name, item_id, direction, parent_id_column=None, parent_id=None):
-    """Moves an item up or down in the order_index within its siblings."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    """Moves an item up or down one place among its siblings."""
     try:
-        siblings, current_item_index, current_order_index = _get_item_and_siblings(
-            cursor, table_name, item_id, parent_id_column, parent_id
-        )
+        with transaction() as cursor:
+            where_clause, params = _sibling_filter(parent_id_column, parent_id)
+            cursor.execute(f"SELECT order_index FROM {table_name} WHERE id = ? AND {where_clause}",
+                           [item_id] + params)
+            if cursor.fetchone() is None:
+                logger.error("Item %s not found in %s with parent %s", item_id, table_name, parent_id)
+                return False
 
-        if current_item_index == -1:
-            print(f"Error: Item {item_id} not found in {table_name} with parent {parent_id}")
-            return False
+            if direction == "up":
+                comparison, sort = "<", "DESC"
+            elif direction == "down":
+                comparison, sort = ">", "ASC"
+            else:
+                logger.error("Unknown move direction '%s'.", direction)
+                return False
 
-        swap_with_index = -1
-        if direction == "up" and current_item_index > 0:
-            swap_with_index = current_item_index - 1
-        elif direction == "down" and current_item_index < len(siblings) - 1:
-            swap_with_index = current_item_index + 1
-        else:
-            print(f"Cannot move item {item_id} further {direction}.")
-            return False # Cannot move further
-
-        # Get the item to swap with
-        swap_item = siblings[swap_with_index]
-        swap_item_id = swap_item['id']
-        swap_order_index = swap_item['order_index']
-
-        # Perform the swap using a temporary high value to avoid unique constraint issues if any
-        temp_index = 999999999 # A large temporary index
-        cursor.execute(f"UPDATE {table_name} SET order_index = ? WHERE id = ?", (temp_index, item_id))
-        cursor.execute(f"UPDATE {table_name} SET order_index = ? WHERE id = ?", (current_order_index, swap_item_id))
-        cursor.execute(f"UPDATE {table_name} SET order_index = ? WHERE id = ?", (swap_order_index, item_id))
-
-        conn.commit()
-        print(f"Moved item {item_id} {direction} in {table_name}.")
+            def find_neighbours():
+                cursor.execute(f"SELECT order_index FROM {table_name} WHERE id = ?", (item_id,))
+                current_order_index = cursor.fetchone()[0]
+                cursor.execute(
+                    f"SELECT order_index FROM {table_name} WHERE {where_clause} "
+                    f"AND (order_index, id) {comparison} (?, ?) "
+                    f"ORDER BY order_index {sort}, id {sort} LIMIT 2",
+                    params + [current_order_index, item_id]
+                )
+                nearest, second = ([r[0] for r in cursor.fetchall()] + [None, None])[:2]
+                # The item goes past its nearest sibling: between it and the second-nearest
+                return (second, nearest) if direction == "up" else (nearest, second)
+
+            before, after = find_neighbours()
+            if (after if direction == "up" else before) is None:
+                logger.debug("Cannot move item %s further %s.", item_id, direction)
+                return False # Cannot move further
+
+            _set_order_between(cursor, table_name, item_id, where_clause, params, find_neighbours)
+
+        logger.debug("Moved item %s %s in %s.", item_id, direction, table_name)
         return True
 
     except Exception as e:
-        print(f"Error moving item {item_id} in {table_name}: {e}")
-        conn.rollback()
+        # transaction() has already rolled back
+        logger.error("Error moving item %s in %s: %s", item_id, table_name, e)
         return False
-    finally:
-        conn.close()
 
+@traced
+def move_item_to(table_name, item_id, position, parent_id_column=None, parent_id=None):
+    """Moves an item to the given 0-based position among its siblings.
+
+    Positions count the other siblings, so position 0 puts the item first and
+    any position past the end puts it last (e.g. the drop row of a drag).
+    """
+    try:
+        with transaction() as cursor:
+            where_clause, params = _sibling_filter(parent_id_column, parent_id)
+            cursor.execute(f"SELECT 1 FROM {table_name} WHERE id = ? AND {where_clause}", [item_id] + params)
+            if cursor.fetchone() is None:
+                logger.error("Item %s not found in %s with parent %s", item_id, table_name, parent_id)
+                return False
+            position = max(position, 0)
+
+            def find_neighbours():
+                # The siblings that end up just before and just after the item
+                cursor.execute(
+                    f"SELECT order_index FROM {table_name} WHERE {where_clause} AND id != ? "
+                    f"ORDER BY order_index, id LIMIT 2 OFFSET ?",
+                    params + [item_id, max(position - 1, 0)]
+                )
+                values = [r[0] for r in cursor.fetchall()]
+                if position == 0:
+                    return None, (values[0] if values else None)
+                if values:
+                    return values[0], (values[1] if len(values) > 1 else None)
+                # Past the end: goes after the last sibling
+                cursor.execute(f"SELECT MAX(order_index) FROM {table_name} WHERE {where_clause} AND id != ?",
+                               params + [item_id])
+                return cursor.fetchone()[0], None
+
+            _set_order_between(cursor, table_name, item_id, where_clause, params, find_neighbours)
+
+        logger.debug("Moved item %s to position %s in %s.", item_id, position, table_name)
+        return True
+
+    except Exception as e:
+        # transaction() has already rolled back
+        logger.error("Error moving item %s in %s: %s", item_id, table_name, e)
+        return False
+
+
+# --- Query Plan Check ---
+# Every query above should be answered through an index. check_query_plans()
+# runs the module's functions against a scratch database, records each
+# statement they execute and asks SQLite for its plan (EXPLAIN QUERY PLAN).
+# A plan that reads a whole table, or sorts rows in a temporary b-tree
+# instead of reading them in index order, is reported unless it is listed in
+# _ALLOWED_PLAN_STEPS with the reason it is acceptable.
+# Run it after changing a query or the schema:  python database.py --check-plans
+_ALLOWED_PLAN_STEPS = {
+    # function name: {plan step: reason}
+    'search_prompts_by_title': {
+        'SCAN p': "LIKE '%term%' cannot use an index; only used without FTS5",
+        'USE TEMP B-TREE FOR ORDER BY': "results are sorted by name, not stored order",
+    },
+    'search_prompts': {
+        'USE TEMP B-TREE FOR ORDER BY': "bm25 rank is computed per match",
+    },
+    'get_all_sections': {
+        'SCAN sections': "reads every section by design (hierarchy cache)",
+    },
+    'get_prompt_search_entries': {
+        'SCAN p': "loads every prompt into the fuzzy search index by design",
+        'SCAN c': "loads every prompt into the fuzzy search index by design",
+        'SCAN s': "loads every prompt into the fuzzy search index by design",
+    },
+    'get_categories': {
+        'SCAN categories': "reads every category by design",
+    },
+    'clone_category': {
+        'SCAN (subquery-4)': "numbers the sections of one category (read through idx_sections_order)",
+        'SCAN (subquery-5)': "numbers the sections of one category (read through idx_sections_order)",
+        'SCAN source': "pairs the source and copied sections of one category",
+        'SCAN copy': "pairs the source and copied sections of one category",
+    },
+}
+
+def _is_full_scan(detail):
+    # "SCAN t" reads every row; "SCAN t USING INDEX"/"COVERING INDEX" walks an
+    # index in order (used for whole-list reads), virtual tables plan themselves
+    return detail.startswith("SCAN ") and "USING" not in detail and "VIRTUAL TABLE" not in detail
+
+def _run_plan_check_workload(run):
+    """Calls every query function once; run(func, *args) records what each executes."""
+    category_id = run(add_category, "Plan check", '#e0e0e0')
+    other_category_id = run(add_category, "Plan check 2")
+    run(get_categories)
+    run(get_category, category_id)
+    run(update_category, category_id, "Plan check renamed", '#ffffff')
+    run(update_category_color, category_id, '#000000')
+    section_id = run(add_section, "Section", category_id)
+    other_section_id = run(add_section, "Section 2", category_id)
+    run(get_sections, category_id)
+    run(get_all_sections)
+    run(get_section, section_id)
+    run(update_section, section_id, "Section renamed")
+    run(update_section_color, section_id, '#123456')
+    prompt_ids = [run(add_prompt, f"Prompt {i}", "description", "<p>plan check body</p>", section_id)
+                  for i in range(3)]
+    run(get_prompts, section_id)
+    run(get_prompt, prompt_ids[0])
+    run(get_prompt_summary, prompt_ids[0])
+    run(get_prompt_content, prompt_ids[0])
+    run(update_prompt, prompt_ids[0], "Prompt renamed", "description", "<p>changed</p>")
+    run(update_prompt_fields, prompt_ids[1], content="<p>edited</p>")
+    run(update_prompt_fields, prompt_ids[1], content="<p>edited</p>\n<p>twice</p>") # Coalesced
+    revisions = run(get_prompt_revisions, prompt_ids[1])
+    run(get_prompt_revision, revisions[-1]['id'])
+    run(restore_prompt_revision, revisions[-1]['id'])
+    with transaction() as cursor:
+        run(_trim_revisions, cursor, prompt_ids[1], 1)
+    run(search_prompts_by_title, "Prompt")
+    run(search_prompts, "plan che")
+    run(search_prompts, "plan che", 2, 2)
+    run(get_prompt_plain_text, prompt_ids[0])
+    run(get_prompt_search_entries)
+    run(get_prompt_search_entry, prompt_ids[0])
+    run(record_prompt_use, prompt_ids[1])
+    run(record_prompt_use, prompt_ids[1])
+    run(get_frequent_prompts, 10)
+    library = run(export_library_records)
+    library.append({'type': 'section', 'category': "Plan check import", 'name': "Imported", 'color': '#abcdef'})
+    library.append({'type': 'prompt', 'category': "Plan check import", 'section': "Imported",
+                    'title': "Imported prompt", 'content': "plain text body"})
+    run(import_library_records, library, 2)
+    try:
+        run(import_library_records, library + [{'type': 'prompt'}], 2)
+    except ValueError:
+        pass # Removes what it added (_undo_library_import)
+    run(clone_prompt, prompt_ids[1])
+    run(clone_section, section_id, other_category_id)
+    run(clone_category, category_id)
+    run(move_item, "prompts", prompt_ids[2], "up", "section_id", section_id)
+    run(move_item, "sections", other_section_id, "up", "category_id", category_id)
+    run(move_item, "categories", other_category_id, "up")
+    run(move_item_to, "prompts", prompt_ids[0], 2, "section_id", section_id)
+    with transaction() as cursor:
+        run(_rebalance_order, cursor, "prompts", "section_id = ?", [section_id])
+    run(delete_prompt, prompt_ids[0])
+    run(delete_section, other_section_id)
+    run(delete_category, category_id)
+    run(get_trash)
+    run(restore_item, "prompts", prompt_ids[0]) # Restores its category too
+    run(delete_category, category_id)
+    run(add_category, "Plan check renamed") # Takes the trashed category's name
+    run(delete_permanently, "sections", other_section_id)
+    while _trash_purge_running: # The background purge runs outside run()
+        flush_writes()
+    run(purge_trash_batch, time.time(), 1)
+    run(empty_trash)
+    while _trash_purge_running:
+        flush_writes()
+
+def check_query_plans():
+    """Reports queries of this module whose plan scans a table or sorts. Returns True if none do."""
+    import inspect
+    import tempfile
+    global DATABASE_NAME, _statement_tracer
+    saved_database_name = DATABASE_NAME
+    statements = [] # (function name, SQL with parameters filled in)
+    problems = []
+    with tempfile.TemporaryDirectory() as scratch_dir:
+        DATABASE_NAME = os.path.join(scratch_dir, "plan_check.db")
+        try:
+            initialize_database()
+            # Writes run on the writer connection, reads on this thread's reader
+            connections = (_get_writer_connection(), get_db_connection())
+            current_function = [None]
+
+            def run(func, *args, **kwargs):
+                current_function[0] = func.__name__
+                try:
+                    result = func(*args, **kwargs)
+                    if inspect.isgenerator(result):
+                        result = list(result) # Its statements run as it is consumed
+                    return result
+                finally:
+                    current_function[0] = None
+
+            def trace(sql):
+                statements.append((current_function[0], sql))
+
+            # Also traced: connections opened by the workload (export)
+            _statement_tracer = trace
+            for conn in connections:
+                conn.set_trace_callback(trace)
+            try:
+                _run_plan_check_workload(run)
+            finally:
+                _statement_tracer = None
+                for conn in connections:
+                    conn.set_trace_callback(None)
+            conn = connections[0]
+
+            checked = set()
+            for function_name, sql in statements:
+                sql = sql.strip()
+                if not re.match(r"(SELECT|INSERT|UPDATE|DELETE|WITH)\b", sql, re.IGNORECASE):
+                    continue # BEGIN/COMMIT/PRAGMA, trigger bodies ("-- TRIGGER ...")
+                if f"'{FTS_TABLE}_" in sql:
+                    continue # FTS5's own reads of its shadow tables
+                if (function_name, sql) in checked:
+                    continue
+                checked.add((function_name, sql))
+                allowed = _ALLOWED_PLAN_STEPS.get(function_name, {})
+                for step in conn.execute(f"EXPLAIN QUERY PLAN {sql}").fetchall():
+                    detail = step[3]
+                    if detail in allowed:
+                        continue
+                    if _is_full_scan(detail) or detail.startswith("USE TEMP B-TREE"):
+                        problems.append((function_name, detail, " ".join(sql.split())))
+        finally:
+            close_all_connections()
+            DATABASE_NAME = saved_database_name
+
+    for function_name, detail, sql in problems:
+        print(f"Query plan problem in {function_name}(): {detail}\n    {sql}")
+    print(f"Checked {len(checked)} statements: {len(problems) or 'no'} problem(s) found.")
+    return not problems
 
-# Initialize the database when the module is imported
-if __name__ != "__main__": # Only run initialization if imported
+if __name__ == "__main__":
+    import sys
+    if "--check-plans" in sys.argv:
+        sys.exit(0 if check_query_plans() else 1)
+    # Allow running directly to initialize/check DB
     initialize_database()
-elif __name__ == "__main__":
-     # Allow running directly to initialize/check DB
-     initialize_database()
-     print("Database check/initialization complete (run directly).")
+    print("Database check/initialization complete (run directly).")
 # --- END OF FILE database.py ---
\ No newline at end of file
@@ -3,17 +3,22 @@
 import sys
 import os
 import functools # For partial function application in menus
+import logging
+import time
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QPushButton, QLabel, QSizeGrip, QSplitter, QTextEdit, QDialog,
     QLineEdit, QColorDialog, QComboBox, QToolBar, QMessageBox, # Keep QColorDialog import for now, just in case, but we won't use it for the grid
     QInputDialog, QListWidget, QListWidgetItem, QFrame, QScrollArea,
     QPlainTextEdit, QMenu, QToolTip, QStyle, QSizePolicy,
-    QGridLayout # <--- Added QGridLayout
+    QGridLayout, # <--- Added QGridLayout
+    QListView, QAbstractItemView, QStyledItemDelegate
 )
 # Ensure QPoint is imported
-from PyQt6.QtCore import Qt, QSize, QPoint, pyqtSignal, pyqtSlot
-from PyQt6.QtGui import QIcon, QColor, QAction, QFont, QTextCursor, QKeySequence, QMouseEvent # Import QMouseEvent
+from PyQt6.QtCore import Qt, QSize, QPoint, QRect, QRectF, pyqtSignal, pyqtSlot, QAbstractItemModel, QModelIndex
+from PyQt6.QtGui import QIcon, QColor, QAction, QFont, QTextCursor, QKeySequence, QMouseEvent, QPainter, QPen, QFontMetrics # Import QMouseEvent
+
+logger = logging.getLogger(__name__)
 
 # Import the custom title bar
 try:
@@ -22,7 +27,7 @@ try:
     from Template.TitleBar import CustomTitleBar
     # --- END CHANGE ---
 except ImportError:
-    print("WARNING: Could not import CustomTitleBar from Template.TitleBar. Using dummy.")
+    logger.warning("Could not import CustomTitleBar from Template.TitleBar. Using dummy.")
     # Define a dummy class if needed for testing without the title bar
     class CustomTitleBar(QWidget):
         closing = pyqtSignal()
@@ -61,6 +66,9 @@ except ImportError:
 
 # Import database functions
 import database as db
+from autosave import AutosaveQueue
+from hierarchy_cache import hierarchy
+from instrumentation import traced
 
 # Dialog for adding/renaming Category/Section/Prompt
 class ItemDialog(QDialog):
@@ -431,6 +439,328 @@ class ConfirmDialog(QDialog):
         super().mouseReleaseEvent(event)
 # --- End of ConfirmDialog ---
 
+# --- Revision History Dialog ---
+# Lists the saved versions of a prompt (newest first) next to a preview of
+# the selected one. The list is read without any content; a version's
+# content is rebuilt only when it is selected.
+class RevisionHistoryDialog(QDialog):
+    def __init__(self, prompt_id, parent=None):
+        super().__init__(parent)
+        self.setWindowFlags(Qt.WindowType.FramelessWindowHint | Qt.WindowType.Dialog)
+        self.setWindowTitle("Prompt History")
+        self.resize(800, 500)
+        self._drag_pos = None
+
+        container_widget = QWidget(self)
+        container_widget.setObjectName("DialogContainer")
+        main_layout = QVBoxLayout(self)
+        main_layout.setContentsMargins(1, 1, 1, 1) # Border effect
+        main_layout.setSpacing(0)
+        main_layout.addWidget(container_widget)
+
+        content_layout = QVBoxLayout(container_widget)
+        content_layout.setContentsMargins(0, 0, 0, 0)
+        content_layout.setSpacing(0)
+
+        # --- Custom Title Bar ---
+        self.title_bar = CustomTitleBar(self)
+        self.title_bar.setWindowTitle("Prompt History")
+        if hasattr(self.title_bar, 'btn_maximize'): self.title_bar.btn_maximize.hide()
+        if hasattr(self.title_bar, 'btn_minimize'): self.title_bar.btn_minimize.hide()
+        if hasattr(self.title_bar, 'btn_close'):
+            try: self.title_bar.btn_close.clicked.disconnect()
+            except TypeError: pass
+            self.title_bar.btn_close.clicked.connect(self.reject)
+        content_layout.addWidget(self.title_bar)
+
+        # --- Revision list + preview ---
+        body_widget = QWidget()
+        body_layout = QVBoxLayout(body_widget)
+        body_layout.setContentsMargins(15, 10, 15, 15)
+        body_layout.setSpacing(10)
+
+        lists_layout = QHBoxLayout()
+        self.revision_list = QListWidget()
+        self.revision_list.setFixedWidth(260)
+        self.revision_list.currentItemChanged.connect(self._show_revision)
+        self.preview = QTextEdit()
+        self.preview.setReadOnly(True)
+        lists_layout.addWidget(self.revision_list)
+        lists_layout.addWidget(self.preview, 1)
+        body_layout.addLayout(lists_layout, 1)
+
+        button_layout = QHBoxLayout()
+        self.status_label = QLabel()
+        button_layout.addWidget(self.status_label)
+        button_layout.addStretch()
+        self.cancel_btn = QPushButton("Close")
+        self.cancel_btn.setObjectName("DialogCancelButton")
+        self.cancel_btn.clicked.connect(self.reject)
+        self.restore_btn = QPushButton("Restore")
+        self.restore_btn.setObjectName("DialogSaveButton")
+        self.restore_btn.setToolTip("Make this version the current one (the current one stays in the history)")
+        self.restore_btn.setEnabled(False)
+        self.restore_btn.clicked.connect(self.accept)
+        button_layout.addWidget(self.cancel_btn)
+        button_layout.addWidget(self.restore_btn)
+        body_layout.addLayout(button_layout)
+        content_layout.addWidget(body_widget)
+
+        self.setStyleSheet("""
+            #DialogContainer { background-color: #191a1f; }
+            QDialog { border: 1px solid #464766; }
+            QLabel { color: #b3b0ad; font-size: 10pt; background-color: transparent; }
+            QListWidget, QTextEdit {
+                background-color: #1e1e24; border: 1px solid #464766; border-radius: 3px; color: #b3b0ad;
+            }
+            QListWidget::item { padding: 5px; }
+            QListWidget::item:selected { background-color: #464766; color: #ffffff; }
+            QPushButton#DialogCancelButton, QPushButton#DialogSaveButton {
+                background-color: #2a2b30; color: #b3b0ad; border: 1px solid #464766;
+                border-radius: 3px; padding: 6px 15px; min-width: 70px;
+            }
+            QPushButton#DialogCancelButton:hover, QPushButton#DialogSaveButton:hover {
+                background-color: #3a3b40; border-color: #5a5b70;
+            }
+            QPushButton#DialogSaveButton:disabled { color: #777; border-color: #3a3b40; }
+            #CustomTitleBar { background-color: #25262b; border-bottom: 1px solid #464766; }
+            #CustomTitleBar QLabel { color: #b3b0ad; font-size: 10pt; }
+            #CustomTitleBar QPushButton {
+                background-color: transparent; border: none; color: #b3b0ad; font-size: 14pt;
+            }
+            #CustomTitleBar QPushButton:hover { background-color: #4a4b50; }
+            #CustomTitleBar #CloseButton:hover { background-color: #e81123; color: white; }
+        """)
+
+        self._load_revisions(prompt_id)
+
+    def _load_revisions(self, prompt_id):
+        revisions = db.get_prompt_revisions(prompt_id)
+        for position, revision in enumerate(revisions):
+            saved_at = time.strftime("%Y-%m-%d %H:%M", time.localtime(revision['updated_at']))
+            label = f"{saved_at}  ·  {revision['char_count']} chars"
+            if position == 0:
+                label += "  (current)"
+            item = QListWidgetItem(f"{label}\n{revision['title']}")
+            item.setData(Qt.ItemDataRole.UserRole, revision['id'])
+            self.revision_list.addItem(item)
+        if revisions:
+            self.status_label.setText(f"{len(revisions)} versions")
+            self.revision_list.setCurrentRow(0)
+        else:
+            self.status_label.setText("No earlier versions yet: they are kept from the first edit on.")
+
+    def _show_revision(self, current, previous):
+        if current is None:
+            self.preview.clear()
+            self.restore_btn.setEnabled(False)
+            return
+        revision = db.get_prompt_revision(current.data(Qt.ItemDataRole.UserRole))
+        self.preview.setHtml(revision['content'] if revision else "")
+        self.restore_btn.setEnabled(revision is not None and self.revision_list.row(current) > 0)
+
+    def selected_revision_id(self):
+        item = self.revision_list.currentItem()
+        return item.data(Qt.ItemDataRole.UserRole) if item else None
+
+    # --- Mouse Events for Dragging ---
+    def mousePressEvent(self, event):
+        if hasattr(self, 'title_bar') and self.title_bar.geometry().contains(event.pos()):
+            if event.button() == Qt.MouseButton.LeftButton:
+                self._drag_pos = event.globalPosition().toPoint() - self.frameGeometry().topLeft()
+                event.accept()
+            else:
+                self._drag_pos = None
+                super().mousePressEvent(event)
+        else:
+            self._drag_pos = None
+            super().mousePressEvent(event)
+
+    def mouseMoveEvent(self, event):
+        if event.buttons() == Qt.MouseButton.LeftButton and self._drag_pos:
+            self.move(event.globalPosition().toPoint() - self._drag_pos)
+            event.accept()
+        else:
+            super().mouseMoveEvent(event)
+
+    def mouseReleaseEvent(self, event):
+        self._drag_pos = None
+        super().mouseReleaseEvent(event)
+# --- End of RevisionHistoryDialog ---
+
+# --- Trash Dialog ---
+# Lists what was deleted (newest first). Restoring is instant; deleting
+# permanently or emptying the trash only marks the items, the rows are
+# removed by the background purge (database.py, Trash Functions).
+class TrashDialog(QDialog):
+    _TABLES = {'category': 'categories', 'section': 'sections', 'prompt': 'prompts'}
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowFlags(Qt.WindowType.FramelessWindowHint | Qt.WindowType.Dialog)
+        self.setWindowTitle("Trash")
+        self.resize(560, 420)
+        self._drag_pos = None
+
+        container_widget = QWidget(self)
+        container_widget.setObjectName("DialogContainer")
+        main_layout = QVBoxLayout(self)
+        main_layout.setContentsMargins(1, 1, 1, 1) # Border effect
+        main_layout.setSpacing(0)
+        main_layout.addWidget(container_widget)
+
+        content_layout = QVBoxLayout(container_widget)
+        content_layout.setContentsMargins(0, 0, 0, 0)
+        content_layout.setSpacing(0)
+
+        # --- Custom Title Bar ---
+        self.title_bar = CustomTitleBar(self)
+        self.title_bar.setWindowTitle("Trash")
+        if hasattr(self.title_bar, 'btn_maximize'): self.title_bar.btn_maximize.hide()
+        if hasattr(self.title_bar, 'btn_minimize'): self.title_bar.btn_minimize.hide()
+        if hasattr(self.title_bar, 'btn_close'):
+            try: self.title_bar.btn_close.clicked.disconnect()
+            except TypeError: pass
+            self.title_bar.btn_close.clicked.connect(self.reject)
+        content_layout.addWidget(self.title_bar)
+
+        # --- Trashed items ---
+        body_widget = QWidget()
+        body_layout = QVBoxLayout(body_widget)
+        body_layout.setContentsMargins(15, 10, 15, 15)
+        body_layout.setSpacing(10)
+
+        self.item_list = QListWidget()
+        self.item_list.currentItemChanged.connect(self._update_buttons)
+        body_layout.addWidget(self.item_list, 1)
+
+        button_layout = QHBoxLayout()
+        self.status_label = QLabel()
+        button_layout.addWidget(self.status_label)
+        button_layout.addStretch()
+        self.empty_btn = QPushButton("Empty Trash")
+        self.empty_btn.setObjectName("DialogCancelButton")
+        self.empty_btn.clicked.connect(self._empty_trash)
+        self.delete_btn = QPushButton("Delete Permanently")
+        self.delete_btn.setObjectName("DialogCancelButton")
+        self.delete_btn.clicked.connect(self._delete_selected)
+        self.restore_btn = QPushButton("Restore")
+        self.restore_btn.setObjectName("DialogSaveButton")
+        self.restore_btn.setToolTip("Put it back where it was (with its parents, if they are in the trash too)")
+        self.restore_btn.clicked.connect(self._restore_selected)
+        self.close_btn = QPushButton("Close")
+        self.close_btn.setObjectName("DialogCancelButton")
+        self.close_btn.clicked.connect(self.accept)
+        for button in (self.empty_btn, self.delete_btn, self.restore_btn, self.close_btn):
+            button_layout.addWidget(button)
+        body_layout.addLayout(button_layout)
+        content_layout.addWidget(body_widget)
+
+        self.setStyleSheet("""
+            #DialogContainer { background-color: #191a1f; }
+            QDialog { border: 1px solid #464766; }
+            QLabel { color: #b3b0ad; font-size: 10pt; background-color: transparent; }
+            QListWidget {
+                background-color: #1e1e24; border: 1px solid #464766; border-radius: 3px; color: #b3b0ad;
+            }
+            QListWidget::item { padding: 5px; }
+            QListWidget::item:selected { background-color: #464766; color: #ffffff; }
+            QPushButton#DialogCancelButton, QPushButton#DialogSaveButton {
+                background-color: #2a2b30; color: #b3b0ad; border: 1px solid #464766;
+                border-radius: 3px; padding: 6px 15px; min-width: 70px;
+            }
+            QPushButton#DialogCancelButton:hover, QPushButton#DialogSaveButton:hover {
+                background-color: #3a3b40; border-color: #5a5b70;
+            }
+            QPushButton#DialogCancelButton:disabled, QPushButton#DialogSaveButton:disabled {
+                color: #777; border-color: #3a3b40;
+            }
+            #CustomTitleBar { background-color: #25262b; border-bottom: 1px solid #464766; }
+            #CustomTitleBar QLabel { color: #b3b0ad; font-size: 10pt; }
+            #CustomTitleBar QPushButton {
+                background-color: transparent; border: none; color: #b3b0ad; font-size: 14pt;
+            }
+            #CustomTitleBar QPushButton:hover { background-color: #4a4b50; }
+            #CustomTitleBar #CloseButton:hover { background-color: #e81123; color: white; }
+        """)
+
+        self._load_items()
+
+    def _load_items(self):
+        self.item_list.clear()
+        items = db.get_trash()
+        for trashed in items:
+            deleted_at = time.strftime("%Y-%m-%d %H:%M", time.localtime(trashed['deleted_at']))
+            location = f"  ·  in {trashed['path']}" if trashed['path'] else ""
+            item = QListWidgetItem(f"{trashed['name']}\n{trashed['type'].capitalize()}{location}  ·  deleted {deleted_at}")
+            item.setData(Qt.ItemDataRole.UserRole, (trashed['type'], trashed['id']))
+            self.item_list.addItem(item)
+        self.status_label.setText(f"{len(items)} items" if items else "The trash is empty.")
+        self.empty_btn.setEnabled(bool(items))
+        if items:
+            self.item_list.setCurrentRow(0)
+        self._update_buttons(self.item_list.currentItem(), None)
+
+    def _update_buttons(self, current, previous):
+        self.restore_btn.setEnabled(current is not None)
+        self.delete_btn.setEnabled(current is not None)
+
+    def _selected(self):
+        """(table name, id) of the selected item, or None."""
+        item = self.item_list.currentItem()
+        if item is None:
+            return None
+        item_type, item_id = item.data(Qt.ItemDataRole.UserRole)
+        return self._TABLES[item_type], item_id
+
+    def _restore_selected(self):
+        selected = self._selected()
+        if selected and not db.restore_item(*selected):
+            QMessageBox.warning(self, "Restore", "This item is being deleted permanently and cannot be restored.")
+        self._load_items()
+
+    def _delete_selected(self):
+        selected = self._selected()
+        if selected is None:
+            return
+        dialog = ConfirmDialog(title='Confirm Delete', message="Delete this item permanently?",
+                               informative_text="(It cannot be restored afterwards!)", parent=self)
+        if dialog.exec():
+            db.delete_permanently(*selected)
+            self._load_items()
+
+    def _empty_trash(self):
+        dialog = ConfirmDialog(title='Empty Trash', message="Delete everything in the trash permanently?",
+                               informative_text="(It cannot be restored afterwards!)", parent=self)
+        if dialog.exec():
+            db.empty_trash()
+            self._load_items()
+
+    # --- Mouse Events for Dragging ---
+    def mousePressEvent(self, event):
+        if hasattr(self, 'title_bar') and self.title_bar.geometry().contains(event.pos()):
+            if event.button() == Qt.MouseButton.LeftButton:
+                self._drag_pos = event.globalPosition().toPoint() - self.frameGeometry().topLeft()
+                event.accept()
+            else:
+                self._drag_pos = None
+                super().mousePressEvent(event)
+        else:
+            self._drag_pos = None
+            super().mousePressEvent(event)
+
+    def mouseMoveEvent(self, event):
+        if event.buttons() == Qt.MouseButton.LeftButton and self._drag_pos:
+            self.move(event.globalPosition().toPoint() - self._drag_pos)
+            event.accept()
+        else:
+            super().mouseMoveEvent(event)
+
+    def mouseReleaseEvent(self, event):
+        self._drag_pos = None
+        super().mouseReleaseEvent(event)
+# --- End of TrashDialog ---
+
 # --- START: ColorGridDialog with FULL Flat UI Colors ---
 class ColorGridDialog(QDialog):
     colorSelected = pyqtSignal(str) # Signal emitting the hex color string
@@ -688,6 +1018,337 @@ class ColorGridDialog(QDialog):
 # --- END: ColorGridDialog ---
 
 
+# ==================================
+#      Sidebar Tree Model (categories -> sections -> prompts)
+# ==================================
+PANEL_ROW_HEIGHT = 30
+PANEL_ROW_PADDING = 8          # Left/right padding inside a row
+COLOR_INDICATOR_SIZE = 15
+PANEL_TEXT_COLOR = QColor("#b3b0ad")
+PANEL_HOVER_BG = QColor("#3a3b40")
+PANEL_SELECTED_BG = QColor("#464766")
+COLOR_INDICATOR_BORDER = QColor("#333333")
+DEFAULT_CATEGORY_COLOR = '#e0e0e0'
+DEFAULT_SECTION_COLOR = '#d0d0d0'
+
+# Custom item data roles of PromptTreeModel
+ITEM_ID_ROLE = Qt.ItemDataRole.UserRole
+ITEM_TYPE_ROLE = Qt.ItemDataRole.UserRole + 1
+ITEM_DATA_ROLE = Qt.ItemDataRole.UserRole + 2 # dict of the database row (prompt content excluded)
+ITEM_COLOR_ROLE = Qt.ItemDataRole.UserRole + 3 # Validated hex color, categories/sections only
+
+# Which item type a node of each type holds as children
+_CHILD_TYPE = {'library': 'category', 'category': 'section', 'section': 'prompt'}
+
+class _TreeNode:
+    __slots__ = ('item_type', 'item_id', 'data', 'parent', 'children', 'loaded')
+
+    def __init__(self, item_type, item_id=None, data=None, parent=None):
+        self.item_type = item_type
+        self.item_id = item_id
+        self.data = data or {}
+        self.parent = parent
+        self.children = []
+        self.loaded = item_type not in _CHILD_TYPE # Leaves have nothing to load
+
+    def row(self):
+        return self.parent.children.index(self) if self.parent else 0
+
+
+class PromptTreeModel(QAbstractItemModel):
+    """One hierarchical model behind the three sidebar panels.
+
+    The invisible root holds two nodes: the library, whose children are the
+    categories (sections and prompts below them), and an always-empty node that
+    a panel's view is pointed at when there is nothing to show. Each panel is a
+    QListView whose root index is the library, the current category or the
+    current section. Children are read from the database the first time a
+    node is shown (fetchMore) or when explicitly reloaded.
+
+    After that the model keeps itself current from the database change
+    notifications: an inserted, updated, moved or deleted item only inserts,
+    repaints, moves or removes its own row.
+    """
+    # Emitted before an item (and everything below it) leaves the model
+    item_about_to_be_removed = pyqtSignal(str, int) # item_type, item_id
+    # Change notifications can come from the background writer thread (autosave);
+    # re-emitting them through a signal applies them on the GUI thread.
+    _database_changed = pyqtSignal(str, str, object) # item_id is None for 'reload'
+
+    _TABLE_TYPES = {'categories': 'category', 'sections': 'section', 'prompts': 'prompt'}
+    _PARENT_COLUMN = {'section': 'category_id', 'prompt': 'section_id'}
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._root = _TreeNode('root')
+        self._library = _TreeNode('library', parent=self._root)
+        self._empty = _TreeNode('empty', parent=self._root)
+        self._root.children = [self._library, self._empty]
+        self._nodes = {} # (item_type, item_id) -> _TreeNode, for O(1) lookups
+        self._database_changed.connect(self._apply_database_change)
+        db.add_change_listener(self._database_changed.emit)
+
+    # --- Lookup helpers ---
+    def library_index(self):
+        return self.createIndex(0, 0, self._library)
+
+    def empty_index(self):
+        return self.createIndex(1, 0, self._empty)
+
+    def _node(self, index):
+        return index.internalPointer() if index.isValid() else self._root
+
+    def _index_of(self, node):
+        if node is self._root:
+            return QModelIndex()
+        return self.createIndex(node.row(), 0, node)
+
+    def index_for(self, item_type, item_id):
+        """Returns the index of a loaded item, or an invalid index."""
+        node = self._nodes.get((item_type, item_id))
+        return self._index_of(node) if node else QModelIndex()
+
+    def child_ids(self, parent):
+        return [child.item_id for child in self._node(parent).children]
+
+    # --- Loading ---
+    @traced
+    def _query_children(self, node):
+        if node.item_type == 'library':
+            return hierarchy.get_categories()
+        if node.item_type == 'category':
+            return hierarchy.get_sections(node.item_id)
+        return db.get_prompts(node.item_id)
+
+    def _make_node(self, item_type, row, parent):
+        # Prompt bodies can be large and are never shown in the panels
+        data = {key: row[key] for key in row.keys() if key != 'content'}
+        node = _TreeNode(item_type, data['id'], data, parent)
+        self._nodes[(item_type, node.item_id)] = node
+        return node
+
+    def _forget(self, node):
+        self._nodes.pop((node.item_type, node.item_id), None)
+        for child in node.children:
+            self._forget(child)
+
+    # --- Incremental updates ---
+    def _query_item(self, item_type, item_id):
+        if item_type == 'category':
+            return hierarchy.get_category(item_id)
+        if item_type == 'section':
+            return hierarchy.get_section(item_id)
+        return db.get_prompt_summary(item_id)
+
+    def _parent_node_for(self, item_type, row):
+        if item_type == 'category':
+            return self._library
+        parent_type = 'category' if item_type == 'section' else 'section'
+        return self._nodes.get((parent_type, row[self._PARENT_COLUMN[item_type]]))
+
+    def _sorted_row(self, parent_node, node):
+        """Row at which node belongs among its siblings (ignoring its current row)."""
+        sort_key = lambda n: (n.data.get('order_index') or 0, n.item_id) # Same order as the queries
+        node_key = sort_key(node)
+        return sum(1 for sibling in parent_node.children if sibling is not node and sort_key(sibling) < node_key)
+
+    def _apply_database_change(self, table, operation, item_id):
+        item_type = self._TABLE_TYPES.get(table)
+        if item_type is None:
+            return
+        if operation == 'reload':
+            # Too many rows changed to apply one by one (bulk import): re-read
+            # every loaded list of this type
+            parents = [self._library] + list(self._nodes.values())
+            for parent in parents:
+                still_in_model = parent is self._library or self._nodes.get((parent.item_type, parent.item_id)) is parent
+                if still_in_model and parent.loaded and _CHILD_TYPE.get(parent.item_type) == item_type:
+                    self.reload_children(self._index_of(parent))
+            return
+        node = self._nodes.get((item_type, item_id))
+        if operation == 'delete':
+            if node is not None:
+                self._remove_node(node)
+            return
+        row = self._query_item(item_type, item_id)
+        if row is None:
+            return
+        if node is None:
+            self._insert_node(item_type, row)
+        else:
+            self._update_node(node, row)
+
+    def _insert_node(self, item_type, row):
+        parent_node = self._parent_node_for(item_type, row)
+        if parent_node is None or not parent_node.loaded:
+            return # Read with its siblings when the parent is first shown
+        node = self._make_node(item_type, row, parent_node)
+        position = self._sorted_row(parent_node, node)
+        self.beginInsertRows(self._index_of(parent_node), position, position)
+        parent_node.children.insert(position, node)
+        self.endInsertRows()
+
+    def _update_node(self, node, row):
+        new_parent = self._parent_node_for(node.item_type, row)
+        if new_parent is not node.parent:
+            # Moved under another parent: take it out here, add it there
+            self._remove_node(node)
+            self._insert_node(node.item_type, row)
+            return
+        node.data = {key: row[key] for key in row.keys() if key != 'content'}
+        parent_index = self._index_of(node.parent)
+        old_position = node.row()
+        new_position = self._sorted_row(node.parent, node)
+        if new_position != old_position:
+            # beginMoveRows wants the destination row before the move is made
+            destination = new_position + 1 if new_position > old_position else new_position
+            self.beginMoveRows(parent_index, old_position, old_position, parent_index, destination)
+            node.parent.children.pop(old_position)
+            node.parent.children.insert(new_position, node)
+            self.endMoveRows()
+        index = self._index_of(node)
+        self.dataChanged.emit(index, index)
+
+    def _remove_node(self, node):
+        self.item_about_to_be_removed.emit(node.item_type, node.item_id)
+        position = node.row()
+        self.beginRemoveRows(self._index_of(node.parent), position, position)
+        node.parent.children.pop(position)
+        self._forget(node)
+        self.endRemoveRows()
+
+    def ensure_loaded(self, parent):
+        if self.canFetchMore(parent):
+            self.fetchMore(parent)
+
+    def reload_children(self, parent):
+        """Re-reads the children of parent from the database; returns their ids."""
+        node = self._node(parent)
+        removed = node.children # Keep the nodes alive until Qt is done with their indexes
+        if removed:
+            self.beginRemoveRows(parent, 0, len(removed) - 1)
+            for child in removed:
+                self._forget(child)
+            node.children = []
+            self.endRemoveRows()
+        node.loaded = node.item_type not in _CHILD_TYPE
+        self.ensure_loaded(parent)
+        return self.child_ids(parent)
+
+    # --- QAbstractItemModel interface ---
+    def index(self, row, column, parent=QModelIndex()):
+        node = self._node(parent)
+        if column != 0 or not 0 <= row < len(node.children):
+            return QModelIndex()
+        return self.createIndex(row, 0, node.children[row])
+
+    def parent(self, index=None):
+        if index is None:
+            return super().parent() # QObject.parent()
+        if not index.isValid():
+            return QModelIndex()
+        parent_node = index.internalPointer().parent
+        if parent_node is None or parent_node is self._root:
+            return QModelIndex()
+        return self._index_of(parent_node)
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.column() > 0:
+            return 0
+        return len(self._node(parent).children)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 1
+
+    def hasChildren(self, parent=QModelIndex()):
+        node = self._node(parent)
+        return bool(node.children) or not node.loaded
+
+    def canFetchMore(self, parent):
+        return not self._node(parent).loaded
+
+    def fetchMore(self, parent):
+        node = self._node(parent)
+        if node.loaded:
+            return
+        node.loaded = True
+        rows = self._query_children(node)
+        if not rows:
+            return
+        child_type = _CHILD_TYPE[node.item_type]
+        self.beginInsertRows(parent, 0, len(rows) - 1)
+        node.children = [self._make_node(child_type, row, node) for row in rows]
+        self.endInsertRows()
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.ItemFlag.NoItemFlags
+        return Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsSelectable
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        node = index.internalPointer()
+        if role == Qt.ItemDataRole.DisplayRole:
+            if node.item_type == 'prompt':
+                return node.data.get('title') or "Untitled Prompt"
+            return node.data.get('name') or f"Unnamed {node.item_type.capitalize()}"
+        if role == ITEM_ID_ROLE:
+            return node.item_id
+        if role == ITEM_TYPE_ROLE:
+            return node.item_type
+        if role == ITEM_DATA_ROLE:
+            return node.data
+        if role == ITEM_COLOR_ROLE and node.item_type in ('category', 'section'):
+            default_color = DEFAULT_CATEGORY_COLOR if node.item_type == 'category' else DEFAULT_SECTION_COLOR
+            item_color = node.data.get('color') or default_color
+            if not item_color.startswith('#') or len(item_color) not in [4, 7]:
+                item_color = default_color
+            return item_color
+        return None
+
+
+class PanelItemDelegate(QStyledItemDelegate):
+    """Paints a sidebar row: selection/hover background, color indicator and name."""
+
+    def sizeHint(self, option, index):
+        return QSize(option.rect.width(), PANEL_ROW_HEIGHT)
+
+    def paint(self, painter, option, index):
+        painter.save()
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        row_rect = QRectF(option.rect.adjusted(0, 0, 0, -1)) # 1px gap between rows
+
+        if option.state & QStyle.StateFlag.State_Selected:
+            background = PANEL_SELECTED_BG
+        elif option.state & QStyle.StateFlag.State_MouseOver:
+            background = PANEL_HOVER_BG
+        else:
+            background = None
+        if background is not None:
+            painter.setPen(Qt.PenStyle.NoPen)
+            painter.setBrush(background)
+            painter.drawRoundedRect(row_rect, 3, 3)
+
+        text_left = row_rect.left() + PANEL_ROW_PADDING
+        item_color = index.data(ITEM_COLOR_ROLE)
+        if item_color:
+            indicator_rect = QRectF(text_left, row_rect.center().y() - COLOR_INDICATOR_SIZE / 2,
+                                    COLOR_INDICATOR_SIZE, COLOR_INDICATOR_SIZE)
+            painter.setPen(QPen(COLOR_INDICATOR_BORDER, 1))
+            painter.setBrush(QColor(item_color))
+            painter.drawRoundedRect(indicator_rect, 3, 3)
+            text_left += COLOR_INDICATOR_SIZE + 10
+
+        text_rect = QRect(int(text_left), option.rect.top(),
+                          int(row_rect.right() - PANEL_ROW_PADDING - text_left), option.rect.height())
+        painter.setFont(option.font)
+        painter.setPen(PANEL_TEXT_COLOR)
+        name = QFontMetrics(option.font).elidedText(index.data(Qt.ItemDataRole.DisplayRole), Qt.TextElideMode.ElideRight, text_rect.width())
+        painter.drawText(text_rect, Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter, name)
+        painter.restore()
+
+
 # Main window class for the Prompt Editor
 class PromptEditorWindow(QMainWindow):
     closing = pyqtSignal()
@@ -699,12 +1360,23 @@ class PromptEditorWindow(QMainWindow):
         self.current_section_id = None
         self.current_prompt_id = None
         self.clipboard = None # For copy/paste simulation {'id': id, 'type': type}
+        self.tree_model = PromptTreeModel(self)
+        self.panel_delegate = PanelItemDelegate(self)
+        # Edits are coalesced and written in the background, see autosave.py
+        self.autosave = AutosaveQueue(self._collect_prompt_fields, self)
+        # The model patches its own rows on database changes; the window only
+        # has to follow along for titles and the current selection
+        self.tree_model.item_about_to_be_removed.connect(self._on_item_about_to_be_removed)
+        self.tree_model.dataChanged.connect(self._update_panel_titles)
         self.initUI()
+        QApplication.instance().focusChanged.connect(self._on_focus_changed)
+        QApplication.instance().aboutToQuit.connect(lambda: self.autosave.flush(wait=True))
         self.apply_stylesheet() # Apply main window styles
 
     @pyqtSlot()
+    @traced
     def show_and_activate(self):
-        print("PromptEditorWindow.show_and_activate() called")
+        logger.debug("PromptEditorWindow.show_and_activate() called")
         self.show()
         self.activateWindow()
         self.raise_()
@@ -749,23 +1421,11 @@ class PromptEditorWindow(QMainWindow):
         categories_header_layout.addWidget(categories_title)
         categories_header_layout.addStretch()
 
-        self.categories_list_widget = QScrollArea()
-        self.categories_list_widget.setWidgetResizable(True)
-        self.categories_list_widget.setObjectName("CategoriesList")
-        self.categories_list_widget.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
-        self.categories_list_widget.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
-        self.categories_list_widget.customContextMenuRequested.connect(
-            lambda pos: self._show_panel_context_menu('category', pos)
-        )
-        categories_list_container = QWidget()
-        self.categories_layout = QVBoxLayout(categories_list_container)
-        self.categories_layout.setContentsMargins(0, 0, 0, 0)
-        self.categories_layout.setSpacing(1)
-        self.categories_layout.setAlignment(Qt.AlignmentFlag.AlignTop)
-        self.categories_list_widget.setWidget(categories_list_container)
+        self.categories_view = self._create_panel_view("CategoriesList", 'category')
+        self.categories_view.setRootIndex(self.tree_model.library_index())
 
         categories_layout.addWidget(categories_header)
-        categories_layout.addWidget(self.categories_list_widget, 1)
+        categories_layout.addWidget(self.categories_view, 1)
 
         # ====== Sections Panel ======
         sections_panel = QWidget()
@@ -783,23 +1443,11 @@ class PromptEditorWindow(QMainWindow):
         sections_header_layout.addWidget(self.sections_title)
         sections_header_layout.addStretch()
 
-        self.sections_list_widget = QScrollArea()
-        self.sections_list_widget.setWidgetResizable(True)
-        self.sections_list_widget.setObjectName("SectionsList")
-        self.sections_list_widget.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
-        self.sections_list_widget.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
-        self.sections_list_widget.customContextMenuRequested.connect(
-             lambda pos: self._show_panel_context_menu('section', pos)
-        )
-        sections_list_container = QWidget()
-        self.sections_layout = QVBoxLayout(sections_list_container)
-        self.sections_layout.setContentsMargins(0, 0, 0, 0)
-        self.sections_layout.setSpacing(1)
-        self.sections_layout.setAlignment(Qt.AlignmentFlag.AlignTop)
-        self.sections_list_widget.setWidget(sections_list_container)
+        self.sections_view = self._create_panel_view("SectionsList", 'section')
+        self.sections_view.setRootIndex(self.tree_model.empty_index())
 
         sections_layout.addWidget(sections_header)
-        sections_layout.addWidget(self.sections_list_widget, 1)
+        sections_layout.addWidget(self.sections_view, 1)
 
         # ====== Prompts Panel ======
         prompts_panel = QWidget()
@@ -817,23 +1465,11 @@ class PromptEditorWindow(QMainWindow):
         prompts_header_layout.addWidget(self.prompts_title)
         prompts_header_layout.addStretch()
 
-        self.prompts_list_widget = QScrollArea()
-        self.prompts_list_widget.setWidgetResizable(True)
-        self.prompts_list_widget.setObjectName("PromptsList")
-        self.prompts_list_widget.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
-        self.prompts_list_widget.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
-        self.prompts_list_widget.customContextMenuRequested.connect(
-             lambda pos: self._show_panel_context_menu('prompt', pos)
-        )
-        prompts_list_container = QWidget()
-        self.prompts_layout = QVBoxLayout(prompts_list_container)
-        self.prompts_layout.setContentsMargins(0, 0, 0, 0)
-        self.prompts_layout.setSpacing(1)
-        self.prompts_layout.setAlignment(Qt.AlignmentFlag.AlignTop)
-        self.prompts_list_widget.setWidget(prompts_list_container)
+        self.prompts_view = self._create_panel_view("PromptsList", 'prompt')
+        self.prompts_view.setRootIndex(self.tree_model.empty_index())
 
         prompts_layout.addWidget(prompts_header)
-        prompts_layout.addWidget(self.prompts_list_widget, 1)
+        prompts_layout.addWidget(self.prompts_view, 1)
 
         self.sidebar_splitter.addWidget(categories_panel)
         self.sidebar_splitter.addWidget(sections_panel)
@@ -857,6 +1493,11 @@ class PromptEditorWindow(QMainWindow):
         self.toggle_sidebar_btn.setFixedSize(30, 30)
         self.toggle_sidebar_btn.clicked.connect(self.toggle_sidebar)
         toolbar_layout.addWidget(self.toggle_sidebar_btn)
+        self.trash_btn = QPushButton("Trash")
+        self.trash_btn.setObjectName("TrashButton")
+        self.trash_btn.setToolTip("Restore deleted categories, sections and prompts")
+        self.trash_btn.clicked.connect(self.show_trash)
+        toolbar_layout.addWidget(self.trash_btn)
         toolbar_layout.addStretch(1)
 
         # --- Add Copy Button ---
@@ -867,6 +1508,13 @@ class PromptEditorWindow(QMainWindow):
         self.copy_prompt_btn.setEnabled(False) # Initially disabled
         toolbar_layout.addWidget(self.copy_prompt_btn) # Add BEFORE delete
 
+        self.history_btn = QPushButton("History")
+        self.history_btn.setObjectName("HistoryButton")
+        self.history_btn.setToolTip("Earlier versions of this prompt")
+        self.history_btn.clicked.connect(self.show_revision_history)
+        self.history_btn.setEnabled(False) # Initially disabled
+        toolbar_layout.addWidget(self.history_btn)
+
         self.delete_prompt_btn = QPushButton("Delete Prompt")
         self.delete_prompt_btn.setObjectName("DeleteButton")
         self.delete_prompt_btn.setToolTip("Delete selected prompt (or use Right-Click)")
@@ -887,7 +1535,7 @@ class PromptEditorWindow(QMainWindow):
         self.prompt_description_input.setObjectName("PromptDescriptionInput")
         self.prompt_description_input.setMaximumHeight(60)
         self.prompt_description_input.setEnabled(False)
-        self.prompt_description_input.textChanged.connect(self.save_current_prompt_details)
+        self.prompt_description_input.textChanged.connect(self._on_description_edited)
 
         format_toolbar = QToolBar()
         format_toolbar.setObjectName("FormatToolbar")
@@ -908,7 +1556,7 @@ class PromptEditorWindow(QMainWindow):
         self.editor.setPlaceholderText("Select a prompt to view/edit its content...")
         self.editor.setObjectName("PromptContentEditor")
         self.editor.setEnabled(False)
-        self.editor.textChanged.connect(self.save_current_prompt_content)
+        self.editor.textChanged.connect(self._on_content_edited)
 
         editor_font = QFont()
         editor_font.setFamily("Segoe UI")
@@ -992,7 +1640,7 @@ class PromptEditorWindow(QMainWindow):
             #PanelTitle { font-weight: bold; font-size: 11pt; padding-left: 5px; }
 
             /* --- Toolbar Button Styles --- */
-            #ToggleSidebarButton, #CopyButton, #DeleteButton {
+            #ToggleSidebarButton, #TrashButton, #CopyButton, #HistoryButton, #DeleteButton {
                 background-color: transparent;
                 color: #b3b0ad;
                 border: 1px solid #464766;
@@ -1000,7 +1648,7 @@ class PromptEditorWindow(QMainWindow):
                 padding: 5px 10px; /* Adjusted padding */
                 min-width: 60px; /* Ensure minimum width */
             }
-            #ToggleSidebarButton:hover, #CopyButton:hover, #DeleteButton:hover {
+            #ToggleSidebarButton:hover, #TrashButton:hover, #CopyButton:hover, #HistoryButton:hover, #DeleteButton:hover {
                 background-color: #464766;
             }
             #CopyButton { /* Optional: Slightly different look for Copy */
@@ -1018,7 +1666,7 @@ class PromptEditorWindow(QMainWindow):
                 color: white;
             }
             /* --- Disabled State for Toolbar Buttons --- */
-            #CopyButton:disabled, #DeleteButton:disabled {
+            #CopyButton:disabled, #HistoryButton:disabled, #DeleteButton:disabled {
                 background-color: #2a2b30; /* Darker background */
                 color: #777; /* Greyed out text */
                 border-color: #3a3b40; /* Darker border */
@@ -1042,11 +1690,8 @@ class PromptEditorWindow(QMainWindow):
             QPushButton:hover { background-color: #464766; }
             QLineEdit { background-color: #1e1e24; border: 1px solid #464766; border-radius: 3px; padding: 5px; } /* General LineEdits */
 
-            .ListItemWidget { background-color: transparent; padding: 6px 8px; border: none; border-radius: 3px; }
-            .ListItemWidget:hover { background-color: #3a3b40; }
-            .ListItemWidget.selected { background-color: #464766; }
-            .ListItemWidget QLabel { color: #b3b0ad; font-size: 10pt; margin-top: 0px; }
-            .ListItemWidget .ColorIndicator { border-radius: 3px; margin-right: 5px; }
+            /* Panel rows are painted by PanelItemDelegate */
+            QListView { border: none; outline: none; }
             QScrollArea { border: none; }
             QScrollBar:vertical { border: none; background: #25262b; width: 10px; margin: 0px; }
             QScrollBar::handle:vertical { background: #464766; min-height: 20px; border-radius: 5px; }
@@ -1065,106 +1710,130 @@ class PromptEditorWindow(QMainWindow):
             }
         """)
 
-    def _clear_layout(self, layout):
-        if layout is not None:
-            if hasattr(layout, 'count'):
-                while layout.count():
-                    item = layout.takeAt(0)
-                    widget = item.widget()
-                    if widget is not None:
-                        widget.deleteLater()
-                    elif item.layout() is not None:
-                        self._clear_layout(item.layout())
-            else:
-                print(f"Warning: _clear_layout called with non-layout object: {type(layout)}")
-
-
-    def _create_list_item(self, item_data, item_type):
-        """Creates a widget for a list item with context menu."""
-        item_id = item_data['id']
-        item_data_dict = dict(item_data)
-
-        name = f"Error ({item_type})"
-        try:
-            if item_type == 'category' or item_type == 'section':
-                raw_name = item_data_dict.get('name')
-                name = raw_name if raw_name else f"Unnamed {item_type.capitalize()}"
-            elif item_type == 'prompt':
-                raw_name = item_data_dict.get('title')
-                name = raw_name if raw_name else "Untitled Prompt"
-            else:
-                name = 'Unknown Item'
-        except Exception as e:
-             print(f"ERROR in _create_list_item getting name for ID={item_id}, Type={item_type}: {e}")
-             name = f"Error ({item_type})"
-
-        item_widget = QWidget()
-        item_widget.setObjectName(f"item_{item_type}_{item_id}")
-        item_widget.setProperty("class", "ListItemWidget")
-        item_widget.setProperty("itemId", item_id)
-        item_widget.setProperty("itemType", item_type)
-        item_widget.setProperty("itemData", item_data_dict)
-
-        item_layout = QHBoxLayout(item_widget)
-        item_layout.setContentsMargins(5, 2, 5, 2)
-        item_layout.setSpacing(5)
-
-        if item_type == 'category' or item_type == 'section':
-            color_indicator = QLabel()
-            color_indicator.setFixedSize(15, 15)
-            color_indicator.setObjectName("ColorIndicator")
-            default_color = '#e0e0e0' if item_type == 'category' else '#d0d0d0'
-            item_color = item_data_dict.get('color', default_color)
-            if not item_color or not item_color.startswith('#') or len(item_color) not in [4, 7]:
-                 item_color = default_color
-            # Ensure the color indicator style is applied correctly
-            color_indicator.setStyleSheet(f"background-color: {item_color}; border-radius: 3px; border: 1px solid #333;") # Added border for visibility
-            item_layout.addWidget(color_indicator)
-
-        name_label = QLabel(name)
-        item_layout.addWidget(name_label)
-        item_layout.addStretch()
-
-        item_widget.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
-        item_widget.customContextMenuRequested.connect(
-            functools.partial(self._show_item_context_menu, item_widget)
+    def _create_panel_view(self, object_name, panel_type):
+        """Creates a sidebar list view onto the shared tree model."""
+        view = QListView()
+        view.setObjectName(object_name)
+        view.setModel(self.tree_model)
+        view.setItemDelegate(self.panel_delegate)
+        view.setUniformItemSizes(True) # All rows share the delegate's fixed height
+        view.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
+        view.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        view.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
+        view.setMouseTracking(True) # Needed for the delegate's hover state
+        view.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
+        view.customContextMenuRequested.connect(
+            functools.partial(self._show_view_context_menu, panel_type)
         )
-        item_widget.mousePressEvent = functools.partial(self._item_clicked, item_data=item_data_dict, item_type=item_type)
-
-        selected = False
-        if item_type == 'category' and self.current_category_id == item_id: selected = True
-        elif item_type == 'section' and self.current_section_id == item_id: selected = True
-        elif item_type == 'prompt' and self.current_prompt_id == item_id: selected = True
-
-        if selected:
-            item_widget.setProperty("class", "ListItemWidget selected")
+        view.clicked.connect(self._item_clicked)
+        return view
+
+    def _view_for(self, item_type):
+        return {'category': self.categories_view,
+                'section': self.sections_view,
+                'prompt': self.prompts_view}[item_type]
+
+    def _current_id_for(self, item_type):
+        return {'category': self.current_category_id,
+                'section': self.current_section_id,
+                'prompt': self.current_prompt_id}[item_type]
+
+    def _sync_selection(self, item_type):
+        """Makes the panel's highlighted row match the current category/section/prompt."""
+        view = self._view_for(item_type)
+        current_id = self._current_id_for(item_type)
+        index = self.tree_model.index_for(item_type, current_id) if current_id else QModelIndex()
+        if index.isValid():
+            view.setCurrentIndex(index)
         else:
-            item_widget.setProperty("class", "ListItemWidget") # Ensure non-selected style
-
-        # Re-apply stylesheet to ensure dynamic property changes take effect
-        item_widget.setStyleSheet(self.styleSheet())
-
-        return item_widget
+            view.clearSelection()
+
+    # Panel title: (default text, parent item type, title format)
+    _PANEL_TITLES = {'section': ("Sections", 'category', "Sections in '{}'"),
+                     'prompt': ("Prompts", 'section', "Prompts in '{}'")}
+
+    def _show_child_panel(self, item_type):
+        """Points the sections or prompts panel at the current category/section.
+
+        Rows already in the model are reused; a parent's children are only read
+        from the database the first time it is shown.
+        """
+        default_title, parent_type, title_format = self._PANEL_TITLES[item_type]
+        parent_id = self._current_id_for(parent_type)
+        parent_index = self.tree_model.index_for(parent_type, parent_id) if parent_id else QModelIndex()
+        view = self._view_for(item_type)
+        if parent_index.isValid():
+            self.tree_model.ensure_loaded(parent_index)
+            view.setRootIndex(parent_index)
+            self._view_titles(item_type).setText(title_format.format(parent_index.data(ITEM_DATA_ROLE)['name']))
+        else:
+            view.setRootIndex(self.tree_model.empty_index())
+            self._view_titles(item_type).setText(default_title)
+        self._sync_selection(item_type)
+
+    def _view_titles(self, item_type):
+        return self.sections_title if item_type == 'section' else self.prompts_title
+
+    def _update_panel_titles(self, *changed_indexes):
+        """Keeps the panel titles in step with renamed categories/sections."""
+        for item_type, (default_title, parent_type, title_format) in self._PANEL_TITLES.items():
+            parent_id = self._current_id_for(parent_type)
+            parent_index = self.tree_model.index_for(parent_type, parent_id) if parent_id else QModelIndex()
+            if parent_index.isValid():
+                self._view_titles(item_type).setText(title_format.format(parent_index.data(ITEM_DATA_ROLE)['name']))
+
+    def _on_item_about_to_be_removed(self, item_type, item_id):
+        """Clears the selection below an item that is leaving the panels."""
+        # Save while current_prompt_id still names the edited prompt: the
+        # autosave only collects fields of the prompt that is shown
+        self.autosave.flush()
+        if item_type == 'category' and item_id == self.current_category_id:
+            self.current_category_id = None
+            self.current_section_id = None
+            self.current_prompt_id = None
+        elif item_type == 'section' and item_id == self.current_section_id:
+            self.current_section_id = None
+            self.current_prompt_id = None
+        elif item_type == 'prompt' and item_id == self.current_prompt_id:
+            self.current_prompt_id = None
+        else:
+            return
+        self.clear_editor_fields() # Disables buttons
+        # Move the views off the removed item before its row disappears
+        if item_type == 'category':
+            self._show_child_panel('section')
+        if item_type in ('category', 'section'):
+            self._show_child_panel('prompt')
 
-    def _item_clicked(self, event: QMouseEvent, item_data: dict, item_type: str):
+    def _item_clicked(self, index):
         """Handles left-click selection."""
-        if event.button() == Qt.MouseButton.LeftButton:
-            print(f"_item_clicked - Type: {item_type}, ID: {item_data.get('id')}")
-            if item_type == 'category': self.category_clicked(item_data)
-            elif item_type == 'section': self.section_clicked(item_data)
-            elif item_type == 'prompt': self.prompt_clicked(item_data)
-        else:
-            pass # Allow other events like right-click
+        item_type = index.data(ITEM_TYPE_ROLE)
+        item_data = index.data(ITEM_DATA_ROLE)
+        logger.debug("_item_clicked - Type: %s, ID: %s", item_type, index.data(ITEM_ID_ROLE))
+        if item_type == 'category': self.category_clicked(item_data)
+        elif item_type == 'section': self.section_clicked(item_data)
+        elif item_type == 'prompt': self.prompt_clicked(item_data)
 
     # --- Context Menu Handlers ---
 
-    def _show_item_context_menu(self, widget, position):
-        """Shows context menu for a specific item widget."""
-        item_id = widget.property("itemId")
-        item_type = widget.property("itemType")
-        item_data = widget.property("itemData")
+    def _show_view_context_menu(self, panel_type, position):
+        """Shows the item menu when right-clicking a row, the panel menu otherwise."""
+        view = self._view_for(panel_type)
+        index = view.indexAt(position)
+        if index.isValid():
+            self._show_item_context_menu(view, index, position)
+        else:
+            self._show_panel_context_menu(panel_type, position)
+        # A right-click may have moved the view's selection; restore it
+        self._sync_selection(panel_type)
+
+    def _show_item_context_menu(self, view, index, position):
+        """Shows context menu for a specific row of a panel view."""
+        item_id = index.data(ITEM_ID_ROLE)
+        item_type = index.data(ITEM_TYPE_ROLE)
+        item_data = index.data(ITEM_DATA_ROLE)
         if not item_id or not item_type or not item_data:
-            print(f"Context menu requested for invalid widget state: ID={item_id}, Type={item_type}")
+            logger.warning("Context menu requested for invalid item state: ID=%s, Type=%s", item_id, item_type)
             return
 
         menu = QMenu(self)
@@ -1210,20 +1879,21 @@ class PromptEditorWindow(QMainWindow):
         delete_action.triggered.connect(lambda: self._handle_delete(item_id, item_type))
         menu.addAction(delete_action)
 
-        menu.exec(widget.mapToGlobal(position))
+        menu.exec(view.viewport().mapToGlobal(position))
 
     def _show_panel_context_menu(self, panel_type, position):
         """Shows context menu for the panel background."""
         menu = QMenu(self)
         target_widget = None
 
-        print(f"_show_panel_context_menu for '{panel_type}', current_category_id = {self.current_category_id}, current_section_id = {self.current_section_id}")
+        logger.debug("_show_panel_context_menu for '%s', current_category_id = %s, current_section_id = %s",
+                     panel_type, self.current_category_id, self.current_section_id)
 
         if panel_type == 'category':
             add_action = QAction("Add New Category", self)
             add_action.triggered.connect(self.add_category)
             menu.addAction(add_action)
-            target_widget = self.categories_list_widget
+            target_widget = self.categories_view
         elif panel_type == 'section':
             current_cat_id = self.current_category_id
             if current_cat_id:
@@ -1234,7 +1904,7 @@ class PromptEditorWindow(QMainWindow):
                 no_cat_action = QAction("Select a Category first", self)
                 no_cat_action.setEnabled(False)
                 menu.addAction(no_cat_action)
-            target_widget = self.sections_list_widget
+            target_widget = self.sections_view
         elif panel_type == 'prompt':
             current_sec_id = self.current_section_id
             if current_sec_id:
@@ -1245,7 +1915,7 @@ class PromptEditorWindow(QMainWindow):
                 no_sec_action = QAction("Select a Section first", self)
                 no_sec_action.setEnabled(False)
                 menu.addAction(no_sec_action)
-            target_widget = self.prompts_list_widget
+            target_widget = self.prompts_view
 
         if self.clipboard and self.clipboard['type'] == panel_type:
              can_paste = False
@@ -1259,7 +1929,7 @@ class PromptEditorWindow(QMainWindow):
                  menu.addAction(paste_action)
 
         if target_widget and menu.actions():
-            menu.exec(target_widget.mapToGlobal(position))
+            menu.exec(target_widget.viewport().mapToGlobal(position))
 
     # --- Action Handlers ---
 
@@ -1271,17 +1941,14 @@ class PromptEditorWindow(QMainWindow):
                 try:
                     if item_type == 'category':
                         db.update_category(item_id, new_name)
-                        self.load_categories()
                     elif item_type == 'section':
                         db.update_section(item_id, new_name)
-                        self.load_sections()
                     elif item_type == 'prompt':
-                        prompt_data = db.get_prompt(item_id)
-                        if prompt_data:
-                            db.update_prompt(item_id, new_name, prompt_data['description'], prompt_data['content'])
-                            self.load_prompts()
-                            if self.current_prompt_id == item_id:
-                                self.prompt_title_input.setText(new_name)
+                        # Only the title changes, so pending content autosaves are unaffected
+                        db.update_prompt_fields(item_id, title=new_name)
+                        self.autosave.remember(item_id, title=new_name)
+                        if self.current_prompt_id == item_id:
+                            self.prompt_title_input.setText(new_name)
                 except Exception as e:
                      QMessageBox.critical(self, "Error", f"Failed to rename {item_type}: {e}")
             elif not new_name:
@@ -1299,16 +1966,12 @@ class PromptEditorWindow(QMainWindow):
             parent_id_col = 'section_id'
             parent_id = self.current_section_id
 
-        if db.move_item(table_name, item_id, direction, parent_id_col, parent_id):
-            if item_type == 'category': self.load_categories()
-            elif item_type == 'section': self.load_sections()
-            elif item_type == 'prompt': self.load_prompts()
-        else:
+        if not db.move_item(table_name, item_id, direction, parent_id_col, parent_id):
              QMessageBox.warning(self, "Move Failed", f"Could not move {item_type} {direction}.")
 
     def _handle_copy(self, item_id, item_type):
         self.clipboard = {'id': item_id, 'type': item_type}
-        print(f"Copied {item_type} with ID {item_id} to internal clipboard.")
+        logger.debug("Copied %s with ID %s to internal clipboard.", item_type, item_id)
         QMessageBox.information(self, "Copied", f"Prepared to duplicate {item_type}: {item_id}.\nRight-click where you want to paste.")
 
     def _handle_paste(self, target_item_id, target_type):
@@ -1321,51 +1984,25 @@ class PromptEditorWindow(QMainWindow):
 
         source_id = self.clipboard['id']
         source_type = self.clipboard['type']
-        print(f"Pasting {source_type} ID {source_id} as target type {target_type}")
+        logger.debug("Pasting %s ID %s as target type %s", source_type, source_id, target_type)
 
         try:
+            # Each paste duplicates the whole subtree in one transaction
             if source_type == 'category':
-                source_cat = db.get_categories()
-                source_data = next((c for c in source_cat if c['id'] == source_id), None)
-                if source_data:
-                    s_dict = dict(source_data)
-                    new_id = db.add_category(f"{s_dict['name']} (Copy)", s_dict.get('color')) # Pass color
-                    self.load_categories()
-                else: raise ValueError("Source category not found")
+                new_id = db.clone_category(source_id)
+                if new_id is None: raise ValueError("Source category not found")
 
             elif source_type == 'section':
                 paste_target_category_id = self.current_category_id
                 if not paste_target_category_id: raise ValueError("No target category selected for paste")
-
-                conn = db.get_db_connection()
-                cur = conn.cursor()
-                cur.execute("SELECT * FROM sections WHERE id = ?", (source_id,))
-                source_data_row = cur.fetchone()
-                conn.close()
-                source_data = dict(source_data_row) if source_data_row else None
-
-                if source_data:
-                    new_id = db.add_section(f"{source_data['name']} (Copy)", paste_target_category_id)
-                    if new_id and 'color' in source_data and source_data['color']:
-                         db.update_section_color(new_id, source_data['color'])
-                    self.load_sections()
-                else: raise ValueError("Source section not found")
+                new_id = db.clone_section(source_id, paste_target_category_id)
+                if new_id is None: raise ValueError("Source section not found")
 
             elif source_type == 'prompt':
                 paste_target_section_id = self.current_section_id
                 if not paste_target_section_id: raise ValueError("No target section selected for paste")
-
-                source_data = db.get_prompt(source_id)
-                if source_data:
-                    source_data_dict = dict(source_data)
-                    new_id = db.add_prompt(
-                        f"{source_data_dict['title']} (Copy)",
-                        source_data_dict['description'],
-                        source_data_dict['content'],
-                        paste_target_section_id
-                    )
-                    self.load_prompts()
-                else: raise ValueError("Source prompt not found")
+                new_id = db.clone_prompt(source_id, paste_target_section_id)
+                if new_id is None: raise ValueError("Source prompt not found")
 
             QMessageBox.information(self, "Pasted", f"Successfully duplicated {source_type}.")
             self.clipboard = None # Clear clipboard after paste
@@ -1376,12 +2013,9 @@ class PromptEditorWindow(QMainWindow):
     # --- MODIFIED: Use ColorGridDialog ---
     def _handle_set_category_color(self, item_id):
         current_color_hex = '#e0e0e0' # Default
-        cats = db.get_categories()
-        cat_data = next((c for c in cats if c['id'] == item_id), None)
-        if cat_data:
-             cat_data_dict = dict(cat_data)
-             if cat_data_dict.get('color'):
-                 current_color_hex = cat_data_dict['color']
+        cat_data = hierarchy.get_category(item_id)
+        if cat_data and cat_data.get('color'):
+            current_color_hex = cat_data['color']
 
         # Use the new ColorGridDialog
         dialog = ColorGridDialog("Select Category Color", initial_color=current_color_hex, parent=self)
@@ -1389,20 +2023,13 @@ class PromptEditorWindow(QMainWindow):
             selected_color = dialog.get_selected_color()
             if selected_color: # Make sure a color was actually selected
                 db.update_category_color(item_id, selected_color)
-                self.load_categories() # Reload to show the new color
 
     # --- MODIFIED: Use ColorGridDialog ---
     def _handle_set_section_color(self, item_id):
         current_color_hex = '#d0d0d0' # Default
-        if self.current_category_id:
-            secs = db.get_sections(self.current_category_id)
-            sec_data = next((s for s in secs if s['id'] == item_id), None)
-            if sec_data:
-                 sec_data_dict = dict(sec_data)
-                 if sec_data_dict.get('color'):
-                      current_color_hex = sec_data_dict['color']
-        else:
-             print("Warning: Cannot get current section color, no category selected.")
+        sec_data = hierarchy.get_section(item_id)
+        if sec_data and sec_data.get('color'):
+            current_color_hex = sec_data['color']
 
         # Use the new ColorGridDialog
         dialog = ColorGridDialog("Select Section Color", initial_color=current_color_hex, parent=self)
@@ -1410,84 +2037,60 @@ class PromptEditorWindow(QMainWindow):
             selected_color = dialog.get_selected_color()
             if selected_color: # Make sure a color was actually selected
                 db.update_section_color(item_id, selected_color)
-                self.load_sections() # Reload to show the new color
 
     def _handle_delete(self, item_id, item_type):
         # --- Use the custom ConfirmDialog ---
         dialog = ConfirmDialog(
             title='Confirm Delete',
-            message=f"Are you sure you want to delete this {item_type}?",
-            informative_text="(Sections/Prompts within will also be deleted!)",
+            message=f"Move this {item_type} to the trash?",
+            informative_text="(Sections/Prompts within go with it; restore it from the Trash)",
             parent=self # Set parent for proper modality and positioning
         )
 
         # --- Execute the dialog and check the result ---
         if dialog.exec(): # Returns True if accepted (Yes clicked), False if rejected (No or Close clicked)
             # --- Original delete logic ---
+            # Only flags the item (instant, whatever it contains); the panels
+            # are updated through _on_item_about_to_be_removed
             try:
                 if item_type == 'category':
                     db.delete_category(item_id)
-                    if self.current_category_id == item_id:
-                        self.current_category_id = None
-                        self.current_section_id = None
-                        self.current_prompt_id = None
-                        self.sections_title.setText("Sections")
-                        self.prompts_title.setText("Prompts")
-                        self.clear_editor_fields() # Disables buttons
-                    self.load_categories()
-                    self.load_sections()
-                    self.load_prompts()
                 elif item_type == 'section':
                     db.delete_section(item_id)
-                    if self.current_section_id == item_id:
-                        self.current_section_id = None
-                        self.current_prompt_id = None
-                        self.prompts_title.setText("Prompts")
-                        self.clear_editor_fields() # Disables buttons
-                    self.load_sections()
-                    self.load_prompts()
                 elif item_type == 'prompt':
+                    self.autosave.flush(wait=True) # Unsaved edits go to the trash with it
                     db.delete_prompt(item_id)
-                    if self.current_prompt_id == item_id:
-                        self.current_prompt_id = None
-                        self.clear_editor_fields() # Disables buttons
-                    self.load_prompts()
             except Exception as e:
                  QMessageBox.critical(self, "Error", f"Failed to delete {item_type}: {e}")
         # else: User clicked No or closed the dialog, so do nothing.
 
     # --- Category Loading and Handling ---
+    @traced
     def load_categories(self):
-        self._clear_layout(self.categories_layout)
-        categories = db.get_categories()
-        for category in categories:
-            item_widget = self._create_list_item(category, 'category')
-            self.categories_layout.addWidget(item_widget)
-        self.categories_layout.addStretch()
-        if self.current_category_id not in [c['id'] for c in categories]:
+        category_ids = self.tree_model.reload_children(self.tree_model.library_index())
+        if self.current_category_id not in category_ids:
+             self.autosave.flush() # Before the prompt is deselected
              self.current_category_id = None
              self.current_section_id = None
              self.current_prompt_id = None
              self.sections_title.setText("Sections")
              self.prompts_title.setText("Prompts")
              self.clear_editor_fields() # Ensure buttons disabled
+        self._sync_selection('category')
         self.load_sections()
 
     def category_clicked(self, category_data):
-        category_data_dict = dict(category_data)
-        category_id = category_data_dict.get('id')
+        category_id = dict(category_data).get('id')
         if self.current_category_id != category_id:
+            self.autosave.flush() # Before the prompt is deselected
             self.current_category_id = category_id
             self.current_section_id = None
             self.current_prompt_id = None
-            self.sections_title.setText("Sections") # Reset title
-            self.prompts_title.setText("Prompts") # Reset title
-            self.load_categories() # Reload to update selection highlight
-            # load_sections() is called by load_categories()
             self.clear_editor_fields() # Disables buttons
-        else:
-            # If clicking the already selected category, ensure highlight is correct
-            self.load_categories()
+            self._show_child_panel('section')
+            self._show_child_panel('prompt')
+        # Only the highlighted row changes; nothing is reloaded
+        self._sync_selection('category')
 
 
     def add_category(self):
@@ -1497,56 +2100,38 @@ class PromptEditorWindow(QMainWindow):
             if name:
                 new_id = db.add_category(name)
                 if new_id:
-                    self.current_category_id = new_id
-                    self.current_section_id = None
-                    self.current_prompt_id = None
-                    self.load_categories() # Calls load_sections -> load_prompts
-                    self.sections_title.setText("Sections")
-                    self.prompts_title.setText("Prompts")
-                    self.clear_editor_fields() # Disables buttons
+                    # The new row is already in the panel; just select it
+                    self.category_clicked({'id': new_id})
                 else:
                      QMessageBox.warning(self, "Database Error", "Failed to add category.")
             elif name is not None:
                  QMessageBox.warning(self, "Input Error", "Category name cannot be empty.")
 
     # --- Section Loading and Handling ---
+    @traced
     def load_sections(self):
-        self._clear_layout(self.sections_layout)
-        sections = []
-        category_name = "Sections" # Default title
+        """Re-reads the sections of the current category (full refresh)."""
+        category_index = QModelIndex()
         if self.current_category_id:
-            # Get category name for the title
-            cats = db.get_categories()
-            cat_data = next((c for c in cats if c['id'] == self.current_category_id), None)
-            if cat_data: category_name = f"Sections in '{dict(cat_data)['name']}'"
-
-            sections = db.get_sections(self.current_category_id)
-            for section in sections:
-                item_widget = self._create_list_item(section, 'section')
-                self.sections_layout.addWidget(item_widget)
-
-        self.sections_title.setText(category_name) # Update title
-        self.sections_layout.addStretch()
-        if self.current_section_id not in [s['id'] for s in sections]:
+            category_index = self.tree_model.index_for('category', self.current_category_id)
+        section_ids = self.tree_model.reload_children(category_index) if category_index.isValid() else []
+        if self.current_section_id not in section_ids:
+             self.autosave.flush() # Before the prompt is deselected
              self.current_section_id = None
              self.current_prompt_id = None
-             self.prompts_title.setText("Prompts")
              self.clear_editor_fields() # Ensure buttons disabled
+        self._show_child_panel('section')
         self.load_prompts()
 
     def section_clicked(self, section_data):
-        section_data_dict = dict(section_data)
-        section_id = section_data_dict.get('id')
+        section_id = dict(section_data).get('id')
         if self.current_section_id != section_id:
+            self.autosave.flush() # Before the prompt is deselected
             self.current_section_id = section_id
             self.current_prompt_id = None
-            self.prompts_title.setText("Prompts") # Reset title
-            self.load_sections() # Reload to update selection highlight
-            # load_prompts() is called by load_sections()
             self.clear_editor_fields() # Disables buttons
-        else:
-            # If clicking the already selected section, ensure highlight is correct
-            self.load_sections()
+            self._show_child_panel('prompt')
+        self._sync_selection('section')
 
 
     def add_section(self, category_id=None):
@@ -1556,9 +2141,8 @@ class PromptEditorWindow(QMainWindow):
             return
 
         target_category_name = ""
-        cats = db.get_categories()
-        cat_data = next((c for c in cats if c['id'] == target_category_id), None)
-        if cat_data: target_category_name = dict(cat_data)['name']
+        cat_data = hierarchy.get_category(target_category_id)
+        if cat_data: target_category_name = cat_data['name']
 
         dialog = ItemDialog(f"Add Section to '{target_category_name}'", "Section Name:", "", self)
         if dialog.exec():
@@ -1568,56 +2152,37 @@ class PromptEditorWindow(QMainWindow):
                 if new_id:
                     # If added via panel context menu and it's not the current category, switch
                     if category_id is not None and category_id != self.current_category_id:
-                         self.current_category_id = category_id
-                         self.load_categories() # Reload categories to show selection
-
-                    self.current_section_id = new_id
-                    self.current_prompt_id = None
-                    self.load_sections() # Reload sections to show new one and highlight
-                    # load_prompts() called by load_sections()
-                    self.clear_editor_fields() # Disables buttons
+                         self.category_clicked({'id': category_id})
+                    self.section_clicked({'id': new_id})
                 else:
                     QMessageBox.warning(self, "Database Error", "Failed to add section.")
             elif name is not None:
                  QMessageBox.warning(self, "Input Error", "Section name cannot be empty.")
 
     # --- Prompt Loading and Handling ---
+    @traced
     def load_prompts(self):
-        self._clear_layout(self.prompts_layout)
-        prompts = []
-        section_name = "Prompts" # Default title
+        """Re-reads the prompts of the current section (full refresh)."""
+        section_index = QModelIndex()
         if self.current_section_id:
-             # Get section name for the title
-             if self.current_category_id:
-                 secs = db.get_sections(self.current_category_id)
-                 sec_data = next((s for s in secs if s['id'] == self.current_section_id), None)
-                 if sec_data: section_name = f"Prompts in '{dict(sec_data)['name']}'"
-
-             prompts = db.get_prompts(self.current_section_id)
-             for prompt in prompts:
-                 item_widget = self._create_list_item(prompt, 'prompt')
-                 self.prompts_layout.addWidget(item_widget)
-
-        self.prompts_title.setText(section_name) # Update title
-        self.prompts_layout.addStretch()
-        if self.current_prompt_id not in [p['id'] for p in prompts]:
+            section_index = self.tree_model.index_for('section', self.current_section_id)
+        prompt_ids = self.tree_model.reload_children(section_index) if section_index.isValid() else []
+        self._show_child_panel('prompt')
+        if self.current_prompt_id not in prompt_ids:
+             self.autosave.flush() # Before the prompt is deselected
              self.current_prompt_id = None
              self.clear_editor_fields() # Ensure buttons disabled
         elif self.current_prompt_id:
              # If a prompt is selected, ensure editor fields are loaded/enabled
              self.load_prompt_details(self.current_prompt_id)
 
-
     def prompt_clicked(self, prompt_data):
-        prompt_data_dict = dict(prompt_data)
-        prompt_id = prompt_data_dict.get('id')
+        prompt_id = dict(prompt_data).get('id')
         if self.current_prompt_id != prompt_id:
+            self.autosave.flush() # Collects the outgoing prompt's fields while it is still current
             self.current_prompt_id = prompt_id
-            self.load_prompts() # Reload list to highlight and load details
-            # load_prompt_details() is called by load_prompts() if current_prompt_id is set
-        else:
-            # If clicking the already selected prompt, ensure highlight is correct
-            self.load_prompts()
+            self.load_prompt_details(prompt_id)
+        self._sync_selection('prompt')
 
 
     def add_prompt(self, section_id=None):
@@ -1627,10 +2192,8 @@ class PromptEditorWindow(QMainWindow):
             return
 
         target_section_name = ""
-        if self.current_category_id:
-            secs = db.get_sections(self.current_category_id)
-            sec_data = next((s for s in secs if s['id'] == target_section_id), None)
-            if sec_data: target_section_name = dict(sec_data)['name']
+        sec_data = hierarchy.get_section(target_section_id)
+        if sec_data: target_section_name = sec_data['name']
 
         dialog = ItemDialog(f"Add Prompt to '{target_section_name}'", "Prompt Title:", "", self)
         if dialog.exec():
@@ -1640,12 +2203,8 @@ class PromptEditorWindow(QMainWindow):
                 if new_id:
                      # If added via item context menu and it's not the current section, switch
                     if section_id is not None and section_id != self.current_section_id:
-                         self.current_section_id = section_id
-                         self.load_sections() # Reload sections to show selection
-
-                    self.current_prompt_id = new_id
-                    self.load_prompts() # Reload prompts to show new one, highlight, and load details
-                    # load_prompt_details() called by load_prompts()
+                         self.section_clicked({'id': section_id})
+                    self.prompt_clicked({'id': new_id})
                     self.prompt_title_input.setFocus()
                 else:
                      QMessageBox.warning(self, "Database Error", "Failed to add prompt.")
@@ -1663,16 +2222,42 @@ class PromptEditorWindow(QMainWindow):
             clipboard = QApplication.clipboard()
             text_content = self.editor.toPlainText() # Get plain text
             clipboard.setText(text_content)
-            print(f"Copied content of prompt {self.current_prompt_id} to clipboard.")
+            logger.debug("Copied content of prompt %s to clipboard.", self.current_prompt_id)
             # Show a temporary tooltip confirmation
             QToolTip.showText(self.copy_prompt_btn.mapToGlobal(QPoint(0, -30)), "Content Copied!", self.copy_prompt_btn, self.copy_prompt_btn.rect(), 1500)
         # else: Button should be disabled if no prompt selected
 
+    def show_revision_history(self):
+        """Lists the current prompt's earlier versions and restores the one picked."""
+        prompt_id = self.current_prompt_id
+        if not prompt_id:
+            return
+        # Pending edits become the newest revision before the list is read
+        self.autosave.flush(wait=True)
+        dialog = RevisionHistoryDialog(prompt_id, parent=self)
+        if dialog.exec() == QDialog.DialogCode.Accepted:
+            revision_id = dialog.selected_revision_id()
+            if revision_id is not None:
+                db.restore_prompt_revision(revision_id)
+                self.load_prompt_details(prompt_id)
+
+    def show_trash(self):
+        """Lists the trashed items; restored ones reappear through the change notifications."""
+        TrashDialog(parent=self).exec()
+
     # --- Editor Field Handling ---
+    @traced
     def load_prompt_details(self, prompt_id):
+        # Save edits of the prompt being replaced, and make sure a background
+        # write of this prompt has landed before reading it back
+        self.autosave.flush()
+        self.autosave.wait_for(prompt_id)
         prompt = db.get_prompt(prompt_id)
         if prompt:
             prompt_dict = dict(prompt)
+            self.autosave.remember(prompt_id, title=prompt_dict.get('title', ''),
+                                   description=prompt_dict.get('description', ''),
+                                   content=prompt_dict.get('content', ''))
             self.prompt_title_input.blockSignals(True)
             self.prompt_description_input.blockSignals(True)
             self.editor.blockSignals(True)
@@ -1686,16 +2271,18 @@ class PromptEditorWindow(QMainWindow):
             self.prompt_description_input.setEnabled(True)
             self.editor.setEnabled(True)
             self.copy_prompt_btn.setEnabled(True) # Enable Copy button
+            self.history_btn.setEnabled(True)
             self.delete_prompt_btn.setEnabled(True) # Enable Delete button
 
             self.prompt_title_input.blockSignals(False)
             self.prompt_description_input.blockSignals(False)
             self.editor.blockSignals(False)
         else:
-            print(f"Warning: Prompt ID {prompt_id} not found in database.")
+            logger.warning("Prompt ID %s not found in database.", prompt_id)
             self.clear_editor_fields() # Clear fields and disable buttons
 
     def clear_editor_fields(self):
+        self.autosave.flush() # Save edits before the fields are emptied
         self.prompt_title_input.blockSignals(True)
         self.prompt_description_input.blockSignals(True)
         self.editor.blockSignals(True)
@@ -1709,71 +2296,54 @@ class PromptEditorWindow(QMainWindow):
         self.prompt_description_input.setEnabled(False)
         self.editor.setEnabled(False)
         self.copy_prompt_btn.setEnabled(False) # Disable Copy button
+        self.history_btn.setEnabled(False)
         self.delete_prompt_btn.setEnabled(False) # Disable Delete button
 
         self.prompt_title_input.blockSignals(False)
         self.prompt_description_input.blockSignals(False)
         self.editor.blockSignals(False)
 
+    # --- Autosave ---
+    # Edits only mark fields dirty; AutosaveQueue collects the values (one
+    # toHtml() per flush, not per keystroke) and writes the changed columns.
+
     def save_current_prompt_details(self):
-        """Saves Title and Description when editing finishes or text changes."""
+        """Saves the Title when editing finishes (Enter or focus out)."""
         if self.current_prompt_id and self.prompt_title_input.isEnabled():
-            # Check if the sender is one of the inputs we care about
-            sender = self.sender()
-            if sender not in [self.prompt_title_input, self.prompt_description_input]:
-                 # If called manually (e.g., focus out), proceed
-                 pass
-            elif sender and sender.signalsBlocked():
-                 return # Don't save if signals are blocked
+            if self.prompt_title_input.signalsBlocked():
+                return
+            self.autosave.mark_dirty(self.current_prompt_id, 'title')
+            self.autosave.flush()
 
-            title = self.prompt_title_input.text().strip()
-            description = self.prompt_description_input.toPlainText().strip()
-
-            current_prompt = db.get_prompt(self.current_prompt_id)
-            if current_prompt:
-                current_prompt_dict = dict(current_prompt)
-                content = current_prompt_dict.get('content', '')
-
-                if title: # Title must not be empty
-                    # Only update if title or description actually changed
-                    if (title != current_prompt_dict.get('title', '') or
-                        description != current_prompt_dict.get('description', '')):
-                        print(f"Saving details for prompt {self.current_prompt_id}")
-                        db.update_prompt(self.current_prompt_id, title, description, content)
-                        # Reload prompts list ONLY if title changed
-                        if title != current_prompt_dict.get('title', ''):
-                            self.load_prompts() # Reload list to update title
-                else:
-                    # Don't show message box on every keystroke if title becomes empty
-                    # Maybe just revert visually? Or handle on focus out?
-                    # For now, just prevent saving an empty title
-                    print(f"Prevented saving empty title for prompt {self.current_prompt_id}")
-                    # Optionally revert the title input visually
-                    # self.prompt_title_input.blockSignals(True)
-                    # self.prompt_title_input.setText(current_prompt_dict.get('title', ''))
-                    # self.prompt_title_input.blockSignals(False)
-            else:
-                 print(f"Error: Cannot save details, prompt {self.current_prompt_id} not found.")
+    def _on_description_edited(self):
+        if self.current_prompt_id and self.prompt_description_input.isEnabled():
+            self.autosave.mark_dirty(self.current_prompt_id, 'description')
 
-    def save_current_prompt_content(self):
-        """Saves only the main Content when editor text changes."""
+    def _on_content_edited(self):
         if self.current_prompt_id and self.editor.isEnabled():
-            if self.editor.signalsBlocked(): return
-
-            content = self.editor.toHtml()
-
-            current_prompt = db.get_prompt(self.current_prompt_id)
-            if current_prompt:
-                 current_prompt_dict = dict(current_prompt)
-                 # Only update if content actually changed
-                 if content != current_prompt_dict.get('content', ''):
-                     print(f"Saving content for prompt {self.current_prompt_id}")
-                     db.update_prompt(self.current_prompt_id,
-                                      current_prompt_dict.get('title',''),
-                                      current_prompt_dict.get('description',''),
-                                      content)
+            self.autosave.mark_dirty(self.current_prompt_id, 'content')
+
+    def _on_focus_changed(self, old_widget, new_widget):
+        editor_fields = (self.prompt_title_input, self.prompt_description_input, self.editor)
+        if old_widget in editor_fields and new_widget not in editor_fields:
+            self.autosave.flush()
+
+    def _collect_prompt_fields(self, prompt_id, field_names):
+        """Current editor values of the given fields (called by AutosaveQueue on flush)."""
+        if prompt_id != self.current_prompt_id or not self.editor.isEnabled():
+            return {}
+        values = {}
+        if 'title' in field_names:
+            title = self.prompt_title_input.text().strip()
+            if title: # Title must not be empty
+                values['title'] = title
             else:
-                 print(f"Error: Cannot save content, prompt {self.current_prompt_id} not found.")
+                logger.debug("Prevented saving empty title for prompt %s", prompt_id)
+        if 'description' in field_names:
+            values['description'] = self.prompt_description_input.toPlainText().strip()
+        if 'content' in field_names:
+            values['content'] = self.editor.toHtml()
+        return values
 
     def format_text(self, format_type):
         cursor = self.editor.textCursor()
@@ -1810,17 +2380,9 @@ class PromptEditorWindow(QMainWindow):
         self.addAction(underline_shortcut)
 
     def closeEvent(self, event):
-        print("Editor closing")
+        logger.debug("Editor closing")
         # Ensure any pending edits are saved before hiding
-        if self.current_prompt_id:
-             # Check if focus is currently in an editable field and trigger save if needed
-             focused_widget = QApplication.focusWidget()
-             if focused_widget == self.prompt_title_input:
-                 self.save_current_prompt_details()
-             elif focused_widget == self.prompt_description_input:
-                 self.save_current_prompt_details()
-             elif focused_widget == self.editor:
-                 self.save_current_prompt_content() # Content saves on textChanged, but maybe force here?
+        self.autosave.flush(wait=True)
 
         self.closing.emit()
         self.hide()
@@ -0,0 +1,712 @@
+# --- START OF FILE fuzzy_search.py ---
+
+import bisect
+import heapq
+import itertools
+import math
+import re
+import string
+import threading
+import time
+from collections import OrderedDict
+
+# Import database functions
+import database as db
+from instrumentation import traced
+
+# ==================================
+#      Scoring (modelled on fzf)
+# ==================================
+# Every matched character scores SCORE_MATCH; gaps between matched characters
+# cost SCORE_GAP_START for the first skipped character and SCORE_GAP_EXTENSION
+# for each further one. Characters at word starts earn a bonus, and a run of
+# consecutive matches keeps the bonus of its first character, so "pr" in
+# "Prompt Review" beats "pr" inside "improve". The first query character's
+# bonus counts double.
+SCORE_MATCH = 16
+SCORE_GAP_START = -3
+SCORE_GAP_EXTENSION = -1
+BONUS_BOUNDARY_WHITE = 10   # After whitespace
+BONUS_BOUNDARY_DELIMITER = 9  # After a path/word delimiter
+BONUS_BOUNDARY = 8          # After any other non-word character
+BONUS_CAMEL = 7             # camelCase hump or start of a number
+BONUS_CONSECUTIVE = -(SCORE_GAP_START + SCORE_GAP_EXTENSION)
+BONUS_FIRST_CHAR_MULTIPLIER = 2
+TITLE_MATCH_BONUS = 24      # A term matched inside the title rather than the category/section part
+
+PATH_SEPARATOR = " > "
+_DELIMITERS = frozenset("/,:;|>-_.")
+
+# Typo fallback: a query term that is no subsequence of the candidate may
+# still match a title word within this many edits (insert/delete/substitute/
+# swap of adjacent characters). Terms shorter than TYPO_MIN_TERM_LENGTH never
+# fall back.
+TYPO_MIN_TERM_LENGTH = 3
+def _max_typos(term):
+    return 1 if len(term) <= 4 else 2
+
+# Frecency (see database.py, Usage Functions): a prompt used often and
+# recently gets up to FRECENCY_MAX_BONUS added to its match score,
+# FRECENCY_WEIGHT per doubling of its decayed use count. That lifts it above
+# matches of similar quality without burying a clearly better match.
+FRECENCY_WEIGHT = 8
+FRECENCY_MAX_BONUS = 48
+
+def _frecency_bonus(frecency, now):
+    if frecency is None:
+        return 0
+    return min(FRECENCY_MAX_BONUS, FRECENCY_WEIGHT * math.log2(1 + db.frecency_score(frecency, now)))
+
+CANCEL_CHECK_INTERVAL = 4096 # Candidates checked between should_stop() checks
+
+# Matches scored and ranked at a time (see FuzzyIndex.search). Scoring runs
+# in Python at some 15 µs per match, so this keeps a search within a frame
+# however many prompts match.
+SCORED_MATCH_LIMIT = 128
+
+# Entries kept per search cache (see FuzzyIndex). The largest entries are the
+# line sets of one- or two-letter terms, up to one int per prompt.
+SEARCH_CACHE_SIZE = 32
+
+_CLASS_WHITE, _CLASS_DELIMITER, _CLASS_OTHER, _CLASS_LOWER, _CLASS_UPPER, _CLASS_DIGIT = range(6)
+
+def _char_class(char):
+    if char.islower():
+        return _CLASS_LOWER
+    if char.isupper():
+        return _CLASS_UPPER
+    if char.isdigit():
+        return _CLASS_DIGIT
+    if char.isspace():
+        return _CLASS_WHITE
+    if char in _DELIMITERS:
+        return _CLASS_DELIMITER
+    if char.isalpha():
+        return _CLASS_LOWER # Letters without case (CJK, ...)
+    return _CLASS_OTHER
+
+def _bonus(previous_class, current_class):
+    if current_class > _CLASS_OTHER: # A word character
+        if previous_class == _CLASS_WHITE:
+            return BONUS_BOUNDARY_WHITE
+        if previous_class == _CLASS_DELIMITER:
+            return BONUS_BOUNDARY_DELIMITER
+        if previous_class == _CLASS_OTHER:
+            return BONUS_BOUNDARY
+    if previous_class == _CLASS_LOWER and current_class == _CLASS_UPPER:
+        return BONUS_CAMEL
+    if previous_class != _CLASS_DIGIT and current_class == _CLASS_DIGIT:
+        return BONUS_CAMEL
+    return 0
+
+def _lower(text):
+    """Lowercase text, keeping every character at its position (for match positions)."""
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return lowered
+    return ''.join(char if len(char.lower()) != 1 else char.lower() for char in text)
+
+
+_pair_bonuses = {} # "previous char + char" -> bonus, filled as pairs are seen
+
+def _position_bonus(text, i):
+    """Bonus earned by matching text[i], from the classes of it and the character before."""
+    pair = text[i - 1:i + 1] if i > 0 else ' ' + text[0]
+    bonus = _pair_bonuses.get(pair)
+    if bonus is None:
+        bonus = _pair_bonuses[pair] = _bonus(_char_class(pair[0]), _char_class(pair[1]))
+    return bonus
+
+def _score_match(pattern, text, text_lower, begin=0):
+    """Scores the lowercase pattern as a subsequence of text[begin:].
+
+    Returns (score, positions) or None when pattern is no subsequence.
+    Like fzf's v1 algorithm: the first occurrence is found greedily, then the
+    match is shrunk backwards to the shortest window ending there, and only
+    that window is scored.
+    """
+    # Forward pass: where does the greedy match end? (str.find runs in C)
+    end = begin - 1
+    for char in pattern:
+        end = text_lower.find(char, end + 1)
+        if end < 0:
+            return None
+    # Backward pass: latest start of a match ending at end
+    pattern_index = len(pattern) - 1
+    start = end
+    while True:
+        if text_lower[start] == pattern[pattern_index]:
+            pattern_index -= 1
+            if pattern_index < 0:
+                break
+        start -= 1
+
+    score = 0
+    positions = []
+    in_gap = False
+    consecutive = 0
+    first_bonus = 0
+    pattern_index = 0
+    for i in range(start, end + 1):
+        if text_lower[i] == pattern[pattern_index]:
+            positions.append(i)
+            score += SCORE_MATCH
+            bonus = _position_bonus(text, i)
+            if consecutive == 0:
+                first_bonus = bonus
+            else:
+                # A run keeps the bonus of its first character
+                if bonus >= BONUS_BOUNDARY and bonus > first_bonus:
+                    first_bonus = bonus
+                bonus = max(bonus, first_bonus, BONUS_CONSECUTIVE)
+            score += bonus * BONUS_FIRST_CHAR_MULTIPLIER if pattern_index == 0 else bonus
+            in_gap = False
+            consecutive += 1
+            pattern_index += 1
+        else:
+            score += SCORE_GAP_EXTENSION if in_gap else SCORE_GAP_START
+            in_gap = True
+            consecutive = 0
+            first_bonus = 0
+    return score, positions
+
+def _best_term_score(term):
+    """Score of term matched as the start of a title word: no match can score higher."""
+    return (len(term) * (SCORE_MATCH + BONUS_BOUNDARY_WHITE)
+            + BONUS_BOUNDARY_WHITE * (BONUS_FIRST_CHAR_MULTIPLIER - 1) + TITLE_MATCH_BONUS)
+
+def fuzzy_match(pattern, text):
+    """Matches pattern (any case) as a subsequence of text: (score, positions) or None."""
+    return _score_match(_lower(pattern), text, _lower(text))
+
+
+def prefix_edit_distance(term, word, max_distance):
+    """Edit distance between term and the closest prefix of word, or None if above max_distance.
+
+    Optimal string alignment distance (adjacent swaps count as one edit),
+    computed row by row and abandoned as soon as a row exceeds max_distance.
+    """
+    if len(word) < len(term) - max_distance:
+        return None
+    previous_previous = None
+    previous = list(range(len(word) + 1))
+    for i in range(1, len(term) + 1):
+        term_char = term[i - 1]
+        current = [i] + [0] * len(word)
+        for j in range(1, len(word) + 1):
+            cost = 0 if term_char == word[j - 1] else 1
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if (previous_previous is not None and j > 1
+                    and term_char == word[j - 2] and term[i - 2] == word[j - 1]):
+                value = min(value, previous_previous[j - 2] + 1)
+            current[j] = value
+        if min(current) > max_distance:
+            return None
+        previous_previous, previous = previous, current
+    # The term may end anywhere in the word (it is usually still being typed)
+    distance = min(previous)
+    return distance if distance <= max_distance else None
+
+def _subsequence_regex(term):
+    """Regex finding term as a subsequence of a path.
+
+    Each step skips characters other than the next wanted one ([^c]*c), so
+    a path is matched in a single left-to-right pass, and the leading
+    literal lets re jump straight to candidate starts.
+    """
+    chars = [re.escape(char) for char in term]
+    return re.compile(chars[0] + "".join(f"[^{char}]*{char}" for char in chars[1:]))
+
+def _bit_numbers(bits):
+    """Numbers of the set bits of a non-negative int, ascending (lazily)."""
+    flags = bin(bits)[:1:-1]
+    number = flags.find('1')
+    while number >= 0:
+        yield number
+        number = flags.find('1', number + 1)
+
+
+def _one_line_path(category_name, section_name, prompt_title):
+    """The "category > section > title" line shown for a result, and where its title starts."""
+    parts = [" ".join((part or '').splitlines()) for part in (category_name, section_name, prompt_title)]
+    path = PATH_SEPARATOR.join(parts)
+    return path, len(path) - len(parts[2])
+
+
+class _Candidate:
+    __slots__ = ('prompt_id', 'row', 'path', 'path_lower', 'title_start', 'line')
+
+    def __init__(self, row):
+        self.prompt_id = row['prompt_id']
+        self.row = row # Search result metadata (same keys as db.search_prompts rows)
+        self.path, self.title_start = _one_line_path(row['category_name'], row['section_name'], row['prompt_title'])
+        self.path_lower = _lower(self.path)
+        self.line = None # Line number in FuzzyIndex._lines
+
+    def title_words(self):
+        """(start position in path, lowercase word) of every word in the title."""
+        words = []
+        position = self.title_start
+        for word in self.path_lower[self.title_start:].split(' '):
+            if word:
+                words.append((position, word))
+            position += len(word) + 1
+        return words
+
+
+class _LRUCache:
+    """A dict with a size limit that evicts the least recently used entry."""
+
+    def __init__(self, max_entries):
+        self._entries = OrderedDict()
+        self._max_entries = max_entries
+
+    def get(self, key):
+        value = self._entries.get(key)
+        if value is not None:
+            self._entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        if len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+
+class FuzzyIndex:
+    """In-memory index of every prompt's "category > section > title" path.
+
+    Built with one query on first use. Afterwards the database change
+    notifications only record what changed; a changed prompt is re-read by
+    itself before the next search (and if its path is unchanged, e.g. after
+    a use or a description edit, its line is kept), while renaming or
+    deleting a category or section (which touches many paths) rebuilds the
+    whole index.
+
+    The candidates are numbered in tie-break order (shorter paths first,
+    then by id), and for each character the index keeps a bitset (an int,
+    bit n for line n) of the lines containing it. ANDing the bitsets of a
+    query's characters leaves the lines that can match (in C); those are
+    checked in line order, and only as many matches as the results need are
+    scored in Python (see search()). The lines where every term starts a
+    title word (the best possible score) come from the vocabulary of title
+    words. Typos are handled through the same vocabulary, so the edit
+    distance is computed once per distinct word rather than once per prompt.
+
+    Typing mostly extends the previous query, and the matches of a query are
+    a subset of the matches of any prefix of it. So results are kept in LRU
+    caches per query (with the matching lines, when they are all known) and
+    the title word starts per term, and a query whose prefix is cached with
+    its lines is matched by filtering those lines: each keystroke works on
+    what the previous one left. The caches also answer backspacing and
+    paging, as does a cache of the full-text content matches. Prompt writes
+    clear the query and content caches; the term cache and the bitsets are
+    cleared only when the lines change.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock() # Notifications arrive on the writing thread
+        self._candidates = None # prompt_id -> _Candidate; None = (re)build on next search
+        self._changed_prompt_ids = set()
+        self._generation = 0 # Bumped by invalidate(), so a rebuild racing with it is not kept
+        # Derived from _candidates, rebuilt after any change (search thread only)
+        self._lines = None # Candidates in line (tie-break) order
+        self._paths = [] # Their path_lower
+        self._char_bits = {} # Character -> bitset of the lines containing it, built on first use
+        self._vocabulary = None # Lowercase title word -> line numbers
+        self._words = [] # The vocabulary, sorted (for prefix lookups)
+        self._used_lines = set() # Lines of prompts with a usage record (frecency)
+        self._term_cache = _LRUCache(SEARCH_CACHE_SIZE) # term -> lines with a title word starting with it
+        self._result_cache = _LRUCache(SEARCH_CACHE_SIZE) # query -> (limit, total, matches, exact lines or None)
+        self._content_cache = _LRUCache(SEARCH_CACHE_SIZE) # search text -> (count, db.search_prompts rows)
+        db.add_change_listener(self._on_database_change)
+
+    def _on_database_change(self, table, operation, item_id):
+        if operation == 'reload':
+            self.invalidate()
+        elif table in ('prompts', 'prompt_usage'):
+            with self._lock:
+                self._changed_prompt_ids.add(item_id)
+        elif table in ('categories', 'sections'):
+            self.invalidate()
+
+    def invalidate(self):
+        with self._lock:
+            self._candidates = None
+            self._generation += 1
+
+    def prewarm(self):
+        """Builds the index now rather than on the first search (call from the search thread)."""
+        self._refresh()
+        self._build_vocabulary()
+        for char in string.ascii_lowercase + string.digits:
+            self._char_lines(char)
+
+    @traced
+    def _refresh(self):
+        """Applies recorded changes before a search.
+
+        Only called from the search thread, which is the only one touching
+        the candidates and the structures derived from them.
+        """
+        with self._lock:
+            candidates = self._candidates
+            changed_ids, self._changed_prompt_ids = self._changed_prompt_ids, set()
+            generation = self._generation
+        if candidates is None:
+            candidates = {row['prompt_id']: _Candidate(dict(row)) for row in db.get_prompt_search_entries()}
+            self._lines = None
+        elif changed_ids:
+            for prompt_id in changed_ids:
+                row = db.get_prompt_search_entry(prompt_id)
+                old = candidates.get(prompt_id)
+                if row is None:
+                    if candidates.pop(prompt_id, None) is not None:
+                        self._lines = None
+                    continue
+                candidate = _Candidate(dict(row))
+                if old is not None and old.path == candidate.path and self._lines is not None:
+                    old.row = candidate.row # Same line, new metadata
+                    if old.row['frecency'] is not None:
+                        self._used_lines.add(old.line)
+                else:
+                    candidates[prompt_id] = candidate
+                    self._lines = None
+        with self._lock:
+            if generation == self._generation:
+                self._candidates = candidates
+            # else: invalidated meanwhile; use these once, rebuild next time
+        if self._lines is None or changed_ids:
+            self._result_cache.clear()
+            self._content_cache.clear()
+
+        if self._lines is None:
+            # Equal scores rank shorter paths first, then lower ids: in this
+            # order, the first matches found are the first of their score
+            self._lines = sorted(candidates.values(), key=lambda candidate: (len(candidate.path), candidate.prompt_id))
+            for number, candidate in enumerate(self._lines):
+                candidate.line = number
+            self._used_lines = {candidate.line for candidate in self._lines if candidate.row['frecency'] is not None}
+            self._paths = [candidate.path_lower for candidate in self._lines]
+            self._char_bits = {}
+            self._vocabulary = None
+            self._term_cache.clear()
+
+    def _char_lines(self, char):
+        """Bitset of the lines containing char (bit n is line n)."""
+        bits = self._char_bits.get(char)
+        if bits is None:
+            flags = ''.join(['1' if char in path else '0' for path in reversed(self._paths)])
+            bits = self._char_bits[char] = int(flags or '0', 2)
+        return bits
+
+    def _lines_with_chars(self, text):
+        """Bitset of the lines containing every character of text (a superset of those containing it as a subsequence)."""
+        bits = -1
+        for char in set(text):
+            bits &= self._char_lines(char)
+        return bits
+
+    def _build_vocabulary(self):
+        if self._vocabulary is None:
+            vocabulary = {}
+            for number, candidate in enumerate(self._lines):
+                for _, word in candidate.title_words():
+                    vocabulary.setdefault(word, []).append(number)
+            self._vocabulary = vocabulary
+            self._words = sorted(vocabulary)
+
+    def _word_start_lines(self, term):
+        """Lines with a title word starting with term. Do not modify the returned set: it is cached."""
+        lines = self._term_cache.get(term)
+        if lines is not None:
+            return lines
+        self._build_vocabulary()
+        lines = set()
+        for word in itertools.islice(self._words, bisect.bisect_left(self._words, term), None):
+            if not word.startswith(term):
+                break
+            lines.update(self._vocabulary[word])
+        self._term_cache.put(term, lines)
+        return lines
+
+    def content_matches(self, search_text, count):
+        """The first count rows of db.search_prompts(search_text), cached per search text."""
+        cached = self._content_cache.get(search_text)
+        if cached is not None and cached[0] >= count:
+            return cached[1][:count]
+        rows = db.search_prompts(search_text, count, 0)
+        self._content_cache.put(search_text, (count, rows))
+        return rows
+
+    def _near_words(self, term):
+        """{title word: edit distance} for vocabulary words within the typo limit of term."""
+        self._build_vocabulary()
+        max_distance = _max_typos(term)
+        term_chars = set(term)
+        near = {}
+        for word in self._vocabulary:
+            # Each edit can account for at most one character of term missing from word
+            if len(term_chars.difference(word)) > max_distance:
+                continue
+            distance = prefix_edit_distance(term, word, max_distance)
+            if distance is not None:
+                near[word] = distance
+        return near
+
+    @traced
+    def search(self, query, limit, should_stop=None):
+        """Returns (number of matches, best `limit` matches) for the query.
+
+        Matches are (tier, score, candidate, positions), best first; tier 1 is
+        a subsequence match of every term, tier 0 needed typo correction.
+        score includes the candidate's frecency bonus.
+        positions are indexes into candidate.path. Returns None if
+        should_stop() returned True while searching.
+
+        Only SCORED_MATCH_LIMIT matches are scored at a time: the first ones
+        in line order, plus (when there are more) the first lines where every
+        term starts a title word, which score the maximum, and the matches
+        with a frecency bonus. Nothing later can beat those, except through
+        a better but scattered match. When more matches are asked for, the
+        next SCORED_MATCH_LIMIT in line order are ranked after them, so a
+        larger limit extends the list for a smaller one (for paging). Typo
+        matches come after every exact match, ranked the same way. The
+        number of matches counts those found: it is exact once every match
+        has been ranked, which is the case whenever fewer than `limit` are
+        returned.
+        """
+        terms = _lower(query).split()
+        if not terms or limit <= 0:
+            return 0, []
+        self._refresh()
+        cache_key = " ".join(terms)
+        cached = self._result_cache.get(cache_key)
+        if cached is not None and cached[0] >= limit:
+            return cached[1], cached[2][:limit]
+        lines = self._lines
+        now = time.time()
+        bonus = lambda candidate: _frecency_bonus(candidate.row['frecency'], now)
+        # Ties: shorter paths first, then by id
+        sort_key = lambda match: (match[1], -len(match[2].path), -match[2].prompt_id)
+
+        def ranked(numbers):
+            matches = []
+            for number in numbers:
+                score, positions = self._score_terms(terms, lines[number])
+                matches.append((1, score + bonus(lines[number]), lines[number], positions))
+            return sorted(matches, key=sort_key, reverse=True)
+
+        matching_lines = self._exact_lines(terms, cache_key, should_stop)
+        exact_lines = list(itertools.islice(matching_lines, SCORED_MATCH_LIMIT + 1))
+        if should_stop is not None and should_stop():
+            return None
+        complete = len(exact_lines) <= SCORED_MATCH_LIMIT
+        scored_lines = set(exact_lines[:SCORED_MATCH_LIMIT])
+        if not complete:
+            word_starts = [" " + term for term in terms]
+            best_count = sum(all(lines[number].path_lower.find(word_start, lines[number].title_start - 1) >= 0
+                                 for word_start in word_starts) for number in scored_lines)
+            if best_count < SCORED_MATCH_LIMIT:
+                best_lines = set.intersection(*sorted((self._word_start_lines(term) for term in terms), key=len))
+                scored_lines.update(heapq.nsmallest(SCORED_MATCH_LIMIT, best_lines))
+            regexes = [_subsequence_regex(term) for term in terms]
+            scored_lines.update(number for number in self._used_lines
+                                if all(regex.search(self._paths[number]) for regex in regexes))
+        exact = ranked(scored_lines)
+        total = len(scored_lines)
+        if not complete:
+            later_lines = (number for number in itertools.chain(exact_lines[SCORED_MATCH_LIMIT:], matching_lines)
+                           if number not in scored_lines)
+            while len(exact) < limit:
+                chunk = list(itertools.islice(later_lines, SCORED_MATCH_LIMIT))
+                if should_stop is not None and should_stop():
+                    return None
+                if not chunk:
+                    complete = True
+                    break
+                exact += ranked(chunk)
+                total += len(chunk)
+
+        typo_matches = []
+        if complete and len(exact) < limit and any(len(term) >= TYPO_MIN_TERM_LENGTH for term in terms):
+            # Ranked in chunks too, after every exact match
+            exact_ids = {candidate.prompt_id for _, _, candidate, _ in exact}
+            found = self._typo_matches(terms, exact_ids, should_stop)
+            while len(exact) + len(typo_matches) < limit:
+                chunk = [(0, score + bonus(lines[number]), lines[number], positions)
+                         for number, (score, positions) in itertools.islice(found, SCORED_MATCH_LIMIT)]
+                if should_stop is not None and should_stop():
+                    return None
+                if not chunk:
+                    break
+                typo_matches += sorted(chunk, key=sort_key, reverse=True)
+                total += len(chunk)
+
+        best = (exact + typo_matches)[:limit]
+        exact_lines = exact_lines if len(exact_lines) <= SCORED_MATCH_LIMIT else None
+        self._result_cache.put(cache_key, (limit, total, best, exact_lines))
+        return total, best
+
+    def _typo_matches(self, terms, excluded_ids, should_stop=None):
+        """Yields (line number, (score, positions)) of the lines matching through a typo, in line order.
+
+        A line matches through a typo if some term misses but is near one of
+        its title words, and every other term matches exactly or through a
+        near title word. Lines of excluded_ids are skipped. Stops early if
+        should_stop() returns True.
+        """
+        near_words = {term: self._near_words(term) for term in terms if len(term) >= TYPO_MIN_TERM_LENGTH}
+        near_lines = {term: set().union(*map(self._vocabulary.__getitem__, near)) for term, near in near_words.items()}
+        regexes = {term: _subsequence_regex(term) for term in terms}
+        typo_lines = set().union(*near_lines.values())
+        for count, number in enumerate(sorted(typo_lines)):
+            if should_stop is not None and count % CANCEL_CHECK_INTERVAL == 0 and should_stop():
+                return
+            path = self._paths[number]
+            if self._lines[number].prompt_id in excluded_ids or not all(number in near_lines.get(term, ()) or regex.search(path) for term, regex in regexes.items()):
+                continue
+            match = self._score_terms(terms, self._lines[number], near_words)
+            if match is not None:
+                yield number, match
+
+    def _exact_lines(self, terms, cache_key, should_stop=None):
+        """Yields the lines containing every term as a subsequence, in line order.
+
+        Stops early if should_stop() returns True. If a prefix of the query
+        was searched before (the query was typed on) and all its matches are
+        known, those are filtered: each term of the prefix query is a prefix
+        of a term here, so nothing else can match. Otherwise the lines
+        holding every character of the query are checked.
+        """
+        regexes = [_subsequence_regex(term) for term in terms]
+        numbers = None
+        for length in range(len(cache_key) - 1, 0, -1):
+            prefix_key = cache_key[:length].rstrip()
+            cached = self._result_cache.get(prefix_key)
+            if cached is not None and cached[3] is not None:
+                already_matched = set(prefix_key.split())
+                regexes = [_subsequence_regex(term) for term in terms if term not in already_matched]
+                numbers = cached[3]
+                break
+        if numbers is None:
+            numbers = _bit_numbers(self._lines_with_chars("".join(terms)))
+        paths = self._paths
+        for count, number in enumerate(numbers):
+            if should_stop is not None and count % CANCEL_CHECK_INTERVAL == 0 and should_stop():
+                return
+            path = paths[number]
+            if all(regex.search(path) for regex in regexes):
+                yield number
+
+    def _score_terms(self, terms, candidate, near_words=None):
+        """Scores every term against the candidate: (score, positions), or None if a term misses.
+
+        A term is matched at the start of a title word if possible, else as a
+        subsequence of the title, else anywhere in the path (title matches
+        earn TITLE_MATCH_BONUS), else, if near_words is given, as a typo of a
+        title word.
+        """
+        total_score = 0
+        positions = set()
+        path, path_lower, title_start = candidate.path, candidate.path_lower, candidate.title_start
+        for term in terms:
+            start = path_lower.find(" " + term, title_start - 1)
+            if start >= 0:
+                total_score += _best_term_score(term)
+                positions.update(range(start + 1, start + 1 + len(term)))
+                continue
+            match = _score_match(term, path, path_lower, title_start)
+            if match is not None:
+                total_score += match[0] + TITLE_MATCH_BONUS
+                positions.update(match[1])
+                continue
+            match = _score_match(term, path, path_lower)
+            if match is not None:
+                total_score += match[0]
+                positions.update(match[1])
+                continue
+            near = near_words.get(term) if near_words else None
+            if not near:
+                return None
+            typo = min(((near[word], start, word) for start, word in candidate.title_words() if word in near), default=None)
+            if typo is None:
+                return None
+            distance, start, word = typo
+            # Scored like a run of matches at a word start, minus a penalty per edit
+            total_score += (len(term) - distance) * SCORE_MATCH
+            positions.update(range(start, start + min(len(term), len(word))))
+        return total_score, sorted(positions)
+
+
+# Shared index used by the search popup
+prompt_index = FuzzyIndex()
+
+
+def _offsets_to_ranges(positions):
+    """[1, 2, 3, 7] -> [(1, 4), (7, 8)]"""
+    ranges = []
+    for position in positions:
+        if ranges and ranges[-1][1] == position:
+            ranges[-1] = (ranges[-1][0], position + 1)
+        else:
+            ranges.append((position, position + 1))
+    return ranges
+
+def _frequent_prompts(limit, offset):
+    results = []
+    for row in db.get_frequent_prompts(limit, offset):
+        path, _ = _one_line_path(row['category_name'], row['section_name'], row['prompt_title'])
+        results.append(dict(row, rank=0.0, title_offsets=[], snippet='', snippet_offsets=[],
+                            path=path, path_positions=[]))
+    return results
+
+def search_prompts(search_text, limit=db.SEARCH_RESULT_LIMIT, offset=0, should_stop=None):
+    """Fuzzy search over prompt paths, followed by full-text matches in the content.
+
+    An empty query lists the most used prompts (db.get_frequent_prompts).
+    Otherwise prompts whose "category > section > title" path matches the
+    query come first, best fuzzy score (plus frecency bonus) first. Prompts that only match in their
+    description or content (db.search_prompts) follow in bm25 order. Returns a
+    page of result dicts shaped like db.search_prompts() rows, plus 'path'
+    (the one-line "category > section > title") and 'path_positions'
+    (indexes of the matched characters in it).
+    Returns None if should_stop() returned True meanwhile.
+    """
+    if not search_text.strip():
+        return _frequent_prompts(limit, offset)
+    wanted = offset + limit
+    found = prompt_index.search(search_text, wanted, should_stop)
+    if found is None:
+        return None
+    fuzzy_total, fuzzy_matches = found
+
+    results = []
+    for tier, score, candidate, positions in fuzzy_matches[offset:wanted]:
+        result = dict(candidate.row, rank=-score, snippet='', snippet_offsets=[],
+                      path=candidate.path, path_positions=positions)
+        title_positions = [p - candidate.title_start for p in positions if p >= candidate.title_start]
+        result['title_offsets'] = _offsets_to_ranges(title_positions)
+        results.append(result)
+    if len(results) == limit:
+        return results
+
+    # Fill the rest of the page with content matches not already listed. The
+    # page is short, so every fuzzy match is in fuzzy_matches and fuzzy_total
+    # is exact; up to that many
+    # of the full-text rows can be duplicates, so fetch as many more and skip them.
+    fuzzy_ids = {candidate.prompt_id for _, _, candidate, _ in fuzzy_matches}
+    content_offset = max(0, offset - fuzzy_total)
+    content_rows = prompt_index.content_matches(search_text, content_offset + (limit - len(results)) + fuzzy_total)
+    content_rows = [row for row in content_rows if row['prompt_id'] not in fuzzy_ids]
+    for row in content_rows[content_offset:content_offset + limit - len(results)]:
+        path, title_start = _one_line_path(row['category_name'], row['section_name'], row['prompt_title'])
+        positions = [title_start + p for start, end in row['title_offsets'] for p in range(start, end)]
+        results.append(dict(row, path=path, path_positions=positions)) # The cached row stays as it was
+    return results
+
+# --- END OF FILE fuzzy_search.py ---
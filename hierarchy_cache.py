@@ -0,0 +1,130 @@
+# --- START OF FILE hierarchy_cache.py ---
+
+import threading
+
+# Import database functions
+import database as db
+
+class HierarchyCache:
+    """In-memory copy of the category/section tree (ids, names, colors, order).
+
+    The editor looks up single categories and sections by id all the time
+    (panel titles, dialogs, colors). Instead of reading the whole table for
+    each lookup, the tree is loaded once and kept current from the database
+    change notifications: changed rows are re-read one by one, deleted ones
+    are dropped.
+
+    Rows are plain dicts with the columns of the categories/sections tables.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock() # Notifications may come from the writer thread
+        self._loaded = False
+        self._categories = {}         # category_id -> row dict
+        self._sections = {}           # section_id -> row dict
+        self._category_order = []     # category ids by order_index
+        self._section_order = {}      # category_id -> section ids by order_index
+        db.add_change_listener(self._on_database_change)
+
+    def invalidate(self):
+        """Drops everything; the tree is reloaded on the next lookup."""
+        with self._lock:
+            self._loaded = False
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        self._categories = {row['id']: dict(row) for row in db.get_categories()}
+        self._sections = {row['id']: dict(row) for row in db.get_all_sections()}
+        self._category_order = list(self._categories) # Already sorted by order_index
+        self._section_order = {category_id: [] for category_id in self._categories}
+        for section in self._sections.values(): # Sorted by category, then order_index
+            self._section_order.setdefault(section['category_id'], []).append(section['id'])
+        self._loaded = True
+
+    # --- Lookups ---
+
+    def get_category(self, category_id):
+        """Returns the category row dict, or None if there is no such category."""
+        with self._lock:
+            self._ensure_loaded()
+            return self._categories.get(category_id)
+
+    def get_section(self, section_id):
+        """Returns the section row dict, or None if there is no such section."""
+        with self._lock:
+            self._ensure_loaded()
+            return self._sections.get(section_id)
+
+    def get_categories(self):
+        with self._lock:
+            self._ensure_loaded()
+            return [self._categories[category_id] for category_id in self._category_order]
+
+    def get_sections(self, category_id):
+        with self._lock:
+            self._ensure_loaded()
+            return [self._sections[section_id] for section_id in self._section_order.get(category_id, [])]
+
+    # --- Updates ---
+
+    def _on_database_change(self, table, operation, item_id):
+        # Prompts are not cached here, so a 'prompts' reload (bulk import)
+        # needs nothing: the categories and sections an import adds are
+        # reported one by one
+        if table not in ('categories', 'sections'):
+            return
+        if operation == 'reload':
+            self.invalidate()
+            return
+        with self._lock:
+            if not self._loaded:
+                return # Nothing cached yet; the next lookup reads fresh data
+            if table == 'categories':
+                row = None if operation == 'delete' else db.get_category(item_id)
+                if row and row['deleted_at'] is None:
+                    self._put_category(dict(row))
+                else:
+                    self._drop_category(item_id) # Deleted or in the trash
+            else:
+                row = None if operation == 'delete' else db.get_section(item_id)
+                if row and row['deleted_at'] is None:
+                    self._put_section(dict(row))
+                else:
+                    self._drop_section(item_id)
+
+    def _drop_category(self, category_id):
+        if self._categories.pop(category_id, None) is None:
+            return
+        self._category_order.remove(category_id)
+        # Its sections were deleted (cascade) or trashed with it
+        for section_id in self._section_order.pop(category_id, []):
+            self._sections.pop(section_id, None)
+
+    def _put_category(self, row):
+        category_id = row['id']
+        if category_id not in self._categories:
+            self._category_order.append(category_id)
+            self._section_order.setdefault(category_id, [])
+        self._categories[category_id] = row
+        self._category_order.sort(key=lambda cid: (self._categories[cid]['order_index'], cid))
+
+    def _drop_section(self, section_id):
+        section = self._sections.pop(section_id, None)
+        if section is None:
+            return
+        siblings = self._section_order.get(section['category_id'])
+        if siblings and section_id in siblings:
+            siblings.remove(section_id)
+
+    def _put_section(self, row):
+        self._drop_section(row['id']) # It may have moved to another category
+        self._sections[row['id']] = row
+        siblings = self._section_order.setdefault(row['category_id'], [])
+        siblings.append(row['id'])
+        siblings.sort(key=lambda sid: (self._sections[sid]['order_index'], sid))
+
+# Shared instance used by the UI
+hierarchy = HierarchyCache()
+
+# --- END OF FILE hierarchy_cache.py ---
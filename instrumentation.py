@@ -0,0 +1,160 @@
+# --- START OF FILE instrumentation.py ---
+
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+# ==================================
+#      Configuration (environment variables)
+# ==================================
+# PROMPTS_LOG_LEVEL   DEBUG, INFO (default), WARNING or ERROR. Messages below
+#                     the level cost one comparison: their text is never built.
+#                     DEBUG also logs every click, move and save.
+# PROMPTS_TRACE_FILE  If set, every span of the session is kept and written to
+#                     this file on exit in Chrome's trace event format (open
+#                     it in chrome://tracing or https://ui.perfetto.dev).
+LOG_LEVEL_ENV = "PROMPTS_LOG_LEVEL"
+TRACE_FILE_ENV = "PROMPTS_TRACE_FILE"
+DEFAULT_LOG_LEVEL = "INFO"
+LOG_FORMAT = "%(asctime)s %(levelname)-7s %(name)s: %(message)s"
+
+RECENT_SPAN_COUNT = 2000      # Spans kept in the ring buffer
+TRACE_SPAN_COUNT = 1_000_000  # Spans kept while recording a trace file
+SLOW_SPAN_MS = 100            # Slower spans are logged (at DEBUG)
+
+logger = logging.getLogger(__name__)
+
+# --- Spans ---
+# A span is a named, timed section of code: a database call, a search, a
+# window show. Finished spans go to a ring buffer (a deque append, safe from
+# any thread) as (name, thread id, start ns, duration ns, args). Start times
+# are time.perf_counter_ns() values.
+_spans = deque(maxlen=RECENT_SPAN_COUNT)
+_thread_names = {} # Thread id -> name, for the trace export
+_trace_file = None
+
+class span:
+    """Times a block:  with span("search.fuzzy", query=text): ...
+
+    Keyword arguments are stored with the span (shown in the trace viewer).
+    """
+    __slots__ = ('name', 'args', 'start')
+
+    def __init__(self, name, **args):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _add_span(self.name, self.start, time.perf_counter_ns() - self.start, self.args)
+        return False
+
+def traced(func):
+    """Decorator recording every call of func as a span named module.qualname."""
+    name = f"{func.__module__}.{func.__qualname__}"
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter_ns()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _add_span(name, start, time.perf_counter_ns() - start, None)
+    return wrapper
+
+def record_span(name, start, end, **args):
+    """Records a span measured elsewhere, from time.perf_counter() start/end seconds."""
+    start_ns = int(start * 1e9)
+    _add_span(name, start_ns, int(end * 1e9) - start_ns, args)
+
+def _add_span(name, start_ns, duration_ns, args):
+    thread_id = threading.get_ident()
+    if thread_id not in _thread_names:
+        _thread_names[thread_id] = threading.current_thread().name
+    _spans.append((name, thread_id, start_ns, duration_ns, args))
+    if duration_ns > SLOW_SPAN_MS * 1_000_000 and logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Slow: %s took %.1f ms%s", name, duration_ns / 1e6, f" {args}" if args else "")
+
+def recent_spans():
+    """The finished spans in the ring buffer, oldest first."""
+    return list(_spans)
+
+def span_summary(spans=None):
+    """{span name: (count, total ms, max ms)} over spans (default: the ring buffer)."""
+    summary = {}
+    for name, _, _, duration_ns, _ in (recent_spans() if spans is None else spans):
+        count, total, longest = summary.get(name, (0, 0.0, 0.0))
+        duration_ms = duration_ns / 1e6
+        summary[name] = (count + 1, total + duration_ms, max(longest, duration_ms))
+    return summary
+
+def format_span_summary(spans=None):
+    """The span summary as a text table, slowest total first."""
+    rows = sorted(span_summary(spans).items(), key=lambda item: item[1][1], reverse=True)
+    lines = [f"{'span':<48} {'count':>7} {'total ms':>10} {'max ms':>9}"]
+    for name, (count, total, longest) in rows:
+        lines.append(f"{name:<48} {count:>7} {total:>10.1f} {longest:>9.1f}")
+    return "\n".join(lines)
+
+def export_chrome_trace(path, spans=None):
+    """Writes spans (default: the ring buffer) to path as Chrome trace event JSON."""
+    spans = recent_spans() if spans is None else spans
+    origin = min((start for _, _, start, _, _ in spans), default=0)
+    process_id = os.getpid()
+    events = [
+        {"name": "thread_name", "ph": "M", "pid": process_id, "tid": thread_id, "args": {"name": name}}
+        for thread_id, name in list(_thread_names.items())
+    ]
+    for name, thread_id, start_ns, duration_ns, args in spans:
+        event = {
+            "name": name,
+            "cat": name.split(".", 1)[0],
+            "ph": "X", # Complete event: start and duration
+            "ts": (start_ns - origin) / 1000, # Microseconds
+            "dur": duration_ns / 1000,
+            "pid": process_id,
+            "tid": thread_id,
+        }
+        if args:
+            event["args"] = {key: str(value) for key, value in args.items()}
+        events.append(event)
+    with open(path, "w", encoding="utf-8") as trace:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, trace)
+    logger.info("Wrote %d spans to trace file %s", len(spans), path)
+
+# --- Setup ---
+
+def configure():
+    """Sets up logging and span recording from the environment (call once at startup)."""
+    global _spans, _trace_file
+    level_name = os.environ.get(LOG_LEVEL_ENV, DEFAULT_LOG_LEVEL).upper()
+    level = logging.getLevelName(level_name)
+    if not isinstance(level, int):
+        level = logging.getLevelName(DEFAULT_LOG_LEVEL)
+    logging.basicConfig(level=level, format=LOG_FORMAT)
+    if not isinstance(logging.getLevelName(level_name), int):
+        logger.warning("Unknown %s '%s', using %s", LOG_LEVEL_ENV, level_name, DEFAULT_LOG_LEVEL)
+
+    _trace_file = os.environ.get(TRACE_FILE_ENV) or None
+    if _trace_file:
+        _spans = deque(_spans, maxlen=TRACE_SPAN_COUNT)
+        logger.info("Recording a trace to %s", _trace_file)
+
+def finish():
+    """Writes the trace file if one was requested, and logs the span summary (call on exit)."""
+    if _trace_file:
+        try:
+            export_chrome_trace(_trace_file)
+        except OSError as e:
+            logger.error("Could not write trace file %s: %s", _trace_file, e)
+    if logger.isEnabledFor(logging.DEBUG) or _trace_file:
+        logger.info("Time spent per span:\n%s", format_span_summary())
+
+# --- END OF FILE instrumentation.py ---
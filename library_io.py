@@ -0,0 +1,186 @@
+# --- START OF FILE library_io.py ---
+
+import csv
+import json
+import logging
+import os
+import sys
+
+# Import database functions
+import database as db
+
+logger = logging.getLogger(__name__)
+
+# ==================================
+#      File Formats
+# ==================================
+# NDJSON (.ndjson/.jsonl)  One record per line, exactly as database.py's
+#                          export_library_records() yields them. Read and
+#                          written line by line: memory use does not grow
+#                          with the library. The format for backups.
+# CSV (.csv)               One prompt per row, with a header row. Categories
+#                          and sections come from the prompts' columns.
+# JSON (.json)             A list of records or of prompt objects, or
+#                          {"prompts": [...]}. The standard library has no
+#                          streaming JSON parser, so an imported JSON file is
+#                          loaded whole; exports are written record by record.
+#
+# Files from other prompt managers rarely use our field names, so prompt
+# fields are also looked up under the aliases below, ignoring case, spaces
+# around the name and '_'/'-' versus ' ' ("Prompt_Title" = "prompt title").
+# Field values must be strings (or empty). Prompts without a
+# category or section go to DEFAULT_CATEGORY / DEFAULT_SECTION, prompts
+# without a title are named after the first line of their content.
+NDJSON_EXTENSIONS = ('.ndjson', '.jsonl')
+CSV_COLUMNS = ('category', 'section', 'title', 'description', 'content')
+FIELD_ALIASES = {
+    'category': ('category', 'category name', 'folder', 'collection', 'group'),
+    'section': ('section', 'section name', 'subfolder', 'subcategory', 'tag'),
+    'title': ('title', 'prompt title', 'name', 'prompt name', 'act', 'label'),
+    'description': ('description', 'desc', 'notes', 'summary'),
+    'content': ('content', 'prompt', 'prompt text', 'prompt content', 'text', 'body', 'template'),
+}
+DEFAULT_CATEGORY = "Imported"
+DEFAULT_SECTION = "General"
+TITLE_FROM_CONTENT_CHARS = 60
+
+def detect_format(path):
+    """'ndjson', 'csv' or 'json', from the file extension."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension in NDJSON_EXTENSIONS:
+        return 'ndjson'
+    if extension in ('.csv', '.json'):
+        return extension[1:]
+    raise ValueError(f"Unsupported file type '{extension}' (use .ndjson, .jsonl, .csv or .json)")
+
+# --- Reading ---
+
+def _normalize_key(key):
+    return " ".join(str(key).replace('_', ' ').replace('-', ' ').lower().split())
+
+def _field(fields, name):
+    """The value of a prompt field, looked up under its aliases in fields ({normalized key: value})."""
+    for key in FIELD_ALIASES[name]:
+        value = fields.get(key)
+        if value is not None:
+            if not isinstance(value, str):
+                raise ValueError(f"'{name}' must be text, not {type(value).__name__}")
+            return value
+    return None
+
+def _normalize(item):
+    """Turns a record, or another app's prompt object, into one of database.py's records."""
+    if not isinstance(item, dict):
+        raise ValueError(f"expected an object, not {type(item).__name__}")
+    record_type = item.get('type')
+    if record_type in ('category', 'section'):
+        for key in ('name', 'category', 'color'):
+            if item.get(key) is not None and not isinstance(item[key], str):
+                raise ValueError(f"'{key}' must be text, not {type(item[key]).__name__}")
+        return item
+    fields = {_normalize_key(key): value for key, value in item.items() if key is not None}
+    content = _field(fields, 'content')
+    title = _field(fields, 'title')
+    if not title and content:
+        title = content.strip().split('\n', 1)[0][:TITLE_FROM_CONTENT_CHARS]
+    return {
+        'type': 'prompt',
+        'category': _field(fields, 'category') or DEFAULT_CATEGORY,
+        'section': _field(fields, 'section') or DEFAULT_SECTION,
+        'title': title,
+        'description': _field(fields, 'description'),
+        'content': content,
+    }
+
+def _read_ndjson(file):
+    for line_number, line in enumerate(file, 1):
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Line {line_number}: {e}") from None
+
+def _read_json(file):
+    data = json.load(file)
+    if isinstance(data, dict):
+        data = data.get('prompts', data.get('records', []))
+    if not isinstance(data, list):
+        raise ValueError("Expected a list of prompts, or an object with a 'prompts' list")
+    yield from data
+
+def read_records(path, file_format=None):
+    """Yields database records read from path (format from the extension by default)."""
+    file_format = file_format or detect_format(path)
+    # utf-8-sig: spreadsheet apps often start CSV files with a byte order mark
+    with open(path, encoding='utf-8-sig', newline='') as file:
+        if file_format == 'ndjson':
+            items = _read_ndjson(file)
+        elif file_format == 'csv':
+            items = csv.DictReader(file)
+        else:
+            items = _read_json(file)
+        for number, item in enumerate(items, 1):
+            try:
+                yield _normalize(item)
+            except ValueError as e:
+                raise ValueError(f"Record {number}: {e}") from None
+
+def import_library(path, file_format=None, batch_size=db.IMPORT_BATCH_SIZE):
+    """Imports a file into the library (all or nothing); returns db.import_library_records()'s counts."""
+    counts = db.import_library_records(read_records(path, file_format), batch_size)
+    logger.info("Imported %d categories, %d sections and %d prompts from %s",
+                counts['categories'], counts['sections'], counts['prompts'], path)
+    return counts
+
+# --- Writing ---
+
+def export_library(path, file_format=None):
+    """Writes the whole library to path, streaming it from the database; returns the number of prompts."""
+    file_format = file_format or detect_format(path)
+    prompt_count = 0
+    with open(path, 'w', encoding='utf-8', newline='') as file:
+        records = db.export_library_records()
+        if file_format == 'csv':
+            writer = csv.DictWriter(file, fieldnames=CSV_COLUMNS, extrasaction='ignore')
+            writer.writeheader()
+        elif file_format == 'json':
+            file.write('[')
+        separator = '\n'
+        for record in records:
+            if file_format == 'csv':
+                if record['type'] != 'prompt':
+                    continue # Empty sections and categories are lost in CSV
+                writer.writerow(record)
+            elif file_format == 'json':
+                file.write(separator)
+                json.dump(record, file, ensure_ascii=False)
+                separator = ',\n'
+            else:
+                file.write(json.dumps(record, ensure_ascii=False))
+                file.write('\n')
+            if record['type'] == 'prompt':
+                prompt_count += 1
+        if file_format == 'json':
+            file.write('\n]\n')
+    logger.info("Exported %d prompts to %s", prompt_count, path)
+    return prompt_count
+
+if __name__ == "__main__":
+    # python library_io.py export backup.ndjson
+    # python library_io.py import prompts.csv
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    if len(sys.argv) != 3 or sys.argv[1] not in ('import', 'export'):
+        print("Usage: python library_io.py import|export FILE (.ndjson, .jsonl, .csv or .json)")
+        sys.exit(2)
+    db.initialize_database()
+    try:
+        if sys.argv[1] == 'import':
+            import_library(sys.argv[2])
+        else:
+            export_library(sys.argv[2])
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    finally:
+        db.close_all_connections()
+# --- END OF FILE library_io.py ---
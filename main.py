@@ -3,9 +3,34 @@
 import sys
 import os
 import ctypes # For console hiding on Windows
+import logging
 import threading # To run hotkey listener in background
 import time # For potential delays
 
+import instrumentation
+from instrumentation import record_span
+
+logger = logging.getLogger(__name__)
+
+# --- Startup Timing ---
+# main() reports how long each startup phase took, from here (before the
+# third-party imports) until the tray icon and hotkey are ready.
+_phase_started_at = time.perf_counter()
+_startup_phases = [] # (phase name, seconds)
+
+def end_startup_phase(name):
+    """Records the time since the previous phase ended as phase `name`."""
+    global _phase_started_at
+    now = time.perf_counter()
+    _startup_phases.append((name, now - _phase_started_at))
+    record_span(f"startup.{name}", _phase_started_at, now)
+    _phase_started_at = now
+
+def report_startup_phases():
+    total = sum(seconds for _, seconds in _startup_phases)
+    phases = ", ".join(f"{name} {seconds * 1000:.1f} ms" for name, seconds in _startup_phases)
+    logger.info("Startup took %.1f ms: %s", total * 1000, phases)
+
 # --- Third-party libraries ---
 try:
     import keyboard
@@ -26,18 +51,27 @@ except ImportError:
 # --- Local imports ---
 import database as db
 from search_ui import SearchUIWindow
-from editor_ui import PromptEditorWindow
+# editor_ui is imported when the editor is first needed (get_editor_window)
 
 # --- Configuration ---
 HOTKEY = "ctrl+alt+p" # The key combination to trigger the search UI
 ICON_PATH = "icon.png" # Path to your tray icon image
+# Build the editor window in the background once startup is done, so that its
+# first opening is instant (costs the editor's memory even if never opened).
+# Off by default: the editor is built on the first "Show Editor".
+PREBUILD_EDITOR = False
+EDITOR_PREBUILD_DELAY_MS = 5000 # After the tray icon is ready
+# Items deleted more than db.TRASH_RETENTION_S ago are purged from the trash
+# in the background, checked this often while no window is open.
+TRASH_PURGE_INTERVAL_MS = 10 * 60 * 1000
 
 # --- Global Variables ---
 app = None
 search_window = None
-editor_window = None
+editor_window = None # Created on first use, see get_editor_window()
 tray_icon = None # <-- Added for tray icon
 editor_visible = False # Track editor state
+trash_purge_timer = None
 
 # --- Console Hiding ---
 def hide_console():
@@ -45,17 +79,17 @@ def hide_console():
     # --- ENABLED FOR PRODUCTION ---
     if os.name == 'nt':
         try:
-            print("Attempting to hide console window...") # Keep a print before hiding
+            logger.info("Attempting to hide console window...") # Keep a message before hiding
             hwnd_console = ctypes.windll.kernel32.GetConsoleWindow()
             if hwnd_console != 0:
                 ctypes.windll.user32.ShowWindow(hwnd_console, 0) # SW_HIDE = 0
                 # Don't print after hiding, it won't be seen
             else:
-                print("Info: Could not get console window handle.", file=sys.stderr)
+                logger.info("Could not get console window handle.")
         except Exception as e:
-            print(f"Info: Could not hide console window ({e})", file=sys.stderr)
+            logger.info("Could not hide console window (%s)", e)
     else:
-        print("Console hiding is only implemented for Windows.")
+        logger.debug("Console hiding is only implemented for Windows.")
     # --- END OF ENABLED SECTION ---
     # print("Console visibility enabled.") # Remove this line as it's now misleading
 
@@ -63,23 +97,61 @@ def hide_console():
 # --- UI Interaction Functions ---
 
 @pyqtSlot()
-def show_search_ui_safe():
-    """Safely shows the search UI from any thread."""
+def show_search_ui_safe(requested_at=None):
+    """Safely shows the search UI from any thread.
+
+    requested_at is the time.perf_counter() of the hotkey press (default: now);
+    the search window reports its show latency from it.
+    """
     global search_window, editor_visible
     # print(f"show_search_ui_safe called (Editor visible: {editor_visible})") # DEBUG PRINT (Optional)
     if search_window and not editor_visible:
-        # print("Invoking search_window.show_and_prepare()") # DEBUG PRINT (Optional)
-        # Ensure it runs on the main GUI thread
-        QMetaObject.invokeMethod(search_window, "show_and_prepare", Qt.ConnectionType.QueuedConnection)
+        # Emitted from the hotkey thread, the signal is delivered on the main GUI thread
+        search_window.show_requested.emit(time.perf_counter() if requested_at is None else requested_at)
     # else:
         # print("Search window not shown (already open or editor is visible).") # DEBUG PRINT (Optional)
 
 
+def get_editor_window():
+    """Returns the editor window, importing editor_ui and building it on first use.
+
+    Must be called on the GUI thread.
+    """
+    global editor_window
+    if editor_window is None:
+        started_at = time.perf_counter()
+        from editor_ui import PromptEditorWindow
+        imported_at = time.perf_counter()
+        editor_window = PromptEditorWindow()
+        editor_window.closing.connect(editor_closed_safe) # Connect editor close signal
+        created_at = time.perf_counter()
+        record_span("startup.editor_import", started_at, imported_at)
+        record_span("startup.editor_window", imported_at, created_at)
+        logger.info("Editor window created in %.1f ms (import %.1f ms)",
+                    (created_at - started_at) * 1000, (imported_at - started_at) * 1000)
+    return editor_window
+
+def prebuild_editor_when_idle():
+    """Builds the editor window ahead of its first use, unless the search popup is in use."""
+    if editor_window is not None:
+        return
+    if search_window and search_window.isVisible():
+        QTimer.singleShot(EDITOR_PREBUILD_DELAY_MS, prebuild_editor_when_idle) # Try again later
+        return
+    get_editor_window()
+
+def purge_trash_when_idle():
+    """Starts the background purge of expired trash, unless a window is in use (then: next tick)."""
+    if editor_visible or (search_window and search_window.isVisible()):
+        return
+    db.schedule_trash_purge()
+
 @pyqtSlot()
 def show_editor_ui_safe():
-    """Safely shows the editor UI from any thread."""
+    """Shows the editor UI, building it first if needed (called on the GUI thread)."""
     global editor_window, editor_visible, search_window
     # print("show_editor_ui_safe called") # DEBUG PRINT (Optional)
+    get_editor_window()
     if editor_window:
         editor_visible = True
         # Hide search window if it's somehow visible
@@ -110,8 +182,9 @@ def editor_closed_safe():
 def hotkey_callback():
     """Callback function executed when hotkey is pressed."""
     # print(f"Hotkey '{HOTKEY}' detected by keyboard library!") # DEBUG PRINT (Optional)
+    pressed_at = time.perf_counter() # Start of the hotkey -> visible -> focused latency
     # Use the safe function to interact with Qt GUI
-    show_search_ui_safe()
+    show_search_ui_safe(pressed_at)
 
 def setup_hotkey():
     """Sets up the global hotkey listener."""
@@ -119,15 +192,17 @@ def setup_hotkey():
     try:
         # Use the separate callback function
         keyboard.add_hotkey(HOTKEY, hotkey_callback, trigger_on_release=False)
-        print(f"Hotkey '{HOTKEY}' registration attempted. Listener active.") # Keep this print
+        logger.info("Hotkey '%s' registration attempted. Listener active.", HOTKEY)
         # Keep the script running to listen for hotkeys
         # keyboard.wait() # This blocks, so run in a separate thread or use QApplication's loop
     except ImportError as e:
-         print(f"ERROR: Failed to register hotkey '{HOTKEY}'. Import error: {e}", file=sys.stderr)
-         print("       This might happen if running in an environment without proper display access (like some SSH sessions).", file=sys.stderr)
+         logger.error("Failed to register hotkey '%s'. Import error: %s\n"
+                      "       This might happen if running in an environment without proper display access (like some SSH sessions).",
+                      HOTKEY, e)
     except Exception as e:
-        print(f"ERROR: Failed to register hotkey '{HOTKEY}': {e}", file=sys.stderr)
-        print("       Try running this script with administrator privileges (Windows) or check input monitoring permissions (macOS/Linux).", file=sys.stderr)
+        logger.error("Failed to register hotkey '%s': %s\n"
+                     "       Try running this script with administrator privileges (Windows) or check input monitoring permissions (macOS/Linux).",
+                     HOTKEY, e)
 
 
 def hotkey_listener_thread():
@@ -146,12 +221,12 @@ def setup_tray_icon():
     # print("Setting up system tray icon.") # DEBUG PRINT (Optional)
 
     if not QSystemTrayIcon.isSystemTrayAvailable():
-        print("ERROR: System tray not available on this system.", file=sys.stderr)
+        logger.error("System tray not available on this system.")
         return
 
     # Check if icon file exists before creating QIcon
     if not os.path.exists(ICON_PATH):
-        print(f"ERROR: Icon file not found at '{ICON_PATH}'. Tray icon will not be set.", file=sys.stderr)
+        logger.error("Icon file not found at '%s'. Tray icon will not be set.", ICON_PATH)
         # Attempt to use a default Qt icon as fallback
         # tray_icon = QSystemTrayIcon(QIcon.fromTheme("application-x-executable"), parent=app) # Example fallback
         # if tray_icon.icon().isNull():
@@ -161,7 +236,7 @@ def setup_tray_icon():
 
     tray_icon = QSystemTrayIcon(QIcon(ICON_PATH), parent=app) # Pass app as parent
     if tray_icon.icon().isNull():
-         print(f"ERROR: Failed to load icon from '{ICON_PATH}'. Check file format/integrity.", file=sys.stderr)
+         logger.error("Failed to load icon from '%s'. Check file format/integrity.", ICON_PATH)
          # Optionally return here or continue without a visible icon
          # return
 
@@ -170,7 +245,23 @@ def setup_tray_icon():
                          "Left-click to search\n"
                          "Right-click for menu")
 
-    # Create Menu
+    menu = create_tray_menu()
+    tray_icon.setContextMenu(menu)
+
+    # Connect left-click (Trigger) to show search
+    tray_icon.activated.connect(handle_tray_activation)
+
+    tray_icon.show()
+    # Use isVisible() for a more reliable check after show()
+    if tray_icon.isVisible():
+        logger.info("System tray icon is visible.")
+    else:
+        # This might happen if the icon loaded but the system tray itself has issues
+        logger.warning("System tray icon was shown but might not be visible.")
+
+
+def create_tray_menu():
+    """The tray icon's context menu (Show Search, Show Editor, Quit)."""
     menu = QMenu()
 
     # --- APPLY STYLESHEET TO MENU ---
@@ -206,7 +297,8 @@ def setup_tray_icon():
 
     # Show Search Action
     show_search_action = QAction("Show Search", parent=app) # Pass app as parent
-    show_search_action.triggered.connect(show_search_ui_safe)
+    # Not connected directly: triggered passes checked (False) as requested_at
+    show_search_action.triggered.connect(lambda: show_search_ui_safe())
     menu.addAction(show_search_action)
 
     # Show Editor Action
@@ -220,19 +312,7 @@ def setup_tray_icon():
     quit_action = QAction("Quit Prompt Manager", parent=app) # Pass app as parent
     quit_action.triggered.connect(app.quit) # Connect directly to app.quit
     menu.addAction(quit_action)
-
-    tray_icon.setContextMenu(menu)
-
-    # Connect left-click (Trigger) to show search
-    tray_icon.activated.connect(handle_tray_activation)
-
-    tray_icon.show()
-    # Use isVisible() for a more reliable check after show()
-    if tray_icon.isVisible():
-        print("System tray icon is visible.") # Keep this print
-    else:
-        # This might happen if the icon loaded but the system tray itself has issues
-        print("WARNING: System tray icon was shown but might not be visible.", file=sys.stderr)
+    return menu
 
 def handle_tray_activation(reason):
     """Handles tray icon activation signals."""
@@ -248,55 +328,78 @@ def handle_tray_activation(reason):
 
 
 # --- Main Application ---
+def release_database():
+    """Last aboutToQuit handler: saves pending edits and closes the database."""
+    if editor_window is not None:
+        # The editor connects its own final autosave when it is built, which
+        # may be after this handler; save here so nothing is written after closing
+        editor_window.autosave.flush(wait=True)
+    # Waits for pending background writes and releases the shared connections
+    db.close_all_connections()
+
 def main():
-    global app, search_window, editor_window
+    global app, search_window, trash_purge_timer
+    end_startup_phase("imports")
+    # Log level and trace file come from the environment (see instrumentation.py)
+    instrumentation.configure()
 
     # Hide console window (on Windows)
     hide_console()
-    # Print statements after hide_console might not be visible in the hidden console,
+    # Messages after hide_console might not be visible in the hidden console,
     # but are useful if running from an existing terminal or if hiding fails.
-    # Redirect important errors to stderr if possible.
-    print("--- Starting Prompt Manager ---")
+    logger.info("--- Starting Prompt Manager ---")
 
     # Initialize Database
-    print("Initializing database...")
+    logger.info("Initializing database...")
     db.initialize_database()
-    print("Database ready.")
+    logger.info("Database ready.")
+    end_startup_phase("database")
 
     # Create Qt Application
     app = QApplication(sys.argv)
     # Keep app running even if windows are hidden, rely on Tray Quit
     app.setQuitOnLastWindowClosed(False)
-    print("QApplication created.")
+    logger.info("QApplication created.")
+    end_startup_phase("Qt application")
 
-    # Create UI Windows
-    print("Creating UI windows...")
+    # Create the search window (the editor is built when first shown)
+    logger.info("Creating search window...")
     search_window = SearchUIWindow()
-    editor_window = PromptEditorWindow()
-    print("UI windows created.")
+    # Lay out and paint the popup off-screen now, and build its search index
+    search_window.prewarm()
+    logger.info("Search window created.")
+    end_startup_phase("search window")
 
     # Connect signals
-    print("Connecting signals...")
+    logger.info("Connecting signals...")
     search_window.open_editor_requested.connect(show_editor_ui_safe)
-    editor_window.closing.connect(editor_closed_safe) # Connect editor close signal
-    print("Signals connected.")
+    # Connected after the search window so its exit handler (stopping the
+    # search thread) runs first
+    app.aboutToQuit.connect(release_database)
+    # Last: writes the trace file and the span summary, if enabled
+    app.aboutToQuit.connect(instrumentation.finish)
+    logger.info("Signals connected.")
 
     # Setup System Tray Icon
     setup_tray_icon() # Call the setup function
+    end_startup_phase("tray icon")
 
     # Start hotkey listener in a separate thread
-    print("Starting hotkey listener thread...")
+    logger.info("Starting hotkey listener thread...")
     listener_thread = threading.Thread(target=hotkey_listener_thread, daemon=True)
     listener_thread.start()
+    end_startup_phase("hotkey listener")
     # Give the thread a moment to register the hotkey
     # QTimer.singleShot(500, lambda: print("Hotkey listener thread likely running.")) # Optional debug print
 
 
-    print(f"--- Prompt Manager Ready ---")
-    print(f"Press '{HOTKEY}' to open search.")
-    print(f"Or use the system tray icon.")
-    # print(f"Check this terminal for messages.") # Less relevant if console is hidden
-    print(f"----------------------------")
+    logger.info("--- Prompt Manager Ready --- Press '%s' to open search, or use the system tray icon.", HOTKEY)
+    report_startup_phases()
+    if PREBUILD_EDITOR:
+        QTimer.singleShot(EDITOR_PREBUILD_DELAY_MS, prebuild_editor_when_idle)
+    trash_purge_timer = QTimer()
+    trash_purge_timer.timeout.connect(purge_trash_when_idle)
+    trash_purge_timer.start(TRASH_PURGE_INTERVAL_MS)
 
     # Start the Qt event loop
     sys.exit(app.exec())
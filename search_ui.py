@@ -2,23 +2,32 @@
 
 import sys
 import os
+import logging
+import sqlite3
+import time
 # Conditionally import ctypes for Windows features (console hiding)
 if os.name == 'nt':
     import ctypes
 
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-    QPushButton, QLabel, QLineEdit, QListWidget, QListWidgetItem,
+    QPushButton, QLabel, QLineEdit, QListView, QStyledItemDelegate, QStyle,
     QSpacerItem, QSizePolicy, QGraphicsOpacityEffect
 )
 # --- Add QPoint import ---
-from PyQt6.QtCore import Qt, QSize, QTimer, QPropertyAnimation, QEasingCurve, QEvent, pyqtSignal, pyqtSlot, QPoint
+from PyQt6.QtCore import (
+    Qt, QSize, QTimer, QPropertyAnimation, QEasingCurve, QEvent, pyqtSignal, pyqtSlot, QPoint, QObject, QThread,
+    QAbstractListModel, QModelIndex, QRect
+)
 # --- End Add ---
-# Import QTextDocument for HTML to plain text conversion
-from PyQt6.QtGui import QIcon, QFont, QColor, QKeySequence, QShortcut, QGuiApplication, QTextDocument
+from PyQt6.QtGui import QIcon, QFont, QColor, QKeySequence, QShortcut, QGuiApplication, QFontMetrics
 
 # Import database functions
 import database as db
+import fuzzy_search
+from instrumentation import record_span, span, traced
+
+logger = logging.getLogger(__name__)
 
 # ==================================
 #      UI Size & Position Configuration
@@ -30,6 +39,40 @@ SEARCH_BAR_HEIGHT = 40
 LIST_ITEM_HEIGHT = 65   # Increased height for two lines
 MAX_VISIBLE_ITEMS = 5   # Max items before scroll (adjust as needed)
 NO_RESULT_ITEM_HEIGHT = 40 # Height for the "No results" item
+# SQLite VM instructions between stale-query checks while a search runs
+SEARCH_CANCEL_CHECK_STEPS = 1000
+SEARCH_PAGE_SIZE = 50 # Results fetched per request; more are fetched as the list is scrolled
+
+# ==================================
+#      Pre-warming & Show Latency
+# ==================================
+# At startup the popup is shown once at PREWARM_POSITION (off every screen)
+# so its native window, layout and first paint are done before any hotkey.
+PREWARM_POSITION = QPoint(-32000, -32000)
+# The popup is activated as soon as its window is exposed; if the window
+# system never reports that, it is activated after this delay anyway.
+ACTIVATION_FALLBACK_MS = 250
+
+# ==================================
+#      Result Row Painting (SearchResultDelegate)
+# ==================================
+RESULT_ROW_MARGIN = 5           # Padding inside a result row
+RESULT_TEXT_INDENT = 8          # Left padding of the two text lines
+RESULT_BORDER_WIDTH = 3         # Left accent border of hovered/selected rows
+RESULT_HOVER_BG = QColor("#2a3038")
+RESULT_HOVER_BORDER = QColor("#3a7fcb")
+RESULT_SELECTED_BG = QColor("#2c323a")
+RESULT_SELECTED_BORDER = QColor("#4a95eb")
+RESULT_PATH_COLOR = QColor("#a0a0a0")         # "category > section > title" line
+RESULT_MATCH_COLOR = QColor("#6fb3ff")        # Characters of the path that matched the query
+RESULT_DESCRIPTION_COLOR = QColor("#e0e0e0")
+RESULT_NO_RESULT_COLOR = QColor("#888888")
+NO_RESULTS_TEXT = "No matching prompts found."
+
+# Custom item data roles of SearchResultsModel
+DESCRIPTION_ROLE = Qt.ItemDataRole.UserRole + 1
+PROMPT_ID_ROLE = Qt.ItemDataRole.UserRole + 2
+MATCH_POSITIONS_ROLE = Qt.ItemDataRole.UserRole + 3 # Indexes of the matched characters in the path line
 
 # ==================================
 #      Global Dark Style Sheet (QSS) - Modified for two-line items
@@ -89,8 +132,8 @@ QPushButton#EditorIcon:pressed {
     min-height: 1px;
 }
 
-/* List Widget for Results */
-QListWidget {
+/* List View for Results (rows are painted by SearchResultDelegate) */
+QListView {
     background-color: #181c21;
     color: #f0f0f0;
     border: none;
@@ -98,66 +141,6 @@ QListWidget {
     padding: 5px 0px; /* Adjust padding */
 }
 
-QListWidget::item {
-    background-color: #181c21;
-    padding: 0px; /* Padding handled by item widget */
-    border: none;
-    /* border-left: 2px solid transparent; */ /* Removed, handled by item widget style */
-    margin: 1px 0px; /* Small margin between items */
-}
-
-QListWidget::item:selected {
-    background-color: #1c2026; /* Slightly darker selection */
-    color: #f0f0f0;
-    /* border-left: 2px solid #4a95eb; */ /* Removed */
-}
-
-QListWidget::item:hover {
-    background-color: #1c2026; /* Same as selected for simplicity */
-    /* border-left: 2px solid #3a7fcb; */ /* Removed */
-}
-
-/* Custom List Item Styling */
-QWidget#ResultItemWidget {
-    background-color: transparent;
-    border-left: 3px solid transparent; /* Default border */
-    border-radius: 3px;
-}
-QWidget#ResultItemWidget:hover {
-    background-color: #2a3038;
-    border-left: 3px solid #3a7fcb; /* Hover border */
-}
-QWidget#ResultItemWidget.selected { /* Custom property for selection */
-    background-color: #2c323a;
-    border-left: 3px solid #4a95eb; /* Selected border */
-}
-
-
-QLabel#ItemTitle {
-    background-color: transparent;
-    font-size: 10pt; /* Slightly smaller for path */
-    font-weight: normal;
-    color: #a0a0a0; /* Grayish color for path */
-    padding: 0px 8px;
-}
-
-QLabel#ItemDescription {
-    background-color: transparent;
-    color: #e0e0e0; /* Main description color */
-    font-size: 9pt;
-    font-weight: normal; /* Normal weight for description */
-    padding: 0px 8px;
-}
-
-/* Styling for the "No results" label */
-QLabel#NoResultLabel {
-    background-color: transparent;
-    color: #888;
-    font-size: 10pt;
-    padding: 10px; /* Add padding */
-    alignment: AlignCenter; /* Use Qt alignment property */
-}
-
 
 /* Scrollbar styling */
 QScrollBar:vertical {
@@ -176,9 +159,236 @@ QScrollBar::add-line:vertical, QScrollBar::sub-line:vertical { height: 0px; }
 QScrollBar::add-page:vertical, QScrollBar::sub-page:vertical { background: none; }
 """
 
+class SearchResultsModel(QAbstractListModel):
+    """List model over the result dicts returned by fuzzy_search.search_prompts().
+
+    Holds plain Python data only; the view asks for rows as it paints them, so
+    nothing is built for rows that are scrolled out of sight. An empty result
+    set is shown as a single non-selectable "no results" row.
+
+    Results arrive a page at a time. When the view scrolls to the end and the
+    last page was full, fetchMore() emits more_requested; the window then asks
+    the search worker for the next page and hands it to append_results().
+    """
+    more_requested = pyqtSignal(int) # offset of the next page
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._results = []
+        self._show_no_results = False
+        self._has_more = False
+        self._fetching = False
+
+    @traced
+    def set_results(self, results, has_more=False):
+        self.beginResetModel()
+        self._results = list(results)
+        self._show_no_results = not self._results
+        self._has_more = has_more
+        self._fetching = False
+        self.endResetModel()
+
+    @traced
+    def append_results(self, results, has_more=False):
+        self._fetching = False
+        self._has_more = has_more
+        if results:
+            first = len(self._results)
+            self.beginInsertRows(QModelIndex(), first, first + len(results) - 1)
+            self._results.extend(results)
+            self.endInsertRows()
+
+    def clear(self):
+        self.beginResetModel()
+        self._results = []
+        self._show_no_results = False
+        self._has_more = False
+        self._fetching = False
+        self.endResetModel()
+
+    def has_results(self):
+        return bool(self._results)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self._has_more and not self._fetching
+
+    def fetchMore(self, parent=QModelIndex()):
+        if self.canFetchMore(parent):
+            self._fetching = True
+            self.more_requested.emit(len(self._results))
+
+    def is_no_results_row(self, index):
+        return self._show_no_results and index.isValid() and index.row() == 0
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return 1 if self._show_no_results else len(self._results)
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.ItemFlag.NoItemFlags
+        if self._show_no_results:
+            return Qt.ItemFlag.ItemIsEnabled # Not selectable
+        return Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsSelectable
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        if self._show_no_results:
+            return NO_RESULTS_TEXT if role == Qt.ItemDataRole.DisplayRole else None
+        if not 0 <= index.row() < len(self._results):
+            return None
+
+        result = self._results[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return result['path']
+        if role == DESCRIPTION_ROLE:
+            # When the match is in the body rather than the title, show where it matched
+            if not result.get('title_offsets') and result.get('snippet'):
+                return result['snippet']
+            return result['prompt_description'] or "No description"
+        if role == PROMPT_ID_ROLE:
+            return result['prompt_id']
+        if role == MATCH_POSITIONS_ROLE:
+            return result['path_positions']
+        if role == Qt.ItemDataRole.ToolTipRole:
+            return result['prompt_description'] or None
+        return None
+
+
+class SearchResultDelegate(QStyledItemDelegate):
+    """Paints a result row (path line + description line) directly, without item widgets."""
+
+    def sizeHint(self, option, index):
+        if index.model().is_no_results_row(index):
+            return QSize(option.rect.width(), NO_RESULT_ITEM_HEIGHT)
+        return QSize(option.rect.width(), LIST_ITEM_HEIGHT)
+
+    def paint(self, painter, option, index):
+        painter.save()
+        rect = option.rect
+
+        if index.model().is_no_results_row(index):
+            painter.setPen(RESULT_NO_RESULT_COLOR)
+            painter.drawText(rect, Qt.AlignmentFlag.AlignCenter, index.data(Qt.ItemDataRole.DisplayRole))
+            painter.restore()
+            return
+
+        # Background and left accent border for selected / hovered rows
+        row_rect = rect.adjusted(0, 1, 0, -1) # Small margin between items
+        if option.state & QStyle.StateFlag.State_Selected:
+            painter.fillRect(row_rect, RESULT_SELECTED_BG)
+            painter.fillRect(QRect(row_rect.left(), row_rect.top(), RESULT_BORDER_WIDTH, row_rect.height()), RESULT_SELECTED_BORDER)
+        elif option.state & QStyle.StateFlag.State_MouseOver:
+            painter.fillRect(row_rect, RESULT_HOVER_BG)
+            painter.fillRect(QRect(row_rect.left(), row_rect.top(), RESULT_BORDER_WIDTH, row_rect.height()), RESULT_HOVER_BORDER)
+
+        text_rect = row_rect.adjusted(RESULT_BORDER_WIDTH + RESULT_ROW_MARGIN + RESULT_TEXT_INDENT, RESULT_ROW_MARGIN,
+                                      -(RESULT_ROW_MARGIN + RESULT_TEXT_INDENT), -RESULT_ROW_MARGIN)
+        half_height = text_rect.height() // 2
+
+        # Line 1: category > section > title
+        path_font = QFont(option.font)
+        path_font.setPointSize(10)
+        painter.setFont(path_font)
+        painter.setPen(RESULT_PATH_COLOR)
+        path_rect = QRect(text_rect.left(), text_rect.top(), text_rect.width(), half_height)
+        path_metrics = QFontMetrics(path_font)
+        full_path = index.data(Qt.ItemDataRole.DisplayRole)
+        path_text = path_metrics.elidedText(full_path, Qt.TextElideMode.ElideRight, path_rect.width())
+        visible = len(path_text) if path_text == full_path else len(path_text) - 1 # Not the "…"
+        positions = [p for p in index.data(MATCH_POSITIONS_ROLE) if p < visible]
+        self._draw_highlighted(painter, path_rect, path_metrics, path_text, positions)
+
+        # Line 2: description (or matching content snippet)
+        description_font = QFont(option.font)
+        description_font.setPointSize(9)
+        painter.setFont(description_font)
+        painter.setPen(RESULT_DESCRIPTION_COLOR)
+        description_rect = QRect(text_rect.left(), text_rect.top() + half_height, text_rect.width(), text_rect.height() - half_height)
+        description = " ".join(index.data(DESCRIPTION_ROLE).split()) # Single line
+        description = QFontMetrics(description_font).elidedText(description, Qt.TextElideMode.ElideRight, description_rect.width())
+        painter.drawText(description_rect, Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter, description)
+
+        painter.restore()
+
+    def _draw_highlighted(self, painter, rect, metrics, text, positions):
+        """Draws text left-aligned in rect, with the characters at positions in RESULT_MATCH_COLOR."""
+        matched = set(positions)
+        flags = Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter
+        x = rect.left()
+        run_start = 0
+        for i in range(1, len(text) + 1):
+            if i < len(text) and (i in matched) == (run_start in matched):
+                continue
+            # One run of characters that are all matched or all unmatched
+            run = text[run_start:i]
+            painter.setPen(RESULT_MATCH_COLOR if run_start in matched else RESULT_PATH_COLOR)
+            painter.drawText(QRect(x, rect.top(), rect.right() - x + 1, rect.height()), flags, run)
+            x += metrics.horizontalAdvance(run)
+            run_start = i
+
+
+class SearchWorker(QObject):
+    """Runs searches (fuzzy_search.search_prompts) on a background thread.
+
+    Every request carries a generation number. The GUI thread calls supersede()
+    as soon as the query text changes, which makes the worker skip queued
+    requests for older generations and interrupts a query that is already
+    running (via its should_stop callback and an SQLite progress handler), so
+    only the latest query's results are ever posted back.
+    """
+    results_ready = pyqtSignal(int, int, list) # generation, offset, results
+
+    def __init__(self):
+        super().__init__()
+        self._latest_generation = 0
+
+    def supersede(self, generation):
+        """Marks every request older than generation as stale (called from the GUI thread)."""
+        self._latest_generation = generation # Plain int assignment, atomic under the GIL
+
+    def _is_stale(self, generation):
+        return generation != self._latest_generation
+
+    @pyqtSlot()
+    def prewarm(self):
+        """Builds the fuzzy search index before the first query needs it."""
+        fuzzy_search.prompt_index.prewarm()
+
+    @pyqtSlot(int, str, int)
+    def run_search(self, generation, search_text, offset):
+        if self._is_stale(generation):
+            return # A newer query is already queued behind this one
+
+        conn = db.get_db_connection()
+        # Returning True from the progress handler aborts the running statement
+        conn.set_progress_handler(lambda: self._is_stale(generation), SEARCH_CANCEL_CHECK_STEPS)
+        try:
+            with span("search_ui.run_search", query=search_text, offset=offset):
+                results = fuzzy_search.search_prompts(search_text, SEARCH_PAGE_SIZE, offset,
+                                                      should_stop=lambda: self._is_stale(generation))
+        except sqlite3.OperationalError as e:
+            if not self._is_stale(generation): # Otherwise it was interrupted on purpose
+                logger.error("Error searching for '%s': %s", search_text, e)
+            return
+        finally:
+            conn.set_progress_handler(None, 0)
+
+        if results is not None and not self._is_stale(generation):
+            self.results_ready.emit(generation, offset, results)
+
+
 class SearchUIWindow(QMainWindow):
     # Signal to request opening the editor
     open_editor_requested = pyqtSignal()
+    # Queued to the search worker thread: generation, search text, offset of the page
+    search_requested = pyqtSignal(int, str, int)
+    prewarm_requested = pyqtSignal()
+    # Shows the popup; emit from any thread with the time.perf_counter() of
+    # the hotkey press (or click), which the latency report is measured from
+    show_requested = pyqtSignal(float)
 
     def __init__(self):
         super().__init__()
@@ -191,6 +401,35 @@ class SearchUIWindow(QMainWindow):
         self.initUI()
         self.drag_position = None # For window dragging
 
+        # Showing: activation waits for the window system to expose the window
+        self._prewarming = False
+        self._activation_pending = False
+        self._show_requested_at = None # perf_counter() times for the latency report
+        self._shown_at = None
+        self.last_show_latency = None # (ms until visible, ms until focused) of the last show
+        self.winId() # Create the native window now, so its expose events can be watched
+        self.windowHandle().installEventFilter(self)
+        self.show_requested.connect(self.show_and_prepare)
+        self._activation_fallback = QTimer(self)
+        self._activation_fallback.setSingleShot(True)
+        self._activation_fallback.setInterval(ACTIVATION_FALLBACK_MS)
+        self._activation_fallback.timeout.connect(self._activate_and_focus)
+
+        # Background search: queries run on search_thread, results come back queued
+        self._search_generation = 0
+        self._search_text = ""
+        self._recent_results = [] # Last list of most used prompts, shown at once for an empty query
+        self.search_thread = QThread(self)
+        self.search_worker = SearchWorker()
+        self.search_worker.moveToThread(self.search_thread)
+        self.search_requested.connect(self.search_worker.run_search)
+        self.prewarm_requested.connect(self.search_worker.prewarm)
+        self.search_worker.results_ready.connect(self.on_search_results)
+        self.results_model.more_requested.connect(self.request_more_results)
+        self.search_thread.finished.connect(self.search_worker.deleteLater)
+        self.search_thread.start()
+        QApplication.instance().aboutToQuit.connect(self.stop_search_thread)
+
         # Timer to auto-hide if focus is lost (Optional - can be enabled)
         # self.focus_timer = QTimer(self)
         # self.focus_timer.setInterval(200) # Check every 200ms
@@ -207,46 +446,115 @@ class SearchUIWindow(QMainWindow):
         y = max(20, y) # Keep at least 20px from top
         self.move(x, y)
 
+    def prewarm(self):
+        """Gets the popup ready at startup so that the hotkey only has to show it.
+
+        The window is shown once off-screen and fully transparent, which
+        creates and lays out everything and paints it a first time; it is
+        hidden again once exposed (_on_exposed). The search index and the
+        list of most used prompts are built on the worker thread meanwhile.
+        """
+        self.prewarm_requested.emit()
+        self.search_requested.emit(self._search_generation, "", 0) # Fills _recent_results
+        self._prewarming = True
+        self.setWindowOpacity(0.0)
+        self.move(PREWARM_POSITION)
+        self.show()
+
+    def _finish_prewarm(self):
+        if self._prewarming:
+            self._prewarming = False
+            self.hide()
+            self.setWindowOpacity(1.0)
+
+    @pyqtSlot(float)
     @pyqtSlot() # Decorator to ensure it's callable via invokeMethod
-    def show_and_prepare(self):
-        """Shows the window, clears input, centers, and sets focus."""
-        print("SearchUIWindow.show_and_prepare() called") # DEBUG
+    @traced
+    def show_and_prepare(self, requested_at=None):
+        """Shows the window, clears input, centers, and sets focus.
+
+        Focus is given as soon as the window is exposed (see _on_exposed).
+        requested_at is the time.perf_counter() of the hotkey press.
+        """
+        self._show_requested_at = time.perf_counter() if requested_at is None else requested_at
+        self._shown_at = None
+        self._prewarming = False # A show during pre-warming takes over
+        self.setWindowOpacity(1.0)
         self.search_input.clear()
-        self.results_list.clear()
-        self.results_list.setVisible(False)
-        self.separator.setVisible(False)
-        # Reset height before centering, in case it was expanded
-        self.setFixedHeight(MAIN_WINDOW_HEIGHT)
+        # Empty query: most used prompts (sets the height before centering)
+        self.on_search_text_changed("")
         self.center_window()
 
-        # --- MODIFICATION START ---
+        already_exposed = self.isVisible() and self.windowHandle().isExposed()
+        self._activation_pending = True
         self.show()
-        self.raise_() # Raise visually first
+        self.raise_()
+        if already_exposed:
+            self._on_exposed() # No new expose event is coming
+        else:
+            self._activation_fallback.start()
 
-        # Use a timer to delay both activation and focus setting
-        # Increased delay slightly to 100ms for robustness on first launch
-        QTimer.singleShot(100, self._activate_and_focus)
-        # --- MODIFICATION END ---
+    def eventFilter(self, obj, event):
+        # The native window reports when it is actually on screen
+        if obj is self.windowHandle() and event.type() == QEvent.Type.Expose and obj.isExposed():
+            self._on_exposed()
+        return super().eventFilter(obj, event)
 
-        # self.focus_timer.start() # Restart focus check if using it
+    def _on_exposed(self):
+        if self._prewarming:
+            QTimer.singleShot(0, self._finish_prewarm) # After the first paint
+            return
+        if self._activation_pending:
+            if self._shown_at is None:
+                self._shown_at = time.perf_counter()
+            self._activate_and_focus()
 
-    # --- ADDED HELPER METHOD ---
     def _activate_and_focus(self):
-        """Helper function called by timer to activate window and set focus."""
-        print("Timer executing _activate_and_focus") # DEBUG
-        self.activateWindow() # Now activate
+        """Activates the window and focuses the search field (once per show)."""
+        self._activation_fallback.stop()
+        if not self._activation_pending:
+            return
+        self._activation_pending = False
+        self.activateWindow()
         self.search_input.setFocus() # Set focus to the input field
-    # --- END ADDED HELPER METHOD ---
+
+    def changeEvent(self, event):
+        if event.type() == QEvent.Type.ActivationChange and self.isActiveWindow():
+            self._report_show_latency()
+        super().changeEvent(event)
+
+    def _report_show_latency(self):
+        """Logs how long the last show took, from the hotkey press to visible and to focused."""
+        if self._show_requested_at is None:
+            return
+        focused_at = time.perf_counter()
+        shown_at = self._shown_at if self._shown_at is not None else focused_at
+        self.last_show_latency = ((shown_at - self._show_requested_at) * 1000,
+                                  (focused_at - self._show_requested_at) * 1000)
+        record_span("search_ui.show_latency", self._show_requested_at, focused_at)
+        self._show_requested_at = None
+        logger.info("Search popup latency: visible after %.1f ms, focused after %.1f ms",
+                    *self.last_show_latency)
 
     @pyqtSlot() # Decorator to ensure it's callable via invokeMethod
     def hide_window(self):
         """Hides the window and clears state."""
-        print("SearchUIWindow.hide_window() called") # DEBUG
+        logger.debug("SearchUIWindow.hide_window() called")
         # self.focus_timer.stop() # Stop checking focus when hidden
+        self._activation_pending = False
+        self._activation_fallback.stop()
         self.hide()
-        # Clear input/results when hiding
+        # Drop any search still queued or running, so its results do not
+        # refill and resize the hidden window
+        self._search_generation += 1
+        self.search_worker.supersede(self._search_generation)
+        self._search_text = ""
+        # Clear input/results when hiding (without textChanged: that would
+        # queue a search for the most used prompts)
+        self.search_input.blockSignals(True)
         self.search_input.clear()
-        self.results_list.clear()
+        self.search_input.blockSignals(False)
+        self.results_model.clear()
         self.results_list.setVisible(False)
         self.separator.setVisible(False)
         self.setFixedHeight(MAIN_WINDOW_HEIGHT) # Reset height
@@ -284,7 +592,7 @@ class SearchUIWindow(QMainWindow):
         # Search input
         self.search_input = QLineEdit()
         self.search_input.setObjectName("SearchInput")
-        self.search_input.setPlaceholderText("Search prompt titles...")
+        self.search_input.setPlaceholderText("Search prompts...")
         self.search_input.setFixedHeight(SEARCH_BAR_HEIGHT)
         self.search_input.textChanged.connect(self.on_search_text_changed)
         self.search_input.returnPressed.connect(self.on_return_pressed) # Handle Enter key
@@ -299,20 +607,21 @@ class SearchUIWindow(QMainWindow):
         self.separator.setFixedHeight(1)
         self.separator.setVisible(False) # Hide initially
 
-        # Results list
-        self.results_list = QListWidget()
+        # Results list: model/view, rows are painted on demand by the delegate
+        self.results_model = SearchResultsModel(self)
+        self.results_list = QListView()
+        self.results_list.setModel(self.results_model)
+        self.results_list.setItemDelegate(SearchResultDelegate(self.results_list))
         self.results_list.setVerticalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAsNeeded)
         self.results_list.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
         self.results_list.setVisible(False)  # Hide initially
         self.results_list.setObjectName("ResultsList")
         self.results_list.setFocusPolicy(Qt.FocusPolicy.NoFocus) # Prevent list from taking focus
+        self.results_list.setMouseTracking(True) # Needed for the delegate's hover state
 
-        # --- CHANGE: Connect itemPressed instead of itemActivated ---
-        # self.results_list.itemActivated.connect(self.on_item_selected) # Triggered by Enter/Double-click
-        self.results_list.itemPressed.connect(self.on_item_selected) # Triggered by Mouse Press Down
-        # --- END CHANGE ---
+        # Triggered by Mouse Press Down
+        self.results_list.pressed.connect(self.on_item_selected)
 
-        self.results_list.itemSelectionChanged.connect(self.highlight_selected_item)
         self.results_list.setUniformItemSizes(True) # Optimization
 
         # Add widgets to main layout
@@ -331,69 +640,25 @@ class SearchUIWindow(QMainWindow):
         QShortcut(QKeySequence(Qt.Key.Key_Escape), self, self.hide_window)
 
 
-    def add_search_results(self, search_text=""):
-        """Add search results based on the search text (prompt title)."""
-        self.results_list.clear()
-
-        if not search_text:
-            self.results_list.setVisible(False)
-            self.separator.setVisible(False)
-            self.adjust_window_height(False) # Collapse window
-            return
+    @pyqtSlot()
+    def stop_search_thread(self):
+        """Cancels any running search and stops the worker thread."""
+        self._search_generation += 1
+        self.search_worker.supersede(self._search_generation)
+        self.search_thread.quit()
+        self.search_thread.wait()
 
-        # Query database
-        results = db.search_prompts_by_title(search_text)
-
-        if not results:
-            # --- FIX: Create "No results" item ---
-            item_widget = QWidget() # Simple widget container
-            item_layout = QHBoxLayout(item_widget) # Use QHBoxLayout for centering
-            item_layout.setContentsMargins(0, 0, 0, 0)
-            no_result_label = QLabel("No matching prompts found.")
-            no_result_label.setObjectName("NoResultLabel") # For specific styling
-            no_result_label.setAlignment(Qt.AlignmentFlag.AlignCenter) # Center text
-            item_layout.addWidget(no_result_label) # Add label to layout
-
-            list_item = QListWidgetItem()
-            # Set a fixed height for this specific item
-            list_item.setSizeHint(QSize(self.results_list.width(), NO_RESULT_ITEM_HEIGHT))
-            list_item.setFlags(list_item.flags() & ~Qt.ItemFlag.ItemIsSelectable) # Not selectable
-            self.results_list.addItem(list_item)
-            self.results_list.setItemWidget(list_item, item_widget)
-            # --- END FIX ---
+    def clear_search_results(self):
+        """Empties the results list and collapses the window to the search bar."""
+        self.results_model.clear()
+        self.results_list.setVisible(False)
+        self.separator.setVisible(False)
+        self.adjust_window_height(False) # Collapse window
 
-        else:
-            for result in results:
-                # Create widget for list item
-                item_widget = QWidget()
-                item_widget.setObjectName("ResultItemWidget") # For styling selected state
-                item_layout = QVBoxLayout(item_widget)
-                item_layout.setContentsMargins(5, 5, 5, 5) # Padding inside the item
-                item_layout.setSpacing(2) # Spacing between title and description
-
-                # Title/Path Label
-                path_text = f"{result['category_name']} > {result['section_name']} > {result['prompt_title']}"
-                title_label = QLabel(path_text)
-                title_label.setObjectName("ItemTitle")
-                title_label.setWordWrap(True) # Allow wrapping if too long
-
-                # Description Label
-                desc_text = result['prompt_description'] or "No description"
-                desc_label = QLabel(desc_text)
-                desc_label.setObjectName("ItemDescription")
-                desc_label.setWordWrap(True)
-
-                item_layout.addWidget(title_label)
-                item_layout.addWidget(desc_label)
-
-                # Create list item and set widget
-                list_item = QListWidgetItem()
-                # Store the full prompt content in the item's data
-                list_item.setData(Qt.ItemDataRole.UserRole, result['prompt_content'])
-                list_item.setSizeHint(QSize(self.results_list.width() - 10, LIST_ITEM_HEIGHT)) # Adjust width slightly for scrollbar
-
-                self.results_list.addItem(list_item)
-                self.results_list.setItemWidget(list_item, item_widget)
+    def add_search_results(self, results):
+        """Shows the given search results (first page from fuzzy_search.search_prompts) in the list."""
+        # A single model reset, independent of how many rows matched
+        self.results_model.set_results(results, has_more=len(results) == SEARCH_PAGE_SIZE)
 
         # Show results list and separator
         self.results_list.setVisible(True)
@@ -401,7 +666,7 @@ class SearchUIWindow(QMainWindow):
 
         # Select the first item if results exist
         if results:
-            self.results_list.setCurrentRow(0)
+            self.results_list.setCurrentIndex(self.results_model.index(0))
 
         # Adjust window height smoothly
         # Pass the count of actual results, or 1 if only the "No results" message is shown
@@ -417,7 +682,7 @@ class SearchUIWindow(QMainWindow):
         if expand and item_count > 0:
             # Calculate height needed for items + search bar + padding/separator
             # Use specific height for "No results" item if item_count is 1 and results were empty
-            height_per_item = NO_RESULT_ITEM_HEIGHT if item_count == 1 and not self.results_list.item(0).flags() & Qt.ItemFlag.ItemIsSelectable else LIST_ITEM_HEIGHT
+            height_per_item = LIST_ITEM_HEIGHT if self.results_model.has_results() else NO_RESULT_ITEM_HEIGHT
             list_height = min(item_count, MAX_VISIBLE_ITEMS) * height_per_item
             # Add some padding/margins/separator height
             extra_space = 10 # Adjust as needed
@@ -430,96 +695,99 @@ class SearchUIWindow(QMainWindow):
             self.setFixedHeight(target_height)
 
 
-    def highlight_selected_item(self):
-        """Applies a visual style to the selected item's widget."""
-        for i in range(self.results_list.count()):
-            item = self.results_list.item(i)
-            widget = self.results_list.itemWidget(item)
-            if widget:
-                # Only apply selected style if the item is actually selectable
-                is_selectable = bool(item.flags() & Qt.ItemFlag.ItemIsSelectable)
-                if item.isSelected() and is_selectable:
-                    widget.setProperty("class", "selected") # Use custom property for styling
-                else:
-                    widget.setProperty("class", "") # Reset property
-                # Re-apply stylesheet to update appearance
-                widget.style().unpolish(widget)
-                widget.style().polish(widget)
+    def on_search_text_changed(self, text):
+        """Handle search text changes by queueing a search on the worker thread."""
+        search_text = text.strip()
+        # Any query still queued or running is now stale
+        self._search_generation += 1
+        self.search_worker.supersede(self._search_generation)
+
+        self._search_text = search_text
+        if not search_text:
+            self.show_recent_prompts()
+            return
+        self.search_requested.emit(self._search_generation, search_text, 0)
 
+    def show_recent_prompts(self):
+        """Shows the most used prompts: the cached list at once, refreshed by the worker."""
+        if self._recent_results:
+            self.add_search_results(self._recent_results)
+        else:
+            self.clear_search_results()
+        self.search_requested.emit(self._search_generation, "", 0)
 
-    def on_search_text_changed(self, text):
-        """Handle search text changes."""
-        self.add_search_results(text.strip())
+    def request_more_results(self, offset):
+        """Asks the worker for the next page of the current query (list scrolled to the end)."""
+        self.search_requested.emit(self._search_generation, self._search_text, offset)
 
-    def on_item_selected(self, item):
+    @pyqtSlot(int, int, list)
+    def on_search_results(self, generation, offset, results):
+        """Receives results from the worker; anything but the latest query is dropped."""
+        if generation != self._search_generation:
+            return
+        if offset == 0 and not self._search_text:
+            self._recent_results = results
+            if not results: # Nothing used yet: stay collapsed rather than say "no results"
+                self.clear_search_results()
+                return
+        if offset == 0:
+            self.add_search_results(results)
+        else:
+            self.results_model.append_results(results, has_more=len(results) == SEARCH_PAGE_SIZE)
+
+    def on_item_selected(self, index):
         """Handle item press (mouse down)."""
-        print(f"on_item_selected (itemPressed) called for item: {item.text() if item else 'None'}") # Debug print
-        if item and (item.flags() & Qt.ItemFlag.ItemIsSelectable): # Ensure item is valid and selectable
-            self.copy_prompt_and_hide(item)
+        logger.debug("on_item_selected (pressed) called for row: %d", index.row())
+        if index.isValid() and (index.flags() & Qt.ItemFlag.ItemIsSelectable): # Ensure item is valid and selectable
+            self.copy_prompt_and_hide(index)
 
     def on_return_pressed(self):
         """Handle Enter key press."""
-        print("on_return_pressed called") # Debug print
-        current_item = self.results_list.currentItem()
-        if current_item and (current_item.flags() & Qt.ItemFlag.ItemIsSelectable): # Check if selectable
-            self.copy_prompt_and_hide(current_item)
+        logger.debug("on_return_pressed called")
+        current_index = self.results_list.currentIndex()
+        if current_index.isValid() and (current_index.flags() & Qt.ItemFlag.ItemIsSelectable): # Check if selectable
+            self.copy_prompt_and_hide(current_index)
 
-    def copy_prompt_and_hide(self, item):
+    def copy_prompt_and_hide(self, index):
         """Copies the prompt content to clipboard and hides the window."""
-        print("copy_prompt_and_hide called") # Debug print
-        html_content = item.data(Qt.ItemDataRole.UserRole)
-        if html_content:
-            # Convert HTML to Plain Text
-            temp_doc = QTextDocument()
-            temp_doc.setHtml(html_content)
-            plain_text_content = temp_doc.toPlainText()
-
+        logger.debug("copy_prompt_and_hide called")
+        # Results don't carry prompt bodies; fetch just this one. It is stored
+        # as plain text when the prompt is saved, so no HTML parsing here.
+        prompt_id = index.data(PROMPT_ID_ROLE)
+        plain_text_content = db.get_prompt_plain_text(prompt_id)
+        if plain_text_content:
             clipboard = QApplication.clipboard()
             clipboard.setText(plain_text_content) # Copy plain text
-            print(f"Copied plain text: {plain_text_content[:50]}...") # Log snippet
+            logger.debug("Copied plain text: %.50s...", plain_text_content) # Log snippet
+            # Counts towards its frecency ranking; written off the GUI thread
+            db.submit_write(db.record_prompt_use, prompt_id)
             self.hide_window() # Hide after copying
         else:
-            print("No content found in selected item data.")
+            logger.warning("No content found for prompt %s.", prompt_id)
 
 
     def select_next_item(self):
-        current_row = self.results_list.currentRow()
-        count = self.results_list.count()
-        if count > 0:
-            # Ensure only selectable items are counted if "No results" item exists
-            selectable_indices = [i for i in range(count) if self.results_list.item(i).flags() & Qt.ItemFlag.ItemIsSelectable]
-            if not selectable_indices: return # No selectable items
-
-            try:
-                current_selectable_index = selectable_indices.index(current_row)
-                next_selectable_index = (current_selectable_index + 1) % len(selectable_indices)
-            except ValueError: # current_row might be -1 or the non-selectable item
-                next_selectable_index = 0 # Select the first selectable item
-
-            next_row = selectable_indices[next_selectable_index]
-            self.results_list.setCurrentRow(next_row)
+        # Every row is selectable whenever there are results, so this is a plain O(1) step
+        if not self.results_model.has_results():
+            return
+        count = self.results_model.rowCount()
+        current_row = self.results_list.currentIndex().row()
+        next_row = (current_row + 1) % count if current_row >= 0 else 0
+        self.results_list.setCurrentIndex(self.results_model.index(next_row))
 
 
     def select_previous_item(self):
-        current_row = self.results_list.currentRow()
-        count = self.results_list.count()
-        if count > 0:
-            selectable_indices = [i for i in range(count) if self.results_list.item(i).flags() & Qt.ItemFlag.ItemIsSelectable]
-            if not selectable_indices: return # No selectable items
-
-            try:
-                current_selectable_index = selectable_indices.index(current_row)
-                prev_selectable_index = (current_selectable_index - 1 + len(selectable_indices)) % len(selectable_indices)
-            except ValueError: # current_row might be -1 or the non-selectable item
-                 prev_selectable_index = len(selectable_indices) - 1 # Select the last selectable item
-
-            prev_row = selectable_indices[prev_selectable_index]
-            self.results_list.setCurrentRow(prev_row)
+        if not self.results_model.has_results():
+            return
+        count = self.results_model.rowCount()
+        current_row = self.results_list.currentIndex().row()
+        prev_row = (current_row - 1) % count if current_row >= 0 else count - 1 # Select the last item
+        self.results_list.setCurrentIndex(self.results_model.index(prev_row))
 
 
     def request_open_editor(self):
         """Emits the signal to open the editor and hides itself."""
-        print("Requesting to open editor...")
+        logger.debug("Requesting to open editor...")
         self.open_editor_requested.emit()
         self.hide_window() # Hide search UI
 
@@ -0,0 +1,97 @@
+# --- START OF FILE tests/test_clone.py ---
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database as db
+
+@pytest.fixture
+def category_id(tmp_path, monkeypatch):
+    """A category with two sections: Alpha (3 prompts, 2 sharing a body) and Beta (1 prompt)."""
+    monkeypatch.setattr(db, "DATABASE_NAME", str(tmp_path / "prompts.db"))
+    db.initialize_database()
+    category_id = db.add_category("Work", '#ffcc00')
+    alpha_id = db.add_section("Alpha", category_id)
+    db.update_section_color(alpha_id, '#00ccff')
+    db.add_prompt("One", "first", "<p>shared body</p>", alpha_id)
+    db.add_prompt("Two", "", "<p>shared body</p>", alpha_id)
+    db.add_prompt("Three", "", "<p>own body</p>", alpha_id)
+    db.add_prompt("Four", "", "<p>beta body</p>", db.add_section("Beta", category_id))
+    yield category_id
+    db.close_all_connections()
+
+def _count(sql, *params):
+    return db.get_db_connection().execute(sql, params).fetchone()[0]
+
+def _ref_counts():
+    """{plain body: ref_count} of every blob."""
+    conn = db.get_db_connection()
+    return {db._decode_content(row['data'], row['compressed']): row['ref_count']
+            for row in conn.execute("SELECT data, compressed, ref_count FROM content_blobs")}
+
+def _tree(category_id):
+    """[(section name, color, [(title, description, content, plain text)])] in display order."""
+    tree = []
+    for section in db.get_sections(category_id):
+        prompts = []
+        for prompt in db.get_prompts(section['id']):
+            row = db.get_prompt(prompt['id'])
+            prompts.append((row['title'], row['description'], row['content'], db.get_prompt_plain_text(prompt['id'])))
+        tree.append((section['name'], section['color'], prompts))
+    return tree
+
+def test_clone_category_copies_the_subtree(category_id):
+    copy_id = db.clone_category(category_id)
+    category = {row['id']: row for row in db.get_categories()}[copy_id]
+    assert (category['name'], category['color']) == ("Work (Copy)", '#ffcc00')
+    assert _tree(copy_id) == _tree(category_id)
+    assert _count("SELECT count(*) FROM sections") == 4
+    assert _count("SELECT count(*) FROM prompts") == 8
+    # Copies share the bodies: no new blob, one more reference per copied prompt
+    assert _ref_counts() == {"<p>shared body</p>": 4, "<p>own body</p>": 2, "<p>beta body</p>": 2}
+
+def test_clone_category_names_are_numbered(category_id):
+    db.clone_category(category_id)
+    second_id = db.clone_category(category_id)
+    assert {row['id']: row['name'] for row in db.get_categories()}[second_id] == "Work (Copy 2)"
+
+def test_clone_section_into_another_category(category_id):
+    other_id = db.add_category("Other")
+    alpha_id = db.get_sections(category_id)[0]['id']
+    copy_id = db.clone_section(alpha_id, other_id)
+    assert [row['id'] for row in db.get_sections(other_id)] == [copy_id]
+    assert _tree(other_id) == [("Alpha (Copy)",) + _tree(category_id)[0][1:]]
+    assert _ref_counts() == {"<p>shared body</p>": 4, "<p>own body</p>": 2, "<p>beta body</p>": 1}
+
+def test_clone_prompt_goes_last(category_id):
+    alpha_id = db.get_sections(category_id)[0]['id']
+    one_id = db.get_prompts(alpha_id)[0]['id']
+    copy_id = db.clone_prompt(one_id)
+    assert [row['title'] for row in db.get_prompts(alpha_id)] == ["One", "Two", "Three", "One (Copy)"]
+    assert db.get_prompt(copy_id)['content'] == "<p>shared body</p>"
+    assert _ref_counts()["<p>shared body</p>"] == 3
+
+def test_trashed_children_are_not_copied(category_id):
+    alpha_id, beta_id = [row['id'] for row in db.get_sections(category_id)]
+    db.delete_prompt(db.get_prompts(alpha_id)[2]['id'])
+    db.delete_section(beta_id)
+    copy_id = db.clone_category(category_id)
+    assert [(name, [prompt[0] for prompt in prompts]) for name, _, prompts in _tree(copy_id)] == [
+        ("Alpha", ["One", "Two"])]
+    assert db.clone_section(beta_id) is None
+
+def test_deleting_the_copies_releases_their_references(category_id):
+    copy_id = db.clone_category(category_id)
+    db.delete_category(copy_id)
+    db.delete_permanently("categories", copy_id)
+    db.flush_writes()
+    while db._trash_purge_running:
+        db.flush_writes()
+    assert _count("SELECT count(*) FROM prompts") == 4
+    assert _ref_counts() == {"<p>shared body</p>": 2, "<p>own body</p>": 1, "<p>beta body</p>": 1}
+
+# --- END OF FILE tests/test_clone.py ---
@@ -0,0 +1,81 @@
+# --- START OF FILE tests/test_content_blobs.py ---
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database as db
+
+@pytest.fixture
+def section_id(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "DATABASE_NAME", str(tmp_path / "prompts.db"))
+    db.initialize_database()
+    yield db.add_section("Section", db.add_category("Category"))
+    db.close_all_connections()
+
+def _blobs():
+    """{body: (ref_count, compressed)} of every blob."""
+    conn = db.get_db_connection()
+    return {db._decode_content(row['data'], row['compressed']): (row['ref_count'], row['compressed'])
+            for row in conn.execute("SELECT data, compressed, ref_count FROM content_blobs")}
+
+def _content_id(prompt_id):
+    return db.get_db_connection().execute("SELECT content_id FROM prompts WHERE id = ?", (prompt_id,)).fetchone()[0]
+
+def _purge(table_name, item_id):
+    db.delete_permanently(table_name, item_id)
+    db.flush_writes()
+    while db._trash_purge_running:
+        db.flush_writes()
+
+def test_equal_bodies_are_stored_once(section_id):
+    first_id = db.add_prompt("First", "", "<p>same</p>", section_id)
+    second_id = db.add_prompt("Second", "", "<p>same</p>", section_id)
+    third_id = db.add_prompt("Third", "", "<p>different</p>", section_id)
+    assert _content_id(first_id) == _content_id(second_id) != _content_id(third_id)
+    assert _blobs() == {"<p>same</p>": (2, 0), "<p>different</p>": (1, 0)}
+    assert db.get_prompt(second_id)['content'] == "<p>same</p>"
+
+def test_large_bodies_are_compressed(section_id):
+    body = "<p>" + "long text " * db.CONTENT_COMPRESS_MIN_BYTES + "</p>"
+    prompt_id = db.add_prompt("Long", "", body, section_id)
+    assert _blobs() == {body: (1, 1)}
+    row = db.get_db_connection().execute("SELECT size, length(data) FROM content_blobs").fetchone()
+    assert row[0] == len(body.encode('utf-8')) > row[1]
+    assert db.get_prompt_content(prompt_id) == body
+
+def test_editing_moves_the_reference(section_id):
+    first_id = db.add_prompt("First", "", "<p>old</p>", section_id)
+    second_id = db.add_prompt("Second", "", "<p>old</p>", section_id)
+    db.update_prompt_fields(first_id, content="<p>new</p>")
+    assert _blobs() == {"<p>old</p>": (1, 0), "<p>new</p>": (1, 0)}
+    db.update_prompt_fields(second_id, content="<p>new</p>")
+    # Nothing uses the old body any more (revisions store their own copies)
+    assert _blobs() == {"<p>new</p>": (2, 0)}
+
+def test_purged_prompts_release_their_bodies(section_id):
+    first_id = db.add_prompt("First", "", "<p>same</p>", section_id)
+    second_id = db.add_prompt("Second", "", "<p>same</p>", section_id)
+    db.delete_prompt(first_id)
+    assert _blobs() == {"<p>same</p>": (2, 0)} # The trash can still restore it
+    _purge("prompts", first_id)
+    assert _blobs() == {"<p>same</p>": (1, 0)}
+    db.delete_prompt(second_id)
+    _purge("prompts", second_id)
+    assert _blobs() == {}
+
+def test_purged_section_releases_its_prompts_bodies(section_id):
+    db.add_prompt("First", "", "<p>one</p>", section_id)
+    db.add_prompt("Second", "", "<p>two</p>", section_id)
+    db.delete_section(section_id)
+    _purge("sections", section_id)
+    assert _blobs() == {}
+
+def test_missing_prompt_stores_no_body(section_id):
+    db.update_prompt_fields(12345, content="<p>orphan</p>")
+    assert _blobs() == {}
+
+# --- END OF FILE tests/test_content_blobs.py ---
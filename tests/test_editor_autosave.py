@@ -0,0 +1,113 @@
+# --- START OF FILE tests/test_editor_autosave.py ---
+
+import os
+import sys
+import threading
+
+import pytest
+
+pytest.importorskip("PyQt6")
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt6.QtWidgets import QApplication
+
+import database as db
+from hierarchy_cache import hierarchy
+
+@pytest.fixture
+def editor(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "DATABASE_NAME", str(tmp_path / "prompts.db"))
+    # The window's model listens for changes; drop it with the window
+    monkeypatch.setattr(db, "_change_listeners", list(db._change_listeners))
+    db.initialize_database()
+    hierarchy.invalidate()
+    app = QApplication.instance() or QApplication([])
+    from editor_ui import PromptEditorWindow
+    window = PromptEditorWindow()
+    yield window
+    window.autosave.flush(wait=True)
+    db.close_all_connections()
+
+def test_switching_prompt_saves_pending_edits(editor):
+    """Edits not yet written by the idle timer are saved when another prompt is selected."""
+    category_id = db.add_category("Category")
+    section_id = db.add_section("Section", category_id)
+    prompt_a = db.add_prompt("A", "", "<p>old text</p>", section_id)
+    prompt_b = db.add_prompt("B", "", "<p>other</p>", section_id)
+    editor.category_clicked({'id': category_id})
+    editor.section_clicked({'id': section_id})
+    editor.prompt_clicked({'id': prompt_a})
+
+    editor.editor.setPlainText("new text") # Marks the content dirty; the idle timer has not fired
+    editor.prompt_clicked({'id': prompt_b})
+    db.flush_writes()
+
+    assert "new text" in db.get_prompt_plain_text(prompt_a)
+    assert editor.current_prompt_id == prompt_b
+
+def test_switching_section_saves_pending_edits(editor):
+    category_id = db.add_category("Category")
+    section_id = db.add_section("Section", category_id)
+    other_section_id = db.add_section("Other", category_id)
+    prompt_id = db.add_prompt("A", "", "<p>old text</p>", section_id)
+    editor.category_clicked({'id': category_id})
+    editor.section_clicked({'id': section_id})
+    editor.prompt_clicked({'id': prompt_id})
+
+    editor.editor.setPlainText("new text")
+    editor.section_clicked({'id': other_section_id})
+    db.flush_writes()
+
+    assert "new text" in db.get_prompt_plain_text(prompt_id)
+
+def test_write_completion_handled_on_gui_thread(editor):
+    """The writer thread hands completed writes back; the bookkeeping runs on the GUI thread."""
+    category_id = db.add_category("Category")
+    section_id = db.add_section("Section", category_id)
+    prompt_id = db.add_prompt("A", "", "<p>old text</p>", section_id)
+    editor.category_clicked({'id': category_id})
+    editor.section_clicked({'id': section_id})
+    editor.prompt_clicked({'id': prompt_id})
+    saved_on = []
+    editor.autosave.saved.connect(lambda *args: saved_on.append(threading.current_thread()))
+
+    editor.editor.setPlainText("new text")
+    editor.autosave.flush()
+    db.flush_writes()
+    # Nothing is touched from the writer thread: queued until the GUI thread processes events
+    assert not saved_on and prompt_id in editor.autosave._in_flight
+    QApplication.processEvents()
+
+    assert saved_on == [threading.main_thread()]
+    assert prompt_id not in editor.autosave._in_flight
+
+def test_failed_write_is_retried(editor, monkeypatch):
+    """Fields whose write failed are dirty again: the timers or a later flush() save them."""
+    from autosave import AUTOSAVE_IDLE_MS
+    category_id = db.add_category("Category")
+    section_id = db.add_section("Section", category_id)
+    prompt_id = db.add_prompt("A", "", "<p>old text</p>", section_id)
+    editor.category_clicked({'id': category_id})
+    editor.section_clicked({'id': section_id})
+    editor.prompt_clicked({'id': prompt_id})
+    update_prompt_fields = db.update_prompt_fields
+
+    def failing_update(prompt_id, **fields):
+        raise RuntimeError("disk I/O error")
+
+    monkeypatch.setattr(db, "update_prompt_fields", failing_update)
+    editor.editor.setPlainText("new text")
+    editor.autosave.flush(wait=True)
+    QApplication.processEvents() # Delivers the failed write
+    assert "new text" not in db.get_prompt_plain_text(prompt_id)
+    assert editor.autosave.has_pending()
+    assert editor.autosave._idle_timer.isActive()
+    assert editor.autosave._idle_timer.interval() == AUTOSAVE_IDLE_MS
+
+    monkeypatch.setattr(db, "update_prompt_fields", update_prompt_fields)
+    editor.autosave.flush(wait=True)
+    assert "new text" in db.get_prompt_plain_text(prompt_id)
+    assert not editor.autosave.has_pending()
+
+# --- END OF FILE tests/test_editor_autosave.py ---
@@ -0,0 +1,98 @@
+# --- START OF FILE tests/test_frecency.py ---
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database as db
+import fuzzy_search
+
+HALF_LIFE = db.FRECENCY_HALF_LIFE_S
+NOW = 1_800_000_000.0
+
+@pytest.fixture
+def section_id(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "DATABASE_NAME", str(tmp_path / "prompts.db"))
+    db.initialize_database()
+    fuzzy_search.prompt_index.invalidate()
+    yield db.add_section("Section", db.add_category("Category"))
+    fuzzy_search.prompt_index.invalidate()
+    db.close_all_connections()
+
+def _frecency(prompt_id):
+    row = db.get_db_connection().execute("SELECT frecency FROM prompt_usage WHERE prompt_id = ?",
+                                         (prompt_id,)).fetchone()
+    return row['frecency'] if row else None
+
+def _frequent_titles():
+    return [row['prompt_title'] for row in db.get_frequent_prompts()]
+
+def test_score_decays_by_half_every_half_life(section_id):
+    prompt_id = db.add_prompt("Prompt", "", "<p>text</p>", section_id)
+    db.record_prompt_use(prompt_id, NOW)
+    db.record_prompt_use(prompt_id, NOW)
+    frecency = _frecency(prompt_id)
+    assert db.frecency_score(frecency, NOW) == pytest.approx(2.0)
+    assert db.frecency_score(frecency, NOW + HALF_LIFE) == pytest.approx(1.0)
+    assert db.frecency_score(frecency, NOW + 3 * HALF_LIFE) == pytest.approx(0.25)
+    assert db.frecency_score(None, NOW) == 0.0
+
+def test_uses_add_up_with_their_own_age(section_id):
+    prompt_id = db.add_prompt("Prompt", "", "<p>text</p>", section_id)
+    db.record_prompt_use(prompt_id, NOW - HALF_LIFE) # Worth 0.5 now
+    db.record_prompt_use(prompt_id, NOW)
+    assert db.frecency_score(_frecency(prompt_id), NOW) == pytest.approx(1.5)
+    row = db.get_db_connection().execute("SELECT use_count, last_used FROM prompt_usage WHERE prompt_id = ?",
+                                         (prompt_id,)).fetchone()
+    assert (row['use_count'], row['last_used']) == (2, NOW)
+
+def test_recent_use_outranks_older_frequent_use(section_id):
+    old_id = db.add_prompt("Used often, long ago", "", "<p>text</p>", section_id)
+    recent_id = db.add_prompt("Used once, today", "", "<p>text</p>", section_id)
+    for day in range(3):
+        db.record_prompt_use(old_id, NOW - 4 * HALF_LIFE + day * 3600) # 3 uses, worth 3/16 now
+    db.record_prompt_use(recent_id, NOW)
+    assert _frequent_titles() == ["Used once, today", "Used often, long ago"]
+
+def test_frequent_use_outranks_a_single_recent_one(section_id):
+    frequent_id = db.add_prompt("Used often, last week", "", "<p>text</p>", section_id)
+    recent_id = db.add_prompt("Used once, today", "", "<p>text</p>", section_id)
+    for _ in range(4):
+        db.record_prompt_use(frequent_id, NOW - HALF_LIFE / 2) # Worth about 2.8 now
+    db.record_prompt_use(recent_id, NOW)
+    assert _frequent_titles() == ["Used often, last week", "Used once, today"]
+
+def test_ranking_does_not_change_as_time_passes(section_id):
+    """Keys are stored decay-free: prompts used earlier never overtake later ones just by waiting."""
+    first_id = db.add_prompt("First", "", "<p>text</p>", section_id)
+    second_id = db.add_prompt("Second", "", "<p>text</p>", section_id)
+    db.record_prompt_use(first_id, NOW)
+    db.record_prompt_use(second_id, NOW + 60)
+    scores = [(db.frecency_score(_frecency(first_id), now), db.frecency_score(_frecency(second_id), now))
+              for now in (NOW + 60, NOW + 10 * HALF_LIFE)]
+    assert all(first < second for first, second in scores)
+    assert _frequent_titles() == ["Second", "First"]
+
+def test_no_overflow_for_far_future_uses(section_id):
+    prompt_id = db.add_prompt("Prompt", "", "<p>text</p>", section_id)
+    far_future = NOW + 10_000 * HALF_LIFE
+    db.record_prompt_use(prompt_id, far_future)
+    db.record_prompt_use(prompt_id, far_future)
+    assert db.frecency_score(_frecency(prompt_id), far_future) == pytest.approx(2.0)
+
+def test_uses_of_a_missing_prompt_are_ignored(section_id):
+    db.record_prompt_use(12345, NOW)
+    assert db.get_db_connection().execute("SELECT count(*) FROM prompt_usage").fetchone()[0] == 0
+
+def test_frecency_bonus_lifts_search_results(section_id):
+    db.add_prompt("Review code", "", "<p>text</p>", section_id)
+    used_id = db.add_prompt("Review docs", "", "<p>text</p>", section_id)
+    assert [row['prompt_title'] for row in fuzzy_search.search_prompts("review", 10)] == ["Review code", "Review docs"]
+    db.record_prompt_use(used_id)
+    db.flush_writes()
+    assert [row['prompt_title'] for row in fuzzy_search.search_prompts("review", 10)] == ["Review docs", "Review code"]
+
+# --- END OF FILE tests/test_frecency.py ---
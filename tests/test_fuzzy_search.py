@@ -0,0 +1,99 @@
+# --- START OF FILE tests/test_fuzzy_search.py ---
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database as db
+import fuzzy_search
+
+@pytest.fixture
+def section_id(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "DATABASE_NAME", str(tmp_path / "prompts.db"))
+    db.initialize_database()
+    fuzzy_search.prompt_index.invalidate()
+    category_id = db.add_category("Work")
+    yield db.add_section("Notes", category_id)
+    fuzzy_search.prompt_index.invalidate()
+    db.close_all_connections()
+
+def _titles(results):
+    return [result['prompt_title'] for result in results]
+
+def _all_pages(query, page_size):
+    pages = []
+    offset = 0
+    while True:
+        page = fuzzy_search.search_prompts(query, page_size, offset)
+        pages += page
+        if len(page) < page_size:
+            return pages
+        offset += page_size
+
+def test_ranking_order(section_id):
+    db.add_prompt("Preview layout", "", "<p>text</p>", section_id)
+    db.add_prompt("Review code", "", "<p>text</p>", section_id)
+    db.add_prompt("Rename variables everywhere", "", "<p>text</p>", section_id)
+    titles = _titles(fuzzy_search.search_prompts("review", 10))
+    # A word start beats a match inside a word, which beats a scattered one
+    assert titles == ["Review code", "Preview layout", "Rename variables everywhere"]
+
+def test_frecency_lifts_equal_matches(section_id):
+    db.add_prompt("Review code", "", "<p>text</p>", section_id)
+    used_id = db.add_prompt("Review tests", "", "<p>text</p>", section_id)
+    db.record_prompt_use(used_id)
+    assert _titles(fuzzy_search.search_prompts("review", 10)) == ["Review tests", "Review code"]
+
+def test_typo_fallback(section_id):
+    db.add_prompt("Review code", "", "<p>text</p>", section_id)
+    db.add_prompt("Summarize", "", "<p>text</p>", section_id)
+    results = fuzzy_search.search_prompts("reviex", 10)
+    assert _titles(results) == ["Review code"]
+
+def test_exact_matches_come_before_typo_matches(section_id):
+    db.add_prompt("Reviews", "", "<p>text</p>", section_id)
+    db.add_prompt("Reviex notes", "", "<p>text</p>", section_id)
+    titles = _titles(fuzzy_search.search_prompts("reviex", 10))
+    assert titles == ["Reviex notes", "Reviews"]
+
+def test_typo_matches_page_past_the_scoring_cap(section_id):
+    count = fuzzy_search.SCORED_MATCH_LIMIT * 2 + 44
+    for number in range(count):
+        db.add_prompt(f"Review {number}", "", "<p>text</p>", section_id)
+    total, best = fuzzy_search.prompt_index.search("reviex", count + 10)
+    assert total == count and len(best) == count
+
+    titles = _titles(_all_pages("reviex", 50))
+    assert sorted(titles) == sorted(f"Review {number}" for number in range(count))
+
+    # A larger limit extends the list for a smaller one
+    fuzzy_search.prompt_index.invalidate()
+    first = _titles(fuzzy_search.search_prompts("reviex", fuzzy_search.SCORED_MATCH_LIMIT + 10))
+    assert titles[:len(first)] == first
+
+def test_exact_matches_page_past_the_scoring_cap(section_id):
+    count = fuzzy_search.SCORED_MATCH_LIMIT * 2 + 44
+    for number in range(count):
+        db.add_prompt(f"Review {number}", "", "<p>text</p>", section_id)
+    titles = _titles(_all_pages("review", 50))
+    assert sorted(titles) == sorted(f"Review {number}" for number in range(count))
+
+@pytest.mark.parametrize("page_size", [1, 2, 3, 5, 10])
+def test_paging_across_the_fuzzy_and_content_matches(section_id, page_size):
+    for number in range(4):
+        db.add_prompt(f"Deploy step {number}", "", "<p>Run the deploy script</p>", section_id)
+    for number in range(5):
+        db.add_prompt(f"Checklist {number}", "", f"<p>Before you deploy, item {number}</p>", section_id)
+    db.add_prompt("Unrelated", "", "<p>nothing here</p>", section_id)
+
+    everything = fuzzy_search.search_prompts("deploy", 100)
+    assert _titles(everything[:4]) == [f"Deploy step {number}" for number in range(4)]
+    assert sorted(_titles(everything[4:])) == [f"Checklist {number}" for number in range(5)]
+
+    paged = _all_pages("deploy", page_size)
+    assert [result['prompt_id'] for result in paged] == [result['prompt_id'] for result in everything]
+
+# --- END OF FILE tests/test_fuzzy_search.py ---
@@ -0,0 +1,110 @@
+# --- START OF FILE tests/test_library_io.py ---
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database as db
+import library_io
+
+@pytest.fixture
+def library(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "DATABASE_NAME", str(tmp_path / "prompts.db"))
+    db.initialize_database()
+    yield tmp_path
+    db.close_all_connections()
+
+def _count(table_name):
+    return db.get_db_connection().execute(f"SELECT count(*) FROM {table_name}").fetchone()[0]
+
+def _numbered_prompts(count, category="Imported", section="General"):
+    for number in range(count):
+        yield {'type': 'prompt', 'category': category, 'section': section,
+               'title': f"Prompt {number}", 'content': f"<p>Body {number}</p>"}
+
+def test_import_commits_each_batch(library):
+    """Each batch is committed on its own, so other connections see it (and can write) before the import ends."""
+    seen = []
+
+    def records():
+        for record in _numbered_prompts(7):
+            seen.append(_count("prompts")) # A reader of its own: sees only committed rows
+            yield record
+
+    counts = db.import_library_records(records(), batch_size=3)
+    assert counts == {'categories': 1, 'sections': 1, 'prompts': 7}
+    assert seen == [0, 0, 0, 3, 3, 3, 6]
+    assert _count("prompts") == 7
+
+def test_failed_import_removes_its_batches(library):
+    category_id = db.add_category("Existing")
+    section_id = db.add_section("Section", category_id)
+    db.add_prompt("Kept", "", "<p>kept</p>", section_id)
+
+    def records():
+        yield from _numbered_prompts(3, "Existing", "Section")
+        yield from _numbered_prompts(4)
+        yield {'type': 'prompt', 'category': "Imported", 'section': "General"} # No title
+
+    with pytest.raises(ValueError, match="Record 8"):
+        db.import_library_records(records(), batch_size=2)
+    conn = db.get_db_connection()
+    assert [row['title'] for row in conn.execute("SELECT title FROM prompts")] == ["Kept"]
+    assert [row['name'] for row in conn.execute("SELECT name FROM sections")] == ["Section"]
+    assert [row['name'] for row in conn.execute("SELECT name FROM categories")] == ["Existing"]
+    # Their bodies went with them
+    assert _count("content_blobs") == 1
+
+def test_failed_read_removes_its_batches(library):
+    def records():
+        yield from _numbered_prompts(5)
+        raise OSError("read error")
+
+    with pytest.raises(OSError):
+        db.import_library_records(records(), batch_size=2)
+    assert _count("prompts") == 0 and _count("sections") == 0 and _count("categories") == 0
+
+def _fill_library():
+    work_id = db.add_category("Work", '#ffcc00')
+    review_id = db.add_section("Review", work_id)
+    db.update_section_color(review_id, '#00ccff')
+    db.add_prompt("Code review", "Checks, step by step", "<p>Look for:</p><ul><li>bugs</li><li>style</li></ul>",
+                  review_id)
+    db.add_prompt('Quotes "and", commas', "", "<p>Line one<br />line two</p><p>Ünïcödé ✓</p>", review_id)
+    db.add_section("Empty section", work_id)
+    home_id = db.add_category("Home")
+    db.add_prompt("Shopping", "", "<p>milk</p>", db.add_section("Lists", home_id))
+
+def _reopen(monkeypatch, path):
+    db.close_all_connections()
+    monkeypatch.setattr(db, "DATABASE_NAME", str(path))
+    db.initialize_database()
+
+def _prompts_only(records):
+    return [record for record in records if record['type'] == 'prompt']
+
+def test_ndjson_round_trip(library, monkeypatch):
+    _fill_library()
+    exported = list(db.export_library_records())
+    assert library_io.export_library(str(library / "backup.ndjson")) == 3
+
+    _reopen(monkeypatch, library / "restored.db")
+    counts = library_io.import_library(str(library / "backup.ndjson"))
+    assert counts == {'categories': 2, 'sections': 3, 'prompts': 3}
+    assert list(db.export_library_records()) == exported
+
+def test_csv_round_trip(library, monkeypatch):
+    _fill_library()
+    exported = list(db.export_library_records())
+    assert library_io.export_library(str(library / "prompts.csv")) == 3
+
+    _reopen(monkeypatch, library / "restored.db")
+    counts = library_io.import_library(str(library / "prompts.csv"))
+    # CSV has no colors and no empty sections
+    assert counts == {'categories': 2, 'sections': 2, 'prompts': 3}
+    assert _prompts_only(db.export_library_records()) == _prompts_only(exported)
+
+# --- END OF FILE tests/test_library_io.py ---
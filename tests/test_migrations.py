@@ -0,0 +1,113 @@
+# --- START OF FILE tests/test_migrations.py ---
+
+import os
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database as db
+
+# The schema of the first versions of the app: no colors, no ordering
+LEGACY_SCHEMA = """
+    CREATE TABLE categories (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL UNIQUE);
+    CREATE TABLE sections (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, category_id INTEGER NOT NULL,
+        FOREIGN KEY (category_id) REFERENCES categories (id) ON DELETE CASCADE
+    );
+    CREATE TABLE prompts (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, title TEXT NOT NULL, description TEXT, content TEXT NOT NULL,
+        section_id INTEGER NOT NULL,
+        FOREIGN KEY (section_id) REFERENCES sections (id) ON DELETE CASCADE
+    );
+    INSERT INTO categories (name) VALUES ('Work'), ('Home');
+    INSERT INTO sections (name, category_id) VALUES ('Review', 1), ('Writing', 1), ('Lists', 2);
+    INSERT INTO prompts (title, description, content, section_id) VALUES
+        ('Code review', 'Checks', '<p>Look for <b>bugs</b></p><ul><li>style</li><li>tests</li></ul>', 1),
+        ('Second pass', NULL, '<p>Look for <b>bugs</b></p><ul><li>style</li><li>tests</li></ul>', 1),
+        ('Summary', '', '<p>Summarize the text</p>', 2),
+        ('Shopping', '', 'milk and bread', 3);
+"""
+
+@pytest.fixture
+def legacy_database(tmp_path, monkeypatch):
+    path = tmp_path / "prompts.db"
+    conn = sqlite3.connect(path)
+    conn.executescript(LEGACY_SCHEMA)
+    conn.close()
+    monkeypatch.setattr(db, "DATABASE_NAME", str(path))
+    yield path
+    db.close_all_connections()
+
+def _library():
+    """(category, section, title, description, content) of every prompt, in display order."""
+    library = []
+    for category in db.get_categories():
+        for section in db.get_sections(category['id']):
+            for prompt in db.get_prompts(section['id']):
+                row = db.get_prompt(prompt['id'])
+                library.append((category['name'], section['name'], row['title'], row['description'], row['content']))
+    return library
+
+EXPECTED_LIBRARY = [
+    ('Work', 'Review', 'Code review', 'Checks', '<p>Look for <b>bugs</b></p><ul><li>style</li><li>tests</li></ul>'),
+    ('Work', 'Review', 'Second pass', None, '<p>Look for <b>bugs</b></p><ul><li>style</li><li>tests</li></ul>'),
+    ('Work', 'Writing', 'Summary', '', '<p>Summarize the text</p>'),
+    ('Home', 'Lists', 'Shopping', '', 'milk and bread'),
+]
+
+def test_legacy_database_is_migrated_with_its_data(legacy_database):
+    assert db.get_schema_version() == 0
+    db.initialize_database()
+
+    assert db.get_schema_version() == db.SCHEMA_VERSION
+    assert _library() == EXPECTED_LIBRARY
+    # Derived columns and indexes were filled in for the old rows
+    assert db.get_prompt_plain_text(1) == "Look for bugs\nstyle\ntests"
+    assert db.get_prompt_plain_text(4) == "milk and bread"
+    conn = db.get_db_connection()
+    assert conn.execute("SELECT count(*) FROM content_blobs").fetchone()[0] == 3 # One body shared
+    assert conn.execute("SELECT count(*) FROM prompts WHERE content != ''").fetchone()[0] == 0
+    if db.FTS_AVAILABLE:
+        assert [row['prompt_title'] for row in db.search_prompts("summarize")] == ["Summary"]
+    assert conn.execute("PRAGMA integrity_check").fetchone()[0] == "ok"
+    assert conn.execute("PRAGMA foreign_key_check").fetchall() == []
+
+def test_interrupted_upgrade_resumes(legacy_database):
+    """Each migration commits with its version: a later start runs only the ones left."""
+    applied = []
+    migrations = [(version, description, lambda cursor, migrate=migrate, version=version:
+                   (applied.append(version), migrate(cursor)))
+                  for version, description, migrate in db.SCHEMA_MIGRATIONS]
+
+    def failing_migration(cursor):
+        raise sqlite3.OperationalError("disk I/O error")
+
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(db, "SCHEMA_MIGRATIONS", migrations[:5] + [(6, "fails", failing_migration)] + migrations[6:])
+        with pytest.raises(sqlite3.OperationalError):
+            db.initialize_database()
+    assert db.get_schema_version() == 5
+    assert applied == [1, 2, 3, 4, 5]
+
+    applied.clear()
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(db, "SCHEMA_MIGRATIONS", migrations)
+        db.initialize_database()
+    assert applied == list(range(6, db.SCHEMA_VERSION + 1))
+    assert db.get_schema_version() == db.SCHEMA_VERSION
+    assert _library() == EXPECTED_LIBRARY
+
+def test_up_to_date_database_is_left_alone(legacy_database):
+    db.initialize_database()
+    applied = []
+    migrations = [(version, description, lambda cursor, version=version: applied.append(version))
+                  for version, description, _ in db.SCHEMA_MIGRATIONS]
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(db, "SCHEMA_MIGRATIONS", migrations)
+        db.initialize_database()
+    assert applied == []
+
+# --- END OF FILE tests/test_migrations.py ---
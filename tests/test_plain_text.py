@@ -0,0 +1,99 @@
+# --- START OF FILE tests/test_plain_text.py ---
+
+import os
+import sys
+
+import pytest
+
+pytest.importorskip("PyQt6")
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt6.QtGui import QTextCursor, QTextListFormat
+from PyQt6.QtWidgets import QApplication, QTextEdit
+
+import database as db
+
+@pytest.fixture(scope="module")
+def app():
+    return QApplication.instance() or QApplication([])
+
+HTML_DOCUMENTS = {
+    "paragraphs": "<p>one</p><p>two</p>",
+    "line breaks": "<p>one<br>two</p><p>three<br></p>",
+    "list": "<ul><li>one</li><li>two</li></ul><p>after</p>",
+    "nested list": "<ol><li>a<ul><li>b</li></ul></li><li>c</li></ol>",
+    "list and table": "<ul><li>one</li><li>two</li></ul><p>after</p>"
+                      "<table><tr><td>a</td></tr><tr><td>b</td></tr></table>",
+    "table between paragraphs": "<p>x</p><table><tr><td>a</td><td>b</td></tr><tr><td>c</td><td>d</td></tr></table><p>y</p>",
+    "table with an empty cell": "<table><tr><td></td><td>x</td></tr></table>",
+    "table ending in an empty cell": "<p>x</p><table><tr><td>a</td><td></td></tr></table><p>y</p>",
+    "table then list": "<p>x</p><table><tr><td>a</td></tr></table><ul><li>i</li></ul>",
+    "consecutive tables": "<p>x</p><table><tr><td></td></tr></table><table><tr><td>b</td></tr></table><p>y</p>",
+    "table then rule": "<p>x</p><table><tr><td>a</td></tr></table><hr><p>y</p>",
+    "headings": "<h1>Title</h1><p>body</p><h2>Part</h2>",
+    "preformatted": "<pre>x\n  y</pre><p>z</p>",
+    "rule": "<p>a</p><hr><p>b</p>",
+    "entities": "<p>a&nbsp;b &amp; c</p>",
+    "inline only": "hello <b>bold</b> world",
+}
+
+PLAIN_DOCUMENTS = {
+    "empty lines": "a\n\nb\n",
+    "leading empty lines": "\n\nfirst",
+    "spacing": "a  b\tc  ",
+}
+
+def _qt_round_trip(editor):
+    """(stored HTML, Qt's plain text of it) for the editor's document.
+
+    The text is taken from the HTML loaded again, as when the prompt is
+    opened: Qt's HTML import adds an empty block after every table, which a
+    document built with a cursor may not have.
+    """
+    html = editor.toHtml()
+    loaded = QTextEdit()
+    loaded.setHtml(html)
+    return html, loaded.toPlainText()
+
+@pytest.mark.parametrize("name", sorted(HTML_DOCUMENTS))
+def test_html_matches_qt_plain_text(app, name):
+    editor = QTextEdit()
+    editor.setHtml(HTML_DOCUMENTS[name])
+    html, expected = _qt_round_trip(editor)
+    assert db.html_to_plain_text(html) == expected
+
+@pytest.mark.parametrize("name", sorted(PLAIN_DOCUMENTS))
+def test_typed_text_matches_qt_plain_text(app, name):
+    editor = QTextEdit()
+    editor.setPlainText(PLAIN_DOCUMENTS[name])
+    html, expected = _qt_round_trip(editor)
+    assert db.html_to_plain_text(html) == expected
+
+def test_document_built_with_cursor_matches_qt_plain_text(app):
+    """Lists and tables inserted as the editor's toolbar does."""
+    editor = QTextEdit()
+    cursor = editor.textCursor()
+    cursor.insertText("intro")
+    cursor.insertBlock()
+    cursor.insertList(QTextListFormat.Style.ListDisc)
+    cursor.insertText("item one")
+    cursor.insertBlock()
+    cursor.insertText("item two")
+    cursor.insertBlock()
+    cursor.insertTable(2, 2)
+    cursor.insertText("cell")
+    cursor.movePosition(QTextCursor.MoveOperation.End)
+    cursor.insertText("end")
+    html, expected = _qt_round_trip(editor)
+    assert db.html_to_plain_text(html) == expected
+
+def test_derived_counts_use_the_plain_text(app):
+    editor = QTextEdit()
+    editor.setHtml(HTML_DOCUMENTS["list and table"])
+    html, expected = _qt_round_trip(editor)
+    derived = db._derived_content_columns(html)
+    assert derived['content_plain'] == expected
+    assert derived['char_count'] == len(expected)
+
+# --- END OF FILE tests/test_plain_text.py ---
@@ -0,0 +1,20 @@
+# --- START OF FILE tests/test_query_plans.py ---
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database as db
+
+def test_no_query_scans_a_table_or_sorts(tmp_path, monkeypatch, capsys):
+    # check_query_plans() works on its own scratch database; this keeps the
+    # real one out of reach if it fails halfway
+    monkeypatch.setattr(db, "DATABASE_NAME", str(tmp_path / "prompts.db"))
+    ok = db.check_query_plans()
+    output = capsys.readouterr().out
+    assert ok, output
+    assert "no problem(s) found" in output
+    assert db.DATABASE_NAME == str(tmp_path / "prompts.db")
+
+# --- END OF FILE tests/test_query_plans.py ---
@@ -0,0 +1,119 @@
+# --- START OF FILE tests/test_revisions.py ---
+
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database as db
+
+class _Clock:
+    """Stands in for the time module in database.py, with time() under the test's control."""
+
+    def __init__(self):
+        self.now = 1_800_000_000.0
+
+    def time(self):
+        return self.now
+
+    def __getattr__(self, name):
+        return getattr(time, name)
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(db, "time", clock)
+    return clock
+
+@pytest.fixture
+def prompt_id(tmp_path, monkeypatch, clock):
+    monkeypatch.setattr(db, "DATABASE_NAME", str(tmp_path / "prompts.db"))
+    db.initialize_database()
+    section_id = db.add_section("Section", db.add_category("Category"))
+    yield db.add_prompt("Prompt", "", _content(0), section_id)
+    db.close_all_connections()
+
+def _content(version):
+    # Many lines, one of them changing: revisions are stored as deltas
+    lines = [f"<p>Line {number}</p>\n" for number in range(40)]
+    lines[version % 40] = f"<p>Version {version}</p>\n"
+    return "".join(lines)
+
+def _save(prompt_id, clock, seconds_later, version):
+    clock.now += seconds_later
+    db.update_prompt_fields(prompt_id, content=_content(version))
+
+def _revision_contents(prompt_id):
+    return [db.get_prompt_revision(row['id'])['content'] for row in db.get_prompt_revisions(prompt_id)]
+
+def test_first_edit_keeps_the_version_before_it(prompt_id, clock):
+    assert db.get_prompt_revisions(prompt_id) == []
+    _save(prompt_id, clock, 1, 1)
+    assert _revision_contents(prompt_id) == [_content(1), _content(0)]
+
+def test_edits_in_a_burst_are_coalesced(prompt_id, clock):
+    _save(prompt_id, clock, 1, 1)
+    _save(prompt_id, clock, 1, 2)
+    _save(prompt_id, clock, db.REVISION_COALESCE_S, 3)
+    _save(prompt_id, clock, 1, 4)
+    assert _revision_contents(prompt_id) == [_content(4), _content(0)]
+    revision = db.get_prompt_revisions(prompt_id)[0]
+    assert revision['updated_at'] == clock.now
+
+def test_edits_after_a_pause_add_a_revision(prompt_id, clock):
+    _save(prompt_id, clock, 1, 1)
+    _save(prompt_id, clock, 1, 2)
+    _save(prompt_id, clock, db.REVISION_COALESCE_S + 1, 3)
+    assert _revision_contents(prompt_id) == [_content(3), _content(2), _content(0)]
+
+def test_a_long_burst_is_split(prompt_id, clock):
+    _save(prompt_id, clock, 1, 1)
+    last = db.REVISION_COALESCE_MAX_S // 60 + 2 # The first save more than REVISION_COALESCE_MAX_S after version 1
+    for version in range(2, last + 1):
+        _save(prompt_id, clock, 60, version)
+    assert _revision_contents(prompt_id) == [_content(last), _content(last - 1), _content(0)]
+
+def test_undone_burst_leaves_no_revision(prompt_id, clock):
+    _save(prompt_id, clock, 1, 1)
+    _save(prompt_id, clock, db.REVISION_COALESCE_S + 1, 2)
+    _save(prompt_id, clock, 1, 1) # Back to the previous revision
+    assert _revision_contents(prompt_id) == [_content(1), _content(0)]
+
+def test_history_is_trimmed_and_rebuilt_from_keyframes(prompt_id, clock):
+    edits = db.REVISION_LIMIT + db.REVISION_KEYFRAME_INTERVAL + 5
+    for version in range(1, edits + 1):
+        _save(prompt_id, clock, db.REVISION_COALESCE_S + 1, version)
+    revisions = db.get_prompt_revisions(prompt_id)
+    assert len(revisions) == db.REVISION_LIMIT
+    assert _revision_contents(prompt_id) == [_content(version)
+                                             for version in range(edits, edits - db.REVISION_LIMIT, -1)]
+    conn = db.get_db_connection()
+    chains = [row['chain_length'] for row in conn.execute(
+        "SELECT chain_length FROM prompt_revisions WHERE prompt_id = ? ORDER BY id", (prompt_id,))]
+    assert chains[0] == 0 # The oldest kept one became a keyframe
+    assert max(chains) < db.REVISION_KEYFRAME_INTERVAL
+    assert chains.count(0) < len(chains) // 2 # Mostly deltas
+
+def test_restore_adds_a_revision(prompt_id, clock):
+    _save(prompt_id, clock, 1, 1)
+    _save(prompt_id, clock, db.REVISION_COALESCE_S + 1, 2)
+    first = db.get_prompt_revisions(prompt_id)[-1]
+    clock.now += 1 # Within the burst: still not folded into the latest revision
+    assert db.restore_prompt_revision(first['id']) == prompt_id
+    assert db.get_prompt(prompt_id)['content'] == _content(0)
+    assert _revision_contents(prompt_id) == [_content(0), _content(2), _content(1), _content(0)]
+    assert db.restore_prompt_revision(12345) is None
+
+def test_revisions_go_with_their_prompt(prompt_id, clock):
+    _save(prompt_id, clock, 1, 1)
+    db.delete_prompt(prompt_id)
+    db.delete_permanently("prompts", prompt_id)
+    db.flush_writes()
+    while db._trash_purge_running:
+        db.flush_writes()
+    assert db.get_db_connection().execute("SELECT count(*) FROM prompt_revisions").fetchone()[0] == 0
+
+# --- END OF FILE tests/test_revisions.py ---
@@ -0,0 +1,78 @@
+# --- START OF FILE tests/test_search_cache.py ---
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database as db
+import fuzzy_search
+from fuzzy_search import prompt_index
+
+@pytest.fixture
+def section_id(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "DATABASE_NAME", str(tmp_path / "prompts.db"))
+    db.initialize_database()
+    prompt_index.invalidate()
+    yield db.add_section("Notes", db.add_category("Work"))
+    prompt_index.invalidate()
+    db.close_all_connections()
+
+def _titles(query):
+    return [result['prompt_title'] for result in fuzzy_search.search_prompts(query, 20)]
+
+def test_narrowing_uses_the_prefix_results(section_id, monkeypatch):
+    db.add_prompt("Review code", "", "<p>text</p>", section_id)
+    db.add_prompt("Summarize text", "", "<p>text</p>", section_id)
+    assert sorted(_titles("re")) == ["Review code", "Summarize text"]
+
+    def no_bitsets(text):
+        raise AssertionError("scanned the index instead of the cached lines")
+
+    monkeypatch.setattr(prompt_index, "_lines_with_chars", no_bitsets)
+    assert _titles("rev") == ["Review code"]
+    assert _titles("rev cod") == ["Review code"]
+
+def test_added_prompt_clears_the_prefix_results(section_id):
+    db.add_prompt("Review code", "", "<p>text</p>", section_id)
+    assert _titles("rev") == ["Review code"]
+    db.add_prompt("Review tests", "", "<p>text</p>", section_id)
+    db.flush_writes()
+    assert _titles("revi") == ["Review code", "Review tests"]
+    assert _titles("rev") == ["Review code", "Review tests"]
+
+def test_renamed_prompt_clears_the_prefix_results(section_id):
+    prompt_id = db.add_prompt("Review code", "", "<p>text</p>", section_id)
+    assert _titles("rev") == ["Review code"]
+    db.update_prompt_fields(prompt_id, title="Summarize")
+    db.flush_writes()
+    assert _titles("revi") == []
+    assert _titles("sum") == ["Summarize"]
+
+def test_deleted_prompt_clears_the_prefix_results(section_id):
+    prompt_id = db.add_prompt("Review code", "", "<p>text</p>", section_id)
+    assert _titles("rev") == ["Review code"]
+    db.delete_prompt(prompt_id)
+    db.flush_writes()
+    assert _titles("revi") == []
+
+def test_renamed_section_clears_the_prefix_results(section_id):
+    db.add_prompt("Code", "", "<p>text</p>", section_id)
+    assert _titles("note") == ["Code"]
+    db.update_section(section_id, "Drafts")
+    db.flush_writes()
+    assert _titles("notes") == []
+    assert _titles("draft") == ["Code"]
+
+def test_content_edit_clears_the_content_results(section_id):
+    prompt_id = db.add_prompt("Code", "", "<p>nothing yet</p>", section_id)
+    if not db.FTS_AVAILABLE:
+        pytest.skip("SQLite without FTS5")
+    assert _titles("pineapple") == []
+    db.update_prompt_fields(prompt_id, content="<p>pineapple pizza</p>")
+    db.flush_writes()
+    assert _titles("pineapple") == ["Code"]
+
+# --- END OF FILE tests/test_search_cache.py ---
@@ -0,0 +1,56 @@
+# --- START OF FILE tests/test_search_popup.py ---
+
+import os
+import sys
+import time
+
+import pytest
+
+pytest.importorskip("PyQt6")
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt6.QtWidgets import QApplication
+
+import database as db
+import fuzzy_search
+
+@pytest.fixture
+def popup(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "DATABASE_NAME", str(tmp_path / "prompts.db"))
+    db.initialize_database()
+    fuzzy_search.prompt_index.invalidate()
+    app = QApplication.instance() or QApplication([])
+    from search_ui import SearchUIWindow
+    window = SearchUIWindow()
+    yield window
+    window.stop_search_thread()
+    db.close_all_connections()
+
+def _process_events_for(seconds):
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        QApplication.processEvents()
+        time.sleep(0.01)
+
+def test_hidden_popup_stays_empty(popup):
+    """Clearing the input on hide must not refill (or resize) the hidden window."""
+    from search_ui import MAIN_WINDOW_HEIGHT
+    category_id = db.add_category("Category")
+    section_id = db.add_section("Section", category_id)
+    prompt_id = db.add_prompt("Review code", "", "<p>text</p>", section_id)
+    db.record_prompt_use(prompt_id) # So the most used prompts are not empty
+    db.flush_writes()
+    popup.show_and_prepare()
+    _process_events_for(0.3)
+    assert popup.results_model.has_results()
+
+    popup.search_input.setText("review") # Queues a search
+    popup.hide_window()
+    _process_events_for(0.5)
+
+    assert popup.search_input.text() == ""
+    assert not popup.results_model.has_results()
+    assert popup.height() == MAIN_WINDOW_HEIGHT
+
+# --- END OF FILE tests/test_search_popup.py ---
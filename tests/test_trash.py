@@ -0,0 +1,127 @@
+# --- START OF FILE tests/test_trash.py ---
+
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database as db
+
+DEPENDENT_TABLES = ("prompts", "sections", "categories", "prompt_usage", "prompt_revisions", "content_blobs")
+
+@pytest.fixture
+def library(tmp_path, monkeypatch):
+    """Two categories: Work (sections Alpha and Beta, 7 used and edited prompts) and Home (1 prompt)."""
+    monkeypatch.setattr(db, "DATABASE_NAME", str(tmp_path / "prompts.db"))
+    db.initialize_database()
+    work_id = db.add_category("Work")
+    ids = {'work': work_id, 'alpha': db.add_section("Alpha", work_id), 'beta': db.add_section("Beta", work_id)}
+    ids['prompts'] = []
+    for number in range(7):
+        prompt_id = db.add_prompt(f"Prompt {number}", "", f"<p>body {number}</p>",
+                                  ids['alpha'] if number < 4 else ids['beta'])
+        db.update_prompt_fields(prompt_id, content=f"<p>edited body {number}</p>") # Revisions
+        db.record_prompt_use(prompt_id)
+        ids['prompts'].append(prompt_id)
+    ids['home'] = db.add_category("Home")
+    ids['kept'] = db.add_prompt("Kept", "", "<p>kept body</p>", db.add_section("Lists", ids['home']))
+    db.update_prompt_fields(ids['kept'], content="<p>kept, edited</p>")
+    db.record_prompt_use(ids['kept'])
+    yield ids
+    db.close_all_connections()
+
+def _count(table_name):
+    return db.get_db_connection().execute(f"SELECT count(*) FROM {table_name}").fetchone()[0]
+
+def _counts():
+    counts = {table_name: _count(table_name) for table_name in DEPENDENT_TABLES}
+    if db.FTS_AVAILABLE:
+        counts[db.FTS_TABLE] = _count(db.FTS_TABLE)
+    return counts
+
+def _titles(section_id):
+    return [row['title'] for row in db.get_prompts(section_id)]
+
+def test_trashed_prompt_is_hidden_and_restored(library):
+    prompt_id = library['prompts'][1]
+    db.delete_prompt(prompt_id)
+    assert "Prompt 1" not in _titles(library['alpha'])
+    assert [(item['type'], item['name'], item['path']) for item in db.get_trash()] == [
+        ('prompt', "Prompt 1", "Work > Alpha")]
+    if db.FTS_AVAILABLE:
+        assert prompt_id not in [row['prompt_id'] for row in db.search_prompts("edited body")]
+
+    assert db.restore_item("prompts", prompt_id)
+    assert _titles(library['alpha']) == ["Prompt 0", "Prompt 1", "Prompt 2", "Prompt 3"]
+    assert db.get_trash() == []
+    assert not db.restore_item("prompts", prompt_id) # Not in the trash any more
+
+def test_restoring_a_prompt_restores_its_parents(library):
+    db.delete_section(library['alpha'])
+    db.delete_category(library['work'])
+    assert [row['name'] for row in db.get_categories()] == ["Home"]
+
+    assert db.restore_item("prompts", library['prompts'][0]) is False # The prompt itself was not deleted
+    assert db.restore_item("sections", library['alpha'])
+    assert [row['name'] for row in db.get_categories()] == ["Work", "Home"]
+    assert [row['name'] for row in db.get_sections(library['work'])] == ["Alpha", "Beta"]
+    assert _titles(library['alpha']) == ["Prompt 0", "Prompt 1", "Prompt 2", "Prompt 3"]
+
+def test_trashed_category_name_can_be_reused(library):
+    db.delete_category(library['work'])
+    new_id = db.add_category("Work")
+    assert new_id != library['work']
+    assert db.restore_item("categories", library['work'])
+    names = {row['id']: row['name'] for row in db.get_categories()}
+    assert names[new_id] == "Work" and names[library['work']].startswith("Work (deleted")
+
+def test_purge_in_batches_empties_every_dependent_table(library):
+    before = _counts()
+    db.delete_category(library['work'])
+    cutoff = time.time()
+    purged = []
+    while True:
+        count = db.purge_trash_batch(cutoff, batch_size=3)
+        if not count:
+            break
+        assert count <= 3
+        purged.append(count)
+    assert len(purged) > 2
+    # Only what was under Work is gone: one category, two sections, seven prompts and what they owned
+    after = _counts()
+    assert after['categories'] == before['categories'] - 1
+    assert after['sections'] == before['sections'] - 2
+    assert after['prompts'] == before['prompts'] - 7 == 1
+    assert after['prompt_usage'] == after['prompts']
+    assert after['prompt_revisions'] == 2 # The kept prompt's
+    assert after['content_blobs'] == 1
+    if db.FTS_AVAILABLE:
+        assert after[db.FTS_TABLE] == 1
+    assert db.get_trash() == []
+    conn = db.get_db_connection()
+    assert conn.execute("PRAGMA foreign_key_check").fetchall() == []
+
+def test_purge_keeps_items_until_they_expire(library):
+    db.delete_prompt(library['prompts'][0])
+    assert db.purge_trash_batch(time.time() - db.TRASH_RETENTION_S) == 0
+    assert db.restore_item("prompts", library['prompts'][0])
+
+def test_deleted_permanently_cannot_be_restored(library):
+    prompt_id = library['prompts'][0]
+    assert not db.delete_permanently("prompts", prompt_id) # Not in the trash
+    db.delete_prompt(prompt_id)
+    db.delete_section(library['beta'])
+    assert db.delete_permanently("prompts", prompt_id)
+    assert not db.restore_item("prompts", prompt_id) # Being purged
+    db.empty_trash()
+    db.flush_writes()
+    while db._trash_purge_running:
+        db.flush_writes()
+    assert db.get_trash() == []
+    assert _count("prompts") == 4 # Prompts 1-3 and Kept
+    assert _count("sections") == 2
+
+# --- END OF FILE tests/test_trash.py ---
@@ -0,0 +1,49 @@
+# --- START OF FILE tests/test_tray_menu.py ---
+
+import os
+import sys
+import time
+
+import pytest
+
+pytest.importorskip("PyQt6")
+pytest.importorskip("keyboard") # Imported by main.py
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt6.QtWidgets import QApplication
+
+import database as db
+import fuzzy_search
+
+@pytest.fixture
+def main_module(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "DATABASE_NAME", str(tmp_path / "prompts.db"))
+    db.initialize_database()
+    fuzzy_search.prompt_index.invalidate()
+    import main
+    from search_ui import SearchUIWindow
+    monkeypatch.setattr(main, "app", QApplication.instance() or QApplication([]))
+    monkeypatch.setattr(main, "search_window", SearchUIWindow())
+    monkeypatch.setattr(main, "editor_visible", False)
+    yield main
+    main.search_window.stop_search_thread()
+    db.close_all_connections()
+
+def test_show_search_action_measures_latency_from_now(main_module):
+    """The tray menu's Show Search reports the latency of this show, not time since startup."""
+    requested = []
+    main_module.search_window.show_requested.connect(requested.append)
+    menu = main_module.create_tray_menu()
+    show_search_action = next(action for action in menu.actions() if action.text() == "Show Search")
+
+    show_search_action.trigger()
+    QApplication.processEvents()
+    main_module.search_window._report_show_latency()
+
+    assert len(requested) == 1
+    assert 0 <= time.perf_counter() - requested[0] < 1
+    visible_ms, focused_ms = main_module.search_window.last_show_latency
+    assert 0 <= focused_ms < 1000
+
+# --- END OF FILE tests/test_tray_menu.py ---